@@ -8,6 +8,14 @@
 ################################################################
 ################################################################
 
+import pool
+
+try:
+    import numpy as np
+
+except ImportError:
+    np = None
+
 try:
     import pyximport
     pyximport.install()
@@ -15,94 +23,318 @@ try:
     from . import decompress_cy as decompress_
 
 except:
-    from . import decompress_
+    try:
+        from . import decompress_np as decompress_
+
+    except:
+        from . import decompress_
+
+try:
+    import pyximport
+    pyximport.install()
+
+    from . import decompress_astc_cy as decompress_astc_
+
+except:
+    from . import decompress_astc as decompress_astc_
+
+try:
+    from . import decompress_bc6h
+
+except:
+    decompress_bc6h = None
+
+try:
+    from . import decompress_bc7
+
+except:
+    decompress_bc7 = None
+
+
+# Bands thinner than this many rows of 4x4 blocks are not worth a thread
+minBandRows = 16
+
+
+def getMaxAddr(blockAddrs, numBlocks):
+    """
+    Returns the largest of the first numBlocks block positions, kept by the tables
+    of swizzle.getBlockAddresses() (without NumPy) or found by NumPy.
+    """
+    if numBlocks == 0:
+        return 0
+
+    if len(blockAddrs) == numBlocks and hasattr(blockAddrs, 'maxAddr'):
+        return blockAddrs.maxAddr
+
+    if np is not None:
+        return int(np.frombuffer(blockAddrs, dtype=np.uint32, count=numBlocks).max())
 
+    return max(memoryview(blockAddrs)[:numBlocks])
 
-def decompressDXT1(data, width, height):
-    if not isinstance(data, bytes):
-        try:
-            data = bytes(data)
 
-        except:
-            print("Couldn't decompress data")
-            return b''
+def getBlocks(data, width, height, bpp, blockAddrs, blkWidth=4, blkHeight=4):
+    """
+    Returns a view of the data holding the blocks of a width x height surface,
+    or None if they can't be read.
+    blockAddrs can give the position of every block (in linear order) inside the data,
+    e.g. to decode a swizzled surface directly.
+    """
+    try:
+        data = memoryview(data).cast('B')
 
-    csize = ((width + 3) // 4) * ((height + 3) // 4) * 8
+    except:
+        print("Couldn't decompress data")
+        return None
+
+    numBlocks = ((width + blkWidth - 1) // blkWidth) * ((height + blkHeight - 1) // blkHeight)
+
+    if blockAddrs is not None:
+        if len(blockAddrs) < numBlocks or getMaxAddr(blockAddrs, numBlocks) + bpp > len(data):
+            print("Compressed data is incomplete")
+            return None
+
+        return data
+
+    csize = numBlocks * bpp
     if len(data) < csize:
         print("Compressed data is incomplete")
+        return None
+
+    return data[:csize]
+
+
+def decompressBands(decompress, data, width, height, bpp, blockAddrs, numWorkers, *args,
+                    texelSize=4, blkWidth=4, blkHeight=4):
+    """
+    Decodes the surface with decompress (a function of the decoder module)
+    straight into one output buffer, split into up to numWorkers bands of block rows
+    that are decoded on the thread pool.
+    The compiled decoders release the GIL, the pure Python one gains nothing.
+    """
+    blocksX = (width + blkWidth - 1) // blkWidth
+    blocksY = (height + blkHeight - 1) // blkHeight
+
+    numBands = max(1, min(numWorkers or 1, blocksY * blkHeight // (minBandRows * 4)))
+    bandRows = max(1, (blocksY + numBands - 1) // numBands)
+
+    output = bytearray(width * height * texelSize)
+    out = memoryview(output)
+
+    def decompressBand(startRow):
+        endRow = min(startRow + bandRows, blocksY)
+        bandHeight = min(height, endRow * blkHeight) - startRow * blkHeight
+
+        start = startRow * blocksX
+        end = endRow * blocksX
+
+        pos = startRow * blkHeight * width * texelSize
+        band = out[pos:pos + bandHeight * width * texelSize]
+
+        if blockAddrs is None:
+            decompress(data[start * bpp:end * bpp], width, bandHeight, *args, None, output=band)
+
+        else:
+            decompress(data, width, bandHeight, *args, blockAddrs[start:end], output=band)
+
+    pool.map(decompressBand, range(0, blocksY, bandRows), level=0)
+
+    return output
+
+
+def decompressDXT1(data, width, height, blockAddrs=None, numWorkers=1):
+    data = getBlocks(data, width, height, 8, blockAddrs)
+    if data is None:
         return b''
 
-    data = data[:csize]
-    return decompress_.decompressDXT1(data, width, height)
+    return decompressBands(decompress_.decompressDXT1, data, width, height, 8, blockAddrs, numWorkers)
+
 
+def decompressDXT3(data, width, height, blockAddrs=None, numWorkers=1):
+    data = getBlocks(data, width, height, 16, blockAddrs)
+    if data is None:
+        return b''
 
-def decompressDXT3(data, width, height):
-    if not isinstance(data, bytes):
-        try:
-            data = bytes(data)
+    return decompressBands(decompress_.decompressDXT3, data, width, height, 16, blockAddrs, numWorkers)
 
-        except:
-            print("Couldn't decompress data")
-            return b''
 
-    csize = ((width + 3) // 4) * ((height + 3) // 4) * 16
-    if len(data) < csize:
-        print("Compressed data is incomplete")
+def decompressDXT5(data, width, height, blockAddrs=None, numWorkers=1):
+    data = getBlocks(data, width, height, 16, blockAddrs)
+    if data is None:
         return b''
 
-    data = data[:csize]
-    return decompress_.decompressDXT3(data, width, height)
+    return decompressBands(decompress_.decompressDXT5, data, width, height, 16, blockAddrs, numWorkers)
 
 
-def decompressDXT5(data, width, height):
-    if not isinstance(data, bytes):
-        try:
-            data = bytes(data)
+def decompressBC4(data, width, height, SNORM=0, blockAddrs=None, numWorkers=1):
+    data = getBlocks(data, width, height, 8, blockAddrs)
+    if data is None:
+        return b''
 
-        except:
-            print("Couldn't decompress data")
-            return b''
+    return decompressBands(decompress_.decompressBC4, data, width, height, 8, blockAddrs, numWorkers, SNORM)
 
-    csize = ((width + 3) // 4) * ((height + 3) // 4) * 16
-    if len(data) < csize:
-        print("Compressed data is incomplete")
+
+def decompressBC5(data, width, height, SNORM=0, blockAddrs=None, numWorkers=1):
+    data = getBlocks(data, width, height, 16, blockAddrs)
+    if data is None:
         return b''
 
-    data = data[:csize]
-    return decompress_.decompressDXT5(data, width, height)
+    return decompressBands(decompress_.decompressBC5, data, width, height, 16, blockAddrs, numWorkers, SNORM)
 
 
-def decompressBC4(data, width, height, SNORM=0):
-    if not isinstance(data, bytes):
-        try:
-            data = bytes(data)
+def decompressBC6H(data, width, height, SNORM=0, blockAddrs=None, numWorkers=1):
+    """
+    Returns the texels tonemapped to RGBA8, for previews.
+    """
+    if decompress_bc6h is None:
+        print("BC6H decompression requires NumPy")
+        return b''
 
-        except:
-            print("Couldn't decompress data")
-            return b''
+    data = getBlocks(data, width, height, 16, blockAddrs)
+    if data is None:
+        return b''
 
-    csize = ((width + 3) // 4) * ((height + 3) // 4) * 8
-    if len(data) < csize:
-        print("Compressed data is incomplete")
+    return decompressBands(decompress_bc6h.decompressBC6H, data, width, height, 16, blockAddrs, numWorkers, SNORM)
+
+
+def decompressBC6HFloat(data, width, height, SNORM=0, blockAddrs=None, numWorkers=1):
+    """
+    Returns the texels as RGBA half floats (alpha is 1).
+    """
+    if decompress_bc6h is None:
+        print("BC6H decompression requires NumPy")
         return b''
 
-    data = data[:csize]
-    return decompress_.decompressBC4(data, width, height, SNORM)
+    data = getBlocks(data, width, height, 16, blockAddrs)
+    if data is None:
+        return b''
 
+    return decompressBands(decompress_bc6h.decompressBC6HFloat, data, width, height, 16, blockAddrs, numWorkers, SNORM,
+                           texelSize=8)
 
-def decompressBC5(data, width, height, SNORM=0):
-    if not isinstance(data, bytes):
-        try:
-            data = bytes(data)
 
-        except:
-            print("Couldn't decompress data")
-            return b''
+def decompressBC7(data, width, height, blockAddrs=None, numWorkers=1):
+    if decompress_bc7 is None:
+        print("BC7 decompression requires NumPy")
+        return b''
 
-    csize = ((width + 3) // 4) * ((height + 3) // 4) * 16
-    if len(data) < csize:
+    data = getBlocks(data, width, height, 16, blockAddrs)
+    if data is None:
+        return b''
+
+    return decompressBands(decompress_bc7.decompressBC7, data, width, height, 16, blockAddrs, numWorkers)
+
+
+def decompressASTC(data, width, height, blkWidth, blkHeight, SRGB=0, blockAddrs=None, numWorkers=1):
+    """
+    Decodes an ASTC LDR surface with blkWidth x blkHeight blocks to RGBA8.
+    Invalid and HDR blocks decode to magenta.
+    """
+    data = getBlocks(data, width, height, 16, blockAddrs, blkWidth, blkHeight)
+    if data is None:
+        return b''
+
+    return decompressBands(decompress_astc_.decompressASTC, data, width, height, 16, blockAddrs, numWorkers,
+                           blkWidth, blkHeight, SRGB, blkWidth=blkWidth, blkHeight=blkHeight)
+
+
+def thumbnailDXT1(data, width, height, blockAddrs=None):
+    """
+    Returns a quarter-size RGBA8 image, one texel per block
+    (the average of its endpoints), without decoding the texels of any block.
+    """
+    data = getBlocks(data, width, height, 8, blockAddrs)
+    if data is None:
+        return b''
+
+    return bytes(decompress_.thumbnailDXT1(data, width, height, blockAddrs))
+
+
+def thumbnailDXT3(data, width, height, blockAddrs=None):
+    data = getBlocks(data, width, height, 16, blockAddrs)
+    if data is None:
+        return b''
+
+    return bytes(decompress_.thumbnailDXT3(data, width, height, blockAddrs))
+
+
+def thumbnailDXT5(data, width, height, blockAddrs=None):
+    data = getBlocks(data, width, height, 16, blockAddrs)
+    if data is None:
+        return b''
+
+    return bytes(decompress_.thumbnailDXT5(data, width, height, blockAddrs))
+
+
+def thumbnailBC4(data, width, height, SNORM=0, blockAddrs=None):
+    data = getBlocks(data, width, height, 8, blockAddrs)
+    if data is None:
+        return b''
+
+    return bytes(decompress_.thumbnailBC4(data, width, height, SNORM, blockAddrs))
+
+
+def thumbnailBC5(data, width, height, SNORM=0, blockAddrs=None):
+    data = getBlocks(data, width, height, 16, blockAddrs)
+    if data is None:
+        return b''
+
+    return bytes(decompress_.thumbnailBC5(data, width, height, SNORM, blockAddrs))
+
+
+def decompressRegion(decompress, data, width, height, x, y, regionWidth, regionHeight, *args,
+                     bpp=None, texelSize=None, blkWidth=None, blkHeight=None):
+    """
+    Decodes only the blocks of a width x height surface that cover the
+    regionWidth x regionHeight texel rectangle at (x, y) using decompress
+    (one of the functions above), and returns the texel data of the rectangle.
+    bpp, texelSize, blkWidth and blkHeight describe the format the same way they
+    do for decompressBands; when left out they are taken from decompress
+    (and from the block size in args for decompressASTC).
+    """
+    try:
+        data = memoryview(data).cast('B')
+
+    except:
+        print("Couldn't decompress data")
+        return b''
+
+    if bpp is None:
+        bpp = 8 if decompress in [decompressDXT1, decompressBC4] else 16
+
+    if texelSize is None:
+        texelSize = 8 if decompress is decompressBC6HFloat else 4
+
+    if blkWidth is None:
+        blkWidth = args[0] if decompress is decompressASTC else 4
+
+    if blkHeight is None:
+        blkHeight = args[1] if decompress is decompressASTC else 4
+
+    blkX = x // blkWidth
+    blkY = y // blkHeight
+    blocksX = (x + regionWidth + blkWidth - 1) // blkWidth - blkX
+    blocksY = (y + regionHeight + blkHeight - 1) // blkHeight - blkY
+
+    rowSize = ((width + blkWidth - 1) // blkWidth) * bpp
+    if len(data) < rowSize * (blkY + blocksY):
         print("Compressed data is incomplete")
         return b''
 
-    data = data[:csize]
-    return decompress_.decompressBC5(data, width, height, SNORM)
+    blocks = b''.join([
+        data[row * rowSize + blkX * bpp:row * rowSize + (blkX + blocksX) * bpp]
+        for row in range(blkY, blkY + blocksY)
+    ])
+
+    regionStride = blocksX * blkWidth
+    decompressed = memoryview(decompress(blocks, regionStride, blocksY * blkHeight, *args)).cast('B')
+    if len(decompressed) != regionStride * blocksY * blkHeight * texelSize:
+        print("Decompressed data doesn't match the texel size")
+        return b''
+
+    x -= blkX * blkWidth
+    y -= blkY * blkHeight
+
+    return b''.join([
+        decompressed[(row * regionStride + x) * texelSize:(row * regionStride + x + regionWidth) * texelSize]
+        for row in range(y, y + regionHeight)
+    ])
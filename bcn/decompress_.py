@@ -38,295 +38,261 @@ def ToUnsigned8(v):
     return v
 
 
-def EXP5TO8R(packedcol):
-    return (((packedcol) >> 8) & 0xf8) | (((packedcol) >> 13) & 0x07)
+def EXP4TO8(col):
+    return col | col << 4
 
 
-def EXP6TO8G(packedcol):
-    return (((packedcol) >> 3) & 0xfc) | (((packedcol) >>  9) & 0x03)
+# 5/6-bit to 8-bit channel expansion tables
+EXP5TO8 = bytes((v << 3) | (v >> 2) for v in range(32))
+EXP6TO8 = bytes((v << 2) | (v >> 4) for v in range(64))
 
+# 2-bit color codes of the 4 texels of a block row, by index byte
+COLOR_CODES = [(b & 3, (b >> 2) & 3, (b >> 4) & 3, b >> 6) for b in range(256)]
 
-def EXP5TO8B(packedcol):
-    return (((packedcol) << 3) & 0xf8) | (((packedcol) >>  2) & 0x07)
 
+def getColorPalette(color0, color1, dxt_type):
+    """
+    Returns the 4 RGBA8 colors a DXT1/3/5 color block can index.
+    """
+    R0, G0, B0 = EXP5TO8[color0 >> 11], EXP6TO8[(color0 >> 5) & 0x3f], EXP5TO8[color0 & 0x1f]
+    R1, G1, B1 = EXP5TO8[color1 >> 11], EXP6TO8[(color1 >> 5) & 0x3f], EXP5TO8[color1 & 0x1f]
 
-def EXP4TO8(col):
-    return col | col << 4
+    if color0 > color1:
+        color2 = ((R0 * 2 + R1) // 3, (G0 * 2 + G1) // 3, (B0 * 2 + B1) // 3, 255)
 
+    else:
+        color2 = ((R0 + R1) // 2, (G0 + G1) // 2, (B0 + B1) // 2, 255)
 
-def dxt135_decode_imageblock(pixdata, img_block_src, i, j, dxt_type):
-    color0 = pixdata[img_block_src] | (pixdata[img_block_src + 1] << 8)
-    color1 = pixdata[img_block_src + 2] | (pixdata[img_block_src + 3] << 8)
-    bits = (pixdata[img_block_src + 4] | (pixdata[img_block_src + 5] << 8) |
-            (pixdata[img_block_src + 6] << 16) | (pixdata[img_block_src + 7] << 24))
+    if dxt_type > 1 or color0 > color1:
+        color3 = ((R0 + R1 * 2) // 3, (G0 + G1 * 2) // 3, (B0 + B1 * 2) // 3, 255)
 
-    bit_pos = 2 * (j * 4 + i)
-    code = (bits >> bit_pos) & 3
+    elif dxt_type == 1:
+        color3 = (0, 0, 0, 0)
 
-    ACOMP = 255
-    if code == 0:
-        RCOMP = EXP5TO8R(color0)
-        GCOMP = EXP6TO8G(color0)
-        BCOMP = EXP5TO8B(color0)
+    else:
+        color3 = (0, 0, 0, 255)
 
-    elif code == 1:
-        RCOMP = EXP5TO8R(color1)
-        GCOMP = EXP6TO8G(color1)
-        BCOMP = EXP5TO8B(color1)
+    return [bytes((R0, G0, B0, 255)), bytes((R1, G1, B1, 255)), bytes(color2), bytes(color3)]
 
-    elif code == 2:
-        if color0 > color1:
-            RCOMP = ((EXP5TO8R(color0) * 2 + EXP5TO8R(color1)) // 3)
-            GCOMP = ((EXP6TO8G(color0) * 2 + EXP6TO8G(color1)) // 3)
-            BCOMP = ((EXP5TO8B(color0) * 2 + EXP5TO8B(color1)) // 3)
 
-        else:
-            RCOMP = ((EXP5TO8R(color0) + EXP5TO8R(color1)) // 2)
-            GCOMP = ((EXP6TO8G(color0) + EXP6TO8G(color1)) // 2)
-            BCOMP = ((EXP5TO8B(color0) + EXP5TO8B(color1)) // 2)
+def getAlphaPalette(alpha0, alpha1):
+    """
+    Returns the 8 values a DXT5/BC4 alpha block can index.
+    """
+    if alpha0 > alpha1:
+        return [alpha0, alpha1] + [(alpha0 * (8 - code) + (alpha1 * (code - 1))) // 7 for code in range(2, 8)]
 
-    elif code == 3:
-        if dxt_type > 1 or color0 > color1:
-            RCOMP = ((EXP5TO8R(color0) + EXP5TO8R(color1) * 2) // 3)
-            GCOMP = ((EXP6TO8G(color0) + EXP6TO8G(color1) * 2) // 3)
-            BCOMP = ((EXP5TO8B(color0) + EXP5TO8B(color1) * 2) // 3)
+    return [alpha0, alpha1] + [(alpha0 * (6 - code) + (alpha1 * (code - 1))) // 5 for code in range(2, 6)] + [0, 255]
 
-        else:
-            RCOMP = 0
-            GCOMP = 0
-            BCOMP = 0
 
-            if dxt_type == 1:
-                ACOMP = 0
- 
-    return ACOMP, RCOMP, GCOMP, BCOMP
+def getAlphaPaletteSigned(alpha0, alpha1):
+    """
+    Returns the 8 values a BC4/BC5 SNORM block can index, biased by 128.
+    """
+    alpha0_ = ToSigned8(alpha0)
+    alpha1_ = ToSigned8(alpha1)
 
+    if alpha0_ > alpha1_:
+        palette = [alpha0, alpha1] + [ToUnsigned8((alpha0_ * (8 - code) + (alpha1_ * (code - 1))) // 7) for code in range(2, 8)]
 
-def dxt5_decode_alphablock(pixdata, blksrc, i, j):
-    alpha0 = pixdata[blksrc]
-    alpha1 = pixdata[blksrc + 1]
+    else:
+        palette = [alpha0, alpha1] + [ToUnsigned8((alpha0_ * (6 - code) + (alpha1_ * (code - 1))) // 5) for code in range(2, 6)] + [0x80, 0x7f]
 
-    bits = (pixdata[blksrc] | (pixdata[blksrc + 1] << 8) |
-            (pixdata[blksrc + 2] << 16) | (pixdata[blksrc + 3] << 24) |
-            (pixdata[blksrc + 4] << 32) | (pixdata[blksrc + 5] << 40) |
-            (pixdata[blksrc + 6] << 48) | (pixdata[blksrc + 7] << 56)) >> 16
+    return [ToSigned8(value) + 128 for value in palette]
 
-    for y in range(4):
-        for x in range(4):
-            if (x, y) == (i, j):
-                code = bits & 0x07
-                break
 
-            bits >>= 3
+def dxt135_decode_imageblock(pixdata, img_block_src, dxt_type):
+    """
+    Returns the 16 texels of a color block as RGBA8, row after row.
+    """
+    color0 = pixdata[img_block_src] | (pixdata[img_block_src + 1] << 8)
+    color1 = pixdata[img_block_src + 2] | (pixdata[img_block_src + 3] << 8)
 
-    if code == 0:
-        ACOMP = alpha0
+    palette = getColorPalette(color0, color1, dxt_type)
 
-    elif code == 1:
-        ACOMP = alpha1
+    return b''.join([palette[code] for row in pixdata[img_block_src + 4:img_block_src + 8]
+                                   for code in COLOR_CODES[row]])
 
-    elif alpha0 > alpha1:
-        ACOMP = (alpha0 * (8 - code) + (alpha1 * (code - 1))) // 7
 
-    elif code < 6:
-        ACOMP = (alpha0 * (6 - code) + (alpha1 * (code - 1))) // 5
+def dxt3_decode_alphablock(pixdata, blksrc):
+    bits = int.from_bytes(pixdata[blksrc:blksrc + 8], 'little')
 
-    elif code == 6:
-        ACOMP = 0
+    return bytes(EXP4TO8((bits >> (4 * k)) & 0xf) for k in range(16))
 
-    else:
-        ACOMP = 255
 
-    return ACOMP
+def dxt5_decode_alphablock(pixdata, blksrc, palette):
+    bits = int.from_bytes(pixdata[blksrc + 2:blksrc + 8], 'little')
 
+    return bytes(palette[(bits >> (3 * k)) & 7] for k in range(16))
 
-def dxt5_decode_alphablock_signed(pixdata, blksrc, i, j):
-    alpha0 = pixdata[blksrc]
-    alpha1 = pixdata[blksrc + 1]
 
-    bits = (pixdata[blksrc] | (pixdata[blksrc + 1] << 8) |
-            (pixdata[blksrc + 2] << 16) | (pixdata[blksrc + 3] << 24) |
-            (pixdata[blksrc + 4] << 32) | (pixdata[blksrc + 5] << 40) |
-            (pixdata[blksrc + 6] << 48) | (pixdata[blksrc + 7] << 56)) >> 16
+def iterBlocks(width, height, bpp, blockAddrs):
+    """
+    Yields the position in the data and the texel coordinates of every block.
+    """
+    blocksX = (width + 3) // 4
 
-    for y in range(4):
-        for x in range(4):
-            if (x, y) == (i, j):
-                code = bits & 0x07
-                break
+    for y in range(0, height, 4):
+        for x in range(0, width, 4):
+            blkIdx = (y // 4) * blocksX + x // 4
+            yield (blkIdx * bpp if blockAddrs is None else blockAddrs[blkIdx]), x, y
 
-            bits >>= 3
 
-    if code == 0:
-        ACOMP = alpha0
+def writeBlock(output, block, width, height, x, y):
+    """
+    Copies the 4x4 RGBA8 texels of a block to the output, clipped to the surface.
+    """
+    rowSize = min(4, width - x) * 4
 
-    elif code == 1:
-        ACOMP = alpha1
+    for row in range(min(4, height - y)):
+        pos = ((y + row) * width + x) * 4
+        output[pos:pos + rowSize] = block[row * 16:row * 16 + rowSize]
 
-    elif ToSigned8(alpha0) > ToSigned8(alpha1):
-        ACOMP = ToUnsigned8((ToSigned8(alpha0) * (8 - code) + (ToSigned8(alpha1) * (code - 1))) // 7)
 
-    elif code < 6:
-        ACOMP = ToUnsigned8((ToSigned8(alpha0) * (6 - code) + (ToSigned8(alpha1) * (code - 1))) // 5)
+def getOutput(output, width, height):
+    """
+    Returns a view of the RGBA8 buffer to decode the surface into,
+    or a new one if output is None.
+    """
+    if output is None:
+        return bytearray(width * height * 4)
 
-    elif code == 6:
-        ACOMP = 0x80
+    return memoryview(output).cast('B')
 
-    else:
-        ACOMP = 0x7f
 
-    return ACOMP
+def decompressDXT1(data, width, height, blockAddrs=None, output=None):
+    output = getOutput(output, width, height)
 
+    for blksrc, x, y in iterBlocks(width, height, 8, blockAddrs):
+        writeBlock(output, dxt135_decode_imageblock(data, blksrc, 1), width, height, x, y)
 
-def fetch_2d_texel_rgba_dxt1(srcRowStride, pixdata, i, j):
-    blksrc = ((srcRowStride + 3) // 4 * (j // 4) + (i // 4)) * 8
-    ACOMP, RCOMP, GCOMP, BCOMP = dxt135_decode_imageblock(pixdata, blksrc, i & 3, j & 3, 1)
- 
-    return RCOMP, GCOMP, BCOMP, ACOMP
+    return output
 
 
-def fetch_2d_texel_rgba_dxt3(srcRowStride, pixdata, i, j):
-    blksrc = ((srcRowStride + 3) // 4 * (j // 4) + (i // 4)) * 16
-    ACOMP, RCOMP, GCOMP, BCOMP = dxt135_decode_imageblock(pixdata, blksrc + 8, i & 3, j & 3, 2)
+def decompressDXT3(data, width, height, blockAddrs=None, output=None):
+    output = getOutput(output, width, height)
 
-    anibble = (pixdata[blksrc + ((j & 3) * 4 + (i & 3)) // 2] >> (4 * (i & 1))) & 0xf
-    ACOMP = EXP4TO8(anibble)
- 
-    return RCOMP, GCOMP, BCOMP, ACOMP
+    for blksrc, x, y in iterBlocks(width, height, 16, blockAddrs):
+        block = bytearray(dxt135_decode_imageblock(data, blksrc + 8, 2))
+        block[3::4] = dxt3_decode_alphablock(data, blksrc)
 
+        writeBlock(output, block, width, height, x, y)
 
-def fetch_2d_texel_rgba_dxt5(srcRowStride, pixdata, i, j):
-    blksrc = ((srcRowStride + 3) // 4 * (j // 4) + (i // 4)) * 16
+    return output
 
-    ACOMP = dxt5_decode_alphablock(pixdata, blksrc, i & 3, j & 3)
-    _, RCOMP, GCOMP, BCOMP = dxt135_decode_imageblock(pixdata, blksrc + 8, i & 3, j & 3, 2)
 
-    return RCOMP, GCOMP, BCOMP, ACOMP
+def decompressDXT5(data, width, height, blockAddrs=None, output=None):
+    output = getOutput(output, width, height)
 
+    for blksrc, x, y in iterBlocks(width, height, 16, blockAddrs):
+        block = bytearray(dxt135_decode_imageblock(data, blksrc + 8, 2))
+        block[3::4] = dxt5_decode_alphablock(data, blksrc, getAlphaPalette(data[blksrc], data[blksrc + 1]))
 
-def fetch_2d_texel_r_bc4(srcRowStride, pixdata, i, j):
-    blksrc = ((srcRowStride + 3) // 4 * (j // 4) + (i // 4)) * 8
-    RCOMP = dxt5_decode_alphablock(pixdata, blksrc, i & 3, j & 3)
- 
-    return RCOMP
+        writeBlock(output, block, width, height, x, y)
 
+    return output
 
-def fetch_2d_texel_r_bc4_snorm(srcRowStride, pixdata, i, j):
-    blksrc = ((srcRowStride + 3) // 4 * (j // 4) + (i // 4)) * 8
-    RCOMP = dxt5_decode_alphablock_signed(pixdata, blksrc, i & 3, j & 3)
- 
-    return RCOMP
 
+def decompressBC4(data, width, height, SNORM, blockAddrs=None, output=None):
+    output = getOutput(output, width, height)
+    getPalette = getAlphaPaletteSigned if SNORM else getAlphaPalette
 
-def fetch_2d_texel_rg_bc5(srcRowStride, pixdata, i, j):
-    blksrc = ((srcRowStride + 3) // 4 * (j // 4) + (i // 4)) * 16
+    block = bytearray(b'\xff' * 64)
 
-    RCOMP = dxt5_decode_alphablock(pixdata, blksrc, i & 3, j & 3)
-    GCOMP = dxt5_decode_alphablock(pixdata, blksrc + 8, i & 3, j & 3)
- 
-    return RCOMP, GCOMP
+    for blksrc, x, y in iterBlocks(width, height, 8, blockAddrs):
+        R = dxt5_decode_alphablock(data, blksrc, getPalette(data[blksrc], data[blksrc + 1]))
 
+        block[0::4] = R
+        block[1::4] = R
+        block[2::4] = R
 
-def fetch_2d_texel_rg_bc5_snorm(srcRowStride, pixdata, i, j):
-    blksrc = ((srcRowStride + 3) // 4 * (j // 4) + (i // 4)) * 16
+        writeBlock(output, block, width, height, x, y)
 
-    RCOMP = dxt5_decode_alphablock_signed(pixdata, blksrc, i & 3, j & 3)
-    GCOMP = dxt5_decode_alphablock_signed(pixdata, blksrc + 8, i & 3, j & 3)
- 
-    return RCOMP, GCOMP
+    return output
 
 
-def decompressDXT1(data, width, height):
-    output = bytearray(width * height * 4)
- 
-    for y in range(height):
-        for x in range(width):
-            R, G, B, A = fetch_2d_texel_rgba_dxt1(width, data, x, y)
+def decompressBC5(data, width, height, SNORM, blockAddrs=None, output=None):
+    output = getOutput(output, width, height)
+    getPalette = getAlphaPaletteSigned if SNORM else getAlphaPalette
 
-            pos = (y * width + x) * 4
+    block = bytearray(b'\0\0\0\xff' * 16)
 
-            output[pos + 0] = R
-            output[pos + 1] = G
-            output[pos + 2] = B
-            output[pos + 3] = A
- 
-    return bytes(output)
+    for blksrc, x, y in iterBlocks(width, height, 16, blockAddrs):
+        block[0::4] = dxt5_decode_alphablock(data, blksrc, getPalette(data[blksrc], data[blksrc + 1]))
+        block[1::4] = dxt5_decode_alphablock(data, blksrc + 8, getPalette(data[blksrc + 8], data[blksrc + 9]))
 
+        writeBlock(output, block, width, height, x, y)
 
-def decompressDXT3(data, width, height):
-    output = bytearray(width * height * 4)
- 
-    for y in range(height):
-        for x in range(width):
-            R, G, B, A = fetch_2d_texel_rgba_dxt3(width, data, x, y)
+    return output
 
-            pos = (y * width + x) * 4
 
-            output[pos + 0] = R
-            output[pos + 1] = G
-            output[pos + 2] = B
-            output[pos + 3] = A
- 
-    return bytes(output)
+def getColorAverage(pixdata, blksrc):
+    """
+    Returns the average of the two endpoint colors of a color block as RGB8.
+    """
+    color0 = pixdata[blksrc] | (pixdata[blksrc + 1] << 8)
+    color1 = pixdata[blksrc + 2] | (pixdata[blksrc + 3] << 8)
+
+    return ((EXP5TO8[color0 >> 11] + EXP5TO8[color1 >> 11] + 1) // 2,
+            (EXP6TO8[(color0 >> 5) & 0x3f] + EXP6TO8[(color1 >> 5) & 0x3f] + 1) // 2,
+            (EXP5TO8[color0 & 0x1f] + EXP5TO8[color1 & 0x1f] + 1) // 2)
+
+
+def getAlphaAverage(alpha0, alpha1, SNORM=0):
+    """
+    Returns the average of the two endpoints of a DXT5/BC4 alpha block
+    (biased by 128 if SNORM, as the decoders return them).
+    """
+    if SNORM:
+        return (ToSigned8(alpha0) + ToSigned8(alpha1) + 1) // 2 + 128
 
+    return (alpha0 + alpha1 + 1) // 2
 
-def decompressDXT5(data, width, height):
-    output = bytearray(width * height * 4)
- 
-    for y in range(height):
-        for x in range(width):
-            R, G, B, A = fetch_2d_texel_rgba_dxt5(width, data, x, y)
 
-            pos = (y * width + x) * 4
+def thumbnailDXT1(data, width, height, blockAddrs=None):
+    output = bytearray()
+
+    for blksrc, _, _ in iterBlocks(width, height, 8, blockAddrs):
+        output += bytes(getColorAverage(data, blksrc) + (255,))
 
-            output[pos + 0] = R
-            output[pos + 1] = G
-            output[pos + 2] = B
-            output[pos + 3] = A
- 
     return bytes(output)
 
 
-def decompressBC4(data, width, height, SNORM):
-    output = bytearray(width * height * 4)
+def thumbnailDXT3(data, width, height, blockAddrs=None):
+    output = bytearray()
+
+    for blksrc, _, _ in iterBlocks(width, height, 16, blockAddrs):
+        # DXT3 has no alpha endpoints, average its 16 explicit values instead
+        alpha = sum(((b & 0xf) + (b >> 4)) for b in data[blksrc:blksrc + 8])
+        output += bytes(getColorAverage(data, blksrc + 8) + ((alpha * 17 + 8) // 16,))
+
+    return bytes(output)
 
-    for y in range(height):
-        for x in range(width):
-            if SNORM:
-                R = ToSigned8(fetch_2d_texel_r_bc4_snorm(width, data, x, y)) + 128
 
-            else:
-                R = fetch_2d_texel_r_bc4(width, data, x, y)
+def thumbnailDXT5(data, width, height, blockAddrs=None):
+    output = bytearray()
 
-            pos = (y * width + x) * 4
+    for blksrc, _, _ in iterBlocks(width, height, 16, blockAddrs):
+        output += bytes(getColorAverage(data, blksrc + 8) + (getAlphaAverage(data[blksrc], data[blksrc + 1]),))
 
-            output[pos + 0] = R
-            output[pos + 1] = R
-            output[pos + 2] = R
-            output[pos + 3] = 255
- 
     return bytes(output)
 
 
-def decompressBC5(data, width, height, SNORM):
-    output = bytearray(width * height * 4)
+def thumbnailBC4(data, width, height, SNORM, blockAddrs=None):
+    output = bytearray()
+
+    for blksrc, _, _ in iterBlocks(width, height, 8, blockAddrs):
+        R = getAlphaAverage(data[blksrc], data[blksrc + 1], SNORM)
+        output += bytes((R, R, R, 255))
 
-    for y in range(height):
-        for x in range(width):
-            if SNORM:
-                R, G = fetch_2d_texel_rg_bc5_snorm(width, data, x, y)
+    return bytes(output)
 
-                R = ToSigned8(R) + 128
-                G = ToSigned8(G) + 128
 
-            else:
-                R, G = fetch_2d_texel_rg_bc5(width, data, x, y)
+def thumbnailBC5(data, width, height, SNORM, blockAddrs=None):
+    output = bytearray()
 
-            pos = (y * width + x) * 4
+    for blksrc, _, _ in iterBlocks(width, height, 16, blockAddrs):
+        output += bytes((getAlphaAverage(data[blksrc], data[blksrc + 1], SNORM),
+                         getAlphaAverage(data[blksrc + 8], data[blksrc + 9], SNORM), 0, 255))
 
-            output[pos + 0] = R
-            output[pos + 1] = G
-            output[pos + 2] = 0
-            output[pos + 3] = 255
- 
     return bytes(output)
@@ -0,0 +1,684 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# ASTC Decompressor
+# Version 0.1
+# Copyright © 2018 MasterVermilli0n / AboodXD
+
+# decompress_astc.py
+# An ASTC LDR (2D) decompressor in Python, decoding to RGBA8 like the decode_unorm8 mode.
+# The tables of every block footprint are computed once and shared with decompress_astc_cy.
+
+################################################################
+################################################################
+
+from array import array
+
+
+# Number of bits, trits and quints of every quantization level (2, 3, 4, 5, 6, 8, 10, ... 256 values)
+ISE_PARAMS = [
+    (1, 0, 0), (0, 1, 0), (2, 0, 0), (0, 0, 1), (1, 1, 0), (3, 0, 0), (1, 0, 1),
+    (2, 1, 0), (4, 0, 0), (2, 0, 1), (3, 1, 0), (5, 0, 0), (3, 0, 1), (4, 1, 0),
+    (6, 0, 0), (4, 0, 1), (5, 1, 0), (7, 0, 0), (5, 0, 1), (6, 1, 0), (8, 0, 0),
+]
+
+# Bit pattern and multiplier of the trit/quint unquantization, by number of bits
+COLOR_UNQUANT_TRITS = {1: ("000000000", 204), 2: ("b000b0bb0", 93), 3: ("cb000cbcb", 44),
+                       4: ("dcb000dcb", 22), 5: ("edcb000ed", 11), 6: ("fedcb000f", 5)}
+COLOR_UNQUANT_QUINTS = {1: ("000000000", 113), 2: ("b0000bb00", 54), 3: ("cb0000cbc", 26),
+                        4: ("dcb0000dc", 13), 5: ("edcb0000e", 6)}
+WEIGHT_UNQUANT_TRITS = {1: ("0000000", 50), 2: ("b000b0b", 23), 3: ("cb000cb", 11)}
+WEIGHT_UNQUANT_QUINTS = {1: ("0000000", 28), 2: ("b0000b0", 13)}
+
+# Decoded color of invalid blocks
+ERROR_COLOR = (255, 0, 255, 255)
+
+# Fields of every entry of Footprint.modes
+MODE_VALID, MODE_WEIGHT_WIDTH, MODE_WEIGHT_HEIGHT, MODE_DUAL_PLANE, MODE_WEIGHT_QUANT, \
+    MODE_WEIGHT_COUNT, MODE_WEIGHT_BITS, MODE_INFILL = range(8)
+
+MODE_SIZE = 8
+
+
+def getISEBitCount(count, quant):
+    """
+    Returns the number of bits a sequence of count values of a quantization level takes.
+    """
+    bits, trits, quints = ISE_PARAMS[quant]
+    return bits * count + trits * ((8 * count + 4) // 5) + quints * ((7 * count + 2) // 3)
+
+
+def decodeTrits(T):
+    """
+    Returns the 5 trits packed in 8 bits.
+    """
+    if (T >> 2) & 7 == 7:
+        C = ((T >> 5) << 2) | (T & 3)
+        t4 = t3 = 2
+
+    else:
+        C = T & 0x1f
+        if (T >> 5) & 3 == 3:
+            t4 = 2
+            t3 = T >> 7
+
+        else:
+            t4 = T >> 7
+            t3 = (T >> 5) & 3
+
+    if C & 3 == 3:
+        t2 = 2
+        t1 = C >> 4
+        t0 = (((C >> 3) & 1) << 1) | ((C >> 2) & 1 & ~(C >> 3))
+
+    elif (C >> 2) & 3 == 3:
+        t2 = t1 = 2
+        t0 = C & 3
+
+    else:
+        t2 = C >> 4
+        t1 = (C >> 2) & 3
+        t0 = (((C >> 1) & 1) << 1) | (C & 1 & ~(C >> 1))
+
+    return t0, t1, t2, t3, t4
+
+
+def decodeQuints(Q):
+    """
+    Returns the 3 quints packed in 7 bits.
+    """
+    if (Q >> 1) & 3 == 3 and (Q >> 5) & 3 == 0:
+        q2 = ((Q & 1) << 2) | ((((Q >> 4) & 1) & ~Q & 1) << 1) | (((Q >> 3) & 1) & ~Q & 1)
+        q1 = q0 = 4
+
+    else:
+        if (Q >> 1) & 3 == 3:
+            q2 = 4
+            C = (((Q >> 3) & 3) << 3) | ((~(Q >> 5) & 3) << 1) | (Q & 1)
+
+        else:
+            q2 = (Q >> 5) & 3
+            C = Q & 0x1f
+
+        if C & 7 == 5:
+            q1 = 4
+            q0 = (C >> 3) & 3
+
+        else:
+            q1 = (C >> 3) & 3
+            q0 = C & 7
+
+    return q0, q1, q2
+
+
+TRITS = [decodeTrits(T) for T in range(256)]
+QUINTS = [decodeQuints(Q) for Q in range(128)]
+
+
+def expandPattern(pattern, value):
+    """
+    Builds the bits of pattern, where 'b', 'c', ... are bits 1, 2, ... of value.
+    """
+    result = 0
+    for c in pattern:
+        result <<= 1
+        if c != '0':
+            result |= (value >> (ord(c) - ord('a'))) & 1
+
+    return result
+
+
+def unquantizeColor(quant, value):
+    bits, trits, quints = ISE_PARAMS[quant]
+
+    if not (trits or quints):
+        # Bit replication
+        value <<= 8 - bits
+        while bits < 8:
+            value |= value >> bits
+            bits *= 2
+
+        return value & 0xff
+
+    pattern, C = (COLOR_UNQUANT_TRITS if trits else COLOR_UNQUANT_QUINTS)[bits]
+    A = 0x1ff if value & 1 else 0
+    B = expandPattern(pattern, value)
+    D = value >> bits
+
+    T = (D * C + B) ^ A
+    return (A & 0x80) | (T >> 2)
+
+
+def unquantizeWeight(quant, value):
+    bits, trits, quints = ISE_PARAMS[quant]
+
+    if not (trits or quints):
+        # Bit replication to 6 bits
+        value <<= 6 - bits
+        while bits < 6:
+            value |= value >> bits
+            bits *= 2
+
+        result = value & 0x3f
+
+    elif not bits:
+        result = ([0, 32, 63] if trits else [0, 16, 32, 47, 63])[value]
+
+    else:
+        pattern, C = (WEIGHT_UNQUANT_TRITS if trits else WEIGHT_UNQUANT_QUINTS)[bits]
+        A = 0x7f if value & 1 else 0
+        B = expandPattern(pattern, value)
+        D = value >> bits
+
+        T = (D * C + B) ^ A
+        result = (A & 0x20) | (T >> 2)
+
+    return result + 1 if result > 32 else result
+
+
+def getNumValues(quant):
+    bits, trits, quints = ISE_PARAMS[quant]
+    return (1 << bits) * (3 if trits else 5 if quints else 1)
+
+
+# Unquantized value of every encoded value, by quantization level (256 entries per level);
+# colors can't use less than 6 values
+COLOR_UNQUANT = array('B', [unquantizeColor(quant, value) if quant >= 4 and value < getNumValues(quant) else 0
+                            for quant in range(21) for value in range(256)])
+
+# Unquantized weight (0 to 64) of every encoded value, by quantization level (32 entries per level)
+WEIGHT_UNQUANT = array('B', [unquantizeWeight(quant, value) if value < getNumValues(quant) else 0
+                             for quant in range(12) for value in range(32)])
+
+# Bit-reversed bytes, to read the weights which are stored from the top of the block
+REVERSED_BYTES = bytes(int('{:08b}'.format(b)[::-1], 2) for b in range(256))
+
+
+def decodeBlockMode(blockMode):
+    """
+    Returns the weight grid size, whether there are two weight planes and the weight
+    quantization level of a block mode, or None if it's reserved.
+    """
+    quant = (blockMode >> 4) & 1
+    H = (blockMode >> 9) & 1
+    D = (blockMode >> 10) & 1
+    A = (blockMode >> 5) & 3
+
+    if blockMode & 3:
+        quant |= (blockMode & 3) << 1
+        B = (blockMode >> 7) & 3
+        layout = (blockMode >> 2) & 3
+
+        if layout == 0:
+            width, height = B + 4, A + 2
+
+        elif layout == 1:
+            width, height = B + 8, A + 2
+
+        elif layout == 2:
+            width, height = A + 2, B + 8
+
+        elif blockMode & 0x100:
+            width, height = (B & 1) + 2, A + 2
+
+        else:
+            width, height = A + 2, (B & 1) + 6
+
+    else:
+        quant |= ((blockMode >> 2) & 3) << 1
+        if not (blockMode >> 2) & 3:
+            return None
+
+        B = (blockMode >> 9) & 3
+        layout = (blockMode >> 7) & 3
+
+        if layout == 0:
+            width, height = 12, A + 2
+
+        elif layout == 1:
+            width, height = A + 2, 12
+
+        elif layout == 2:
+            width, height = A + 6, B + 6
+            D = H = 0
+
+        elif A == 0:
+            width, height = 6, 10
+
+        elif A == 1:
+            width, height = 10, 6
+
+        else:
+            return None
+
+    return width, height, D, quant - 2 + 6 * H
+
+
+def getInfill(blkWidth, blkHeight, weightWidth, weightHeight):
+    """
+    Returns the 4 weight grid points and their bilinear factors (out of 16) for every texel.
+    """
+    Ds = (1024 + blkWidth // 2) // (blkWidth - 1)
+    Dt = (1024 + blkHeight // 2) // (blkHeight - 1)
+    maxPoint = weightWidth * weightHeight - 1
+
+    infill = []
+    for t in range(blkHeight):
+        for s in range(blkWidth):
+            gs = (Ds * s * (weightWidth - 1) + 32) >> 6
+            gt = (Dt * t * (weightHeight - 1) + 32) >> 6
+
+            js, fs = gs >> 4, gs & 0xf
+            jt, ft = gt >> 4, gt & 0xf
+
+            v0 = js + jt * weightWidth
+            w11 = (fs * ft + 8) >> 4
+
+            points = [v0, v0 + 1, v0 + weightWidth, v0 + weightWidth + 1]
+            infill.extend(min(point, maxPoint) for point in points)
+            infill.extend((16 - fs - ft + w11, fs - w11, ft - w11, w11))
+
+    return infill
+
+
+def hash52(p):
+    p ^= p >> 15
+    p = (p - (p << 17)) & 0xffffffff
+    p = (p + (p << 7)) & 0xffffffff
+    p = (p + (p << 4)) & 0xffffffff
+    p ^= p >> 5
+    p = (p + (p << 16)) & 0xffffffff
+    p ^= p >> 7
+    p ^= p >> 3
+    p ^= (p << 6) & 0xffffffff
+    p ^= p >> 17
+    return p
+
+
+def selectPartition(seed, x, y, partitionCount, smallBlock):
+    """
+    Returns the partition of the texel at (x, y), as picked by the ASTC partition hash.
+    """
+    if smallBlock:
+        x <<= 1
+        y <<= 1
+
+    seed += (partitionCount - 1) * 1024
+    rnum = hash52(seed)
+
+    seeds = [(rnum >> shift) & 0xf for shift in (0, 4, 8, 12, 16, 20, 24, 28)]
+    seeds = [s * s for s in seeds]
+
+    if seed & 1:
+        sh1 = 4 if seed & 2 else 5
+        sh2 = 6 if partitionCount == 3 else 5
+
+    else:
+        sh1 = 6 if partitionCount == 3 else 5
+        sh2 = 4 if seed & 2 else 5
+
+    a = ((seeds[0] >> sh1) * x + (seeds[1] >> sh2) * y + (rnum >> 14)) & 0x3f
+    b = ((seeds[2] >> sh1) * x + (seeds[3] >> sh2) * y + (rnum >> 10)) & 0x3f
+    c = ((seeds[4] >> sh1) * x + (seeds[5] >> sh2) * y + (rnum >> 6)) & 0x3f
+    d = ((seeds[6] >> sh1) * x + (seeds[7] >> sh2) * y + (rnum >> 2)) & 0x3f
+
+    if partitionCount < 4:
+        d = 0
+
+    if partitionCount < 3:
+        c = 0
+
+    if a >= b and a >= c and a >= d:
+        return 0
+
+    elif b >= c and b >= d:
+        return 1
+
+    elif c >= d:
+        return 2
+
+    return 3
+
+
+class Footprint:
+    """
+    Block mode and weight infill tables of a block footprint.
+    modes holds MODE_SIZE values for each of the 2048 block modes (see MODE_*),
+    infill 8 values per texel for each weight grid size (see getInfill).
+    """
+    def __init__(self, blkWidth, blkHeight):
+        self.blkWidth = blkWidth
+        self.blkHeight = blkHeight
+        self.texelCount = blkWidth * blkHeight
+        self.smallBlock = self.texelCount < 31
+
+        self.modes = array('i', bytes(2048 * MODE_SIZE * 4))
+        self.infill = array('H')
+        self.partitions = {}
+
+        grids = {}
+        for blockMode in range(2048):
+            mode = decodeBlockMode(blockMode)
+            if mode is None:
+                continue
+
+            weightWidth, weightHeight, dualPlane, quant = mode
+            if weightWidth > blkWidth or weightHeight > blkHeight:
+                continue
+
+            count = weightWidth * weightHeight * (dualPlane + 1)
+            bits = getISEBitCount(count, quant)
+            if count > 64 or not 24 <= bits <= 96:
+                continue
+
+            if (weightWidth, weightHeight) not in grids:
+                grids[(weightWidth, weightHeight)] = len(self.infill)
+                self.infill.extend(getInfill(blkWidth, blkHeight, weightWidth, weightHeight))
+
+            pos = blockMode * MODE_SIZE
+            self.modes[pos:pos + MODE_SIZE] = array('i', [1, weightWidth, weightHeight, dualPlane, quant,
+                                                          count, bits, grids[(weightWidth, weightHeight)]])
+
+    def getPartitions(self, partitionCount, seed):
+        """
+        Returns the partition of every texel for a partition count and index.
+        """
+        key = (partitionCount, seed)
+        partitions = self.partitions.get(key)
+
+        if partitions is None:
+            partitions = self.partitions[key] = bytes(
+                selectPartition(seed, x, y, partitionCount, self.smallBlock)
+                for y in range(self.blkHeight) for x in range(self.blkWidth))
+
+        return partitions
+
+
+footprints = {}
+
+
+def getFootprint(blkWidth, blkHeight):
+    footprint = footprints.get((blkWidth, blkHeight))
+    if footprint is None:
+        footprint = footprints[(blkWidth, blkHeight)] = Footprint(blkWidth, blkHeight)
+
+    return footprint
+
+
+def decodeISE(bits, pos, count, quant):
+    """
+    Returns count values of a quantization level stored from bit pos of bits.
+    """
+    numBits, trits, quints = ISE_PARAMS[quant]
+    mask = (1 << numBits) - 1
+
+    # Bits past the end of the sequence read as zeros
+    bits &= (1 << (pos + getISEBitCount(count, quant))) - 1
+    bits >>= pos
+
+    values = []
+    if trits:
+        for _ in range(0, count, 5):
+            m = []
+            T = 0
+            shift = 0
+
+            for size in (2, 2, 1, 2, 1):
+                m.append(bits & mask)
+                bits >>= numBits
+
+                T |= (bits & ((1 << size) - 1)) << shift
+                bits >>= size
+                shift += size
+
+            values.extend((t << numBits) | m_ for t, m_ in zip(TRITS[T], m))
+
+    elif quints:
+        for _ in range(0, count, 3):
+            m = []
+            Q = 0
+            shift = 0
+
+            for size in (3, 2, 2):
+                m.append(bits & mask)
+                bits >>= numBits
+
+                Q |= (bits & ((1 << size) - 1)) << shift
+                bits >>= size
+                shift += size
+
+            values.extend((q << numBits) | m_ for q, m_ in zip(QUINTS[Q], m))
+
+    else:
+        for _ in range(count):
+            values.append(bits & mask)
+            bits >>= numBits
+
+    return values[:count]
+
+
+def clamp(v):
+    return 0 if v < 0 else 255 if v > 255 else v
+
+
+def bitTransferSigned(a, b):
+    b = (b >> 1) | (a & 0x80)
+    a = (a >> 1) & 0x3f
+    if a & 0x20:
+        a -= 0x40
+
+    return a, b
+
+
+def blueContract(r, g, b, a):
+    return [(r + b) >> 1, (g + b) >> 1, b, a]
+
+
+def decodeEndpoints(cem, v):
+    """
+    Returns the two RGBA8 endpoints of a color endpoint mode, or None for HDR modes.
+    """
+    if cem == 0:
+        return [v[0], v[0], v[0], 255], [v[1], v[1], v[1], 255]
+
+    elif cem == 1:
+        L0 = (v[0] >> 2) | (v[1] & 0xc0)
+        L1 = min(L0 + (v[1] & 0x3f), 255)
+        return [L0, L0, L0, 255], [L1, L1, L1, 255]
+
+    elif cem == 4:
+        return [v[0], v[0], v[0], v[2]], [v[1], v[1], v[1], v[3]]
+
+    elif cem == 5:
+        v1, v0 = bitTransferSigned(v[1], v[0])
+        v3, v2 = bitTransferSigned(v[3], v[2])
+
+        L1 = clamp(v0 + v1)
+        return [v0, v0, v0, v2], [L1, L1, L1, clamp(v2 + v3)]
+
+    elif cem == 6:
+        return [(v[0] * v[3]) >> 8, (v[1] * v[3]) >> 8, (v[2] * v[3]) >> 8, 255], [v[0], v[1], v[2], 255]
+
+    elif cem == 8 or cem == 12:
+        a0, a1 = (v[6], v[7]) if cem == 12 else (255, 255)
+
+        if v[1] + v[3] + v[5] >= v[0] + v[2] + v[4]:
+            return [v[0], v[2], v[4], a0], [v[1], v[3], v[5], a1]
+
+        return blueContract(v[1], v[3], v[5], a1), blueContract(v[0], v[2], v[4], a0)
+
+    elif cem == 9 or cem == 13:
+        v = list(v)
+        for i in range(0, 8 if cem == 13 else 6, 2):
+            v[i + 1], v[i] = bitTransferSigned(v[i + 1], v[i])
+
+        a0, a1 = (v[6], v[6] + v[7]) if cem == 13 else (255, 255)
+
+        if v[1] + v[3] + v[5] >= 0:
+            e0 = [v[0], v[2], v[4], a0]
+            e1 = [v[0] + v[1], v[2] + v[3], v[4] + v[5], a1]
+
+        else:
+            e0 = blueContract(v[0] + v[1], v[2] + v[3], v[4] + v[5], a1)
+            e1 = blueContract(v[0], v[2], v[4], a0)
+
+        return [clamp(c) for c in e0], [clamp(c) for c in e1]
+
+    elif cem == 10:
+        return [(v[0] * v[3]) >> 8, (v[1] * v[3]) >> 8, (v[2] * v[3]) >> 8, v[4]], [v[0], v[1], v[2], v[5]]
+
+    return None
+
+
+def decodeBlock(block, footprint, SRGB):
+    """
+    Returns the texels of a block as RGBA8, row after row.
+    """
+    bits = int.from_bytes(block, 'little')
+    texelCount = footprint.texelCount
+
+    if bits & 0x1ff == 0x1fc:
+        # Void-extent block (a single color); HDR ones can't be decoded as LDR
+        if bits & 0x200 or (bits >> 10) & 3 != 3:
+            return bytes(ERROR_COLOR) * texelCount
+
+        lowS, highS, lowT, highT = [(bits >> (12 + 13 * i)) & 0x1fff for i in range(4)]
+        if (lowS >= highS or lowT >= highT) and not lowS == highS == lowT == highT == 0x1fff:
+            return bytes(ERROR_COLOR) * texelCount
+
+        return bytes((bits >> (72 + 16 * i)) & 0xff for i in range(4)) * texelCount
+
+    pos = (bits & 0x7ff) * MODE_SIZE
+    mode = footprint.modes[pos:pos + MODE_SIZE]
+
+    partitionCount = ((bits >> 11) & 3) + 1
+    dualPlane = mode[MODE_DUAL_PLANE]
+
+    if not mode[MODE_VALID] or (dualPlane and partitionCount == 4):
+        return bytes(ERROR_COLOR) * texelCount
+
+    belowWeights = 128 - mode[MODE_WEIGHT_BITS]
+
+    # Color endpoint modes
+    if partitionCount == 1:
+        cems = [(bits >> 13) & 0xf]
+        colorPos = 17
+
+    else:
+        cem = (bits >> 23) & 0x3f
+
+        if cem & 3:
+            extraBits = 3 * partitionCount - 4
+            belowWeights -= extraBits
+
+            cem |= ((bits >> belowWeights) & ((1 << extraBits) - 1)) << 6
+            baseClass = (cem & 3) - 1
+
+            cems = [((((cem >> (2 + i)) & 1) + baseClass) << 2) | ((cem >> (2 + partitionCount + 2 * i)) & 3)
+                    for i in range(partitionCount)]
+
+        else:
+            cems = [cem >> 2] * partitionCount
+
+        colorPos = 29
+
+    if dualPlane:
+        belowWeights -= 2
+        plane2Component = (bits >> belowWeights) & 3
+
+    else:
+        plane2Component = -1
+
+    # Color endpoints
+    numValues = sum(((cem >> 2) + 1) * 2 for cem in cems)
+    colorBits = belowWeights - colorPos
+
+    if numValues > 18:
+        return bytes(ERROR_COLOR) * texelCount
+
+    colorQuant = 20
+    while colorQuant >= 0 and getISEBitCount(numValues, colorQuant) > colorBits:
+        colorQuant -= 1
+
+    if colorQuant < 4:
+        return bytes(ERROR_COLOR) * texelCount
+
+    values = [COLOR_UNQUANT[colorQuant * 256 + value] for value in decodeISE(bits, colorPos, numValues, colorQuant)]
+
+    endpoints = []
+    for cem in cems:
+        count = ((cem >> 2) + 1) * 2
+        endpoint = decodeEndpoints(cem, values[:count])
+        values = values[count:]
+
+        if endpoint is None:
+            # Only the texels of partitions with HDR endpoints are invalid
+            endpoint = ERROR_COLOR, ERROR_COLOR
+
+        # Expand to 16 bits (sRGB only applies to the color channels)
+        if SRGB:
+            endpoints.append(([(c << 8) | 0x80 for c in endpoint[0][:3]] + [endpoint[0][3] * 257],
+                              [(c << 8) | 0x80 for c in endpoint[1][:3]] + [endpoint[1][3] * 257]))
+
+        else:
+            endpoints.append(([c * 257 for c in endpoint[0]], [c * 257 for c in endpoint[1]]))
+
+    # Weights, stored bit-reversed from the top of the block
+    reversedBits = int.from_bytes(bytes(REVERSED_BYTES[b] for b in block), 'big')
+    quant = mode[MODE_WEIGHT_QUANT]
+    weights = [WEIGHT_UNQUANT[quant * 32 + value]
+               for value in decodeISE(reversedBits, 0, mode[MODE_WEIGHT_COUNT], quant)]
+
+    partitions = footprint.getPartitions(partitionCount, (bits >> 13) & 0x3ff) if partitionCount > 1 else None
+    infill = footprint.infill
+    infillPos = mode[MODE_INFILL]
+    numPlanes = dualPlane + 1
+
+    output = bytearray(texelCount * 4)
+    for texel in range(texelCount):
+        p0, p1, p2, p3, f0, f1, f2, f3 = infill[infillPos + texel * 8:infillPos + texel * 8 + 8]
+
+        if numPlanes == 1:
+            weight = (weights[p0] * f0 + weights[p1] * f1 + weights[p2] * f2 + weights[p3] * f3 + 8) >> 4
+            weight2 = weight
+
+        else:
+            weight = (weights[p0 * 2] * f0 + weights[p1 * 2] * f1 + weights[p2 * 2] * f2 + weights[p3 * 2] * f3 + 8) >> 4
+            weight2 = (weights[p0 * 2 + 1] * f0 + weights[p1 * 2 + 1] * f1 +
+                       weights[p2 * 2 + 1] * f2 + weights[p3 * 2 + 1] * f3 + 8) >> 4
+
+        e0, e1 = endpoints[partitions[texel] if partitions else 0]
+
+        for c in range(4):
+            w = weight2 if c == plane2Component else weight
+            output[texel * 4 + c] = ((e0[c] * (64 - w) + e1[c] * w + 32) >> 6) >> 8
+
+    return output
+
+
+def decompressASTC(data, width, height, blkWidth, blkHeight, SRGB, blockAddrs=None, output=None):
+    """
+    Decodes the surface to RGBA8, into output if given.
+    """
+    footprint = getFootprint(blkWidth, blkHeight)
+    output = bytearray(width * height * 4) if output is None else memoryview(output).cast('B')
+
+    blocksX = (width + blkWidth - 1) // blkWidth
+    blocksY = (height + blkHeight - 1) // blkHeight
+
+    for blkY in range(blocksY):
+        for blkX in range(blocksX):
+            blkIdx = blkY * blocksX + blkX
+            pos = blkIdx * 16 if blockAddrs is None else blockAddrs[blkIdx]
+
+            block = decodeBlock(data[pos:pos + 16], footprint, SRGB)
+
+            x = blkX * blkWidth
+            y = blkY * blkHeight
+            rowSize = min(blkWidth, width - x) * 4
+
+            for row in range(min(blkHeight, height - y)):
+                outPos = ((y + row) * width + x) * 4
+                output[outPos:outPos + rowSize] = block[row * blkWidth * 4:row * blkWidth * 4 + rowSize]
+
+    return output
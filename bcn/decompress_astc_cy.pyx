@@ -0,0 +1,577 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# ASTC Decompressor
+# Version 0.1
+# Copyright © 2018 MasterVermilli0n / AboodXD
+
+# decompress_astc_cy.pyx
+# An ASTC LDR (2D) decompressor in Cython, decoding to RGBA8 like the decode_unorm8 mode.
+# The tables of every block footprint come from decompress_astc.
+
+################################################################
+################################################################
+
+from libc.string cimport memcpy
+
+from . import decompress_astc as tables
+
+
+ctypedef unsigned char u8
+ctypedef unsigned short u16
+ctypedef unsigned int u32
+ctypedef unsigned long long u64
+
+
+cdef enum:
+    MODE_VALID = 0
+    MODE_DUAL_PLANE = 3
+    MODE_WEIGHT_QUANT = 4
+    MODE_WEIGHT_COUNT = 5
+    MODE_WEIGHT_BITS = 6
+    MODE_INFILL = 7
+    MODE_SIZE = 8
+
+
+cdef struct Footprint:
+    u32 blkWidth
+    u32 blkHeight
+    u32 texelCount
+    const int *modes
+    const u16 *infill
+    const u8 *partitions  # texelCount entries for each of the 1024 seeds of 2, 3 and 4 partitions
+
+
+cdef u8[21 * 3] ISE_PARAMS
+cdef u8[256 * 5] TRITS
+cdef u8[128 * 3] QUINTS
+cdef u8[21 * 256] COLOR_UNQUANT
+cdef u8[12 * 32] WEIGHT_UNQUANT
+cdef u8[256] REVERSED_BYTES
+cdef u8[4] ERROR_COLOR
+cdef u32 i, j
+
+for i in range(21):
+    for j in range(3):
+        ISE_PARAMS[i * 3 + j] = tables.ISE_PARAMS[i][j]
+
+for i in range(256):
+    for j in range(5):
+        TRITS[i * 5 + j] = tables.TRITS[i][j]
+
+    REVERSED_BYTES[i] = tables.REVERSED_BYTES[i]
+
+for i in range(128):
+    for j in range(3):
+        QUINTS[i * 3 + j] = tables.QUINTS[i][j]
+
+for i in range(21 * 256):
+    COLOR_UNQUANT[i] = tables.COLOR_UNQUANT[i]
+
+for i in range(12 * 32):
+    WEIGHT_UNQUANT[i] = tables.WEIGHT_UNQUANT[i]
+
+for i in range(4):
+    ERROR_COLOR[i] = tables.ERROR_COLOR[i]
+
+
+cdef inline u32 readBits(u64 lo, u64 hi, u32 pos, u32 count) noexcept nogil:
+    """
+    Returns count (up to 32) bits of a 128-bit block, starting at bit pos.
+    """
+    cdef u64 value
+
+    if count == 0 or pos >= 128:
+        return 0
+
+    if pos >= 64:
+        value = hi >> (pos - 64)
+
+    elif pos == 0:
+        value = lo
+
+    else:
+        value = (lo >> pos) | (hi << (64 - pos))
+
+    return <u32>(value & ((<u64>1 << count) - 1))
+
+
+cdef inline u32 getISEBitCount(u32 count, u32 quant) noexcept nogil:
+    return (ISE_PARAMS[quant * 3] * count + ISE_PARAMS[quant * 3 + 1] * ((8 * count + 4) // 5)
+            + ISE_PARAMS[quant * 3 + 2] * ((7 * count + 2) // 3))
+
+
+cdef void decodeISE(u64 lo, u64 hi, u32 pos, u32 count, u32 quant, u8 *values) noexcept nogil:
+    """
+    Writes count values of a quantization level stored from bit pos of the block to values.
+    """
+    cdef:
+        u32 numBits = ISE_PARAMS[quant * 3]
+        u32 end = pos + getISEBitCount(count, quant)
+        u32 k, n, packed, shift
+        u32[5] m
+        u32[5] sizes
+
+    # Bits past the end of the sequence read as zeros
+    if end < 64:
+        lo &= (<u64>1 << end) - 1
+        hi = 0
+
+    elif end < 128:
+        hi &= (<u64>1 << (end - 64)) - 1
+
+    if ISE_PARAMS[quant * 3 + 1]:
+        sizes[0] = 2; sizes[1] = 2; sizes[2] = 1; sizes[3] = 2; sizes[4] = 1
+
+        for k in range(0, count, 5):
+            packed = 0
+            shift = 0
+
+            for n in range(5):
+                m[n] = readBits(lo, hi, pos, numBits)
+                pos += numBits
+
+                packed |= readBits(lo, hi, pos, sizes[n]) << shift
+                pos += sizes[n]
+                shift += sizes[n]
+
+            for n in range(min(5, count - k)):
+                values[k + n] = (TRITS[packed * 5 + n] << numBits) | m[n]
+
+    elif ISE_PARAMS[quant * 3 + 2]:
+        sizes[0] = 3; sizes[1] = 2; sizes[2] = 2
+
+        for k in range(0, count, 3):
+            packed = 0
+            shift = 0
+
+            for n in range(3):
+                m[n] = readBits(lo, hi, pos, numBits)
+                pos += numBits
+
+                packed |= readBits(lo, hi, pos, sizes[n]) << shift
+                pos += sizes[n]
+                shift += sizes[n]
+
+            for n in range(min(3, count - k)):
+                values[k + n] = (QUINTS[packed * 3 + n] << numBits) | m[n]
+
+    else:
+        for k in range(count):
+            values[k] = readBits(lo, hi, pos, numBits)
+            pos += numBits
+
+
+cdef inline int clamp(int v) noexcept nogil:
+    return 0 if v < 0 else 255 if v > 255 else v
+
+
+cdef inline void bitTransferSigned(int *a, int *b) noexcept nogil:
+    b[0] = (b[0] >> 1) | (a[0] & 0x80)
+    a[0] = (a[0] >> 1) & 0x3f
+    if a[0] & 0x20:
+        a[0] -= 0x40
+
+
+cdef inline void setEndpoint(int *e, int r, int g, int b, int a) noexcept nogil:
+    e[0] = r; e[1] = g; e[2] = b; e[3] = a
+
+
+cdef bint decodeEndpoints(u32 cem, const u8 *values, int *e0, int *e1) noexcept nogil:
+    """
+    Writes the two RGBA8 endpoints of a color endpoint mode to e0 and e1,
+    returns False for HDR modes.
+    """
+    cdef:
+        int[8] v
+        int k, L0, L1, a0, a1
+
+    for k in range(8):
+        v[k] = values[k] if k < ((cem >> 2) + 1) * 2 else 0
+
+    if cem == 0:
+        setEndpoint(e0, v[0], v[0], v[0], 255)
+        setEndpoint(e1, v[1], v[1], v[1], 255)
+
+    elif cem == 1:
+        L0 = (v[0] >> 2) | (v[1] & 0xc0)
+        L1 = min(L0 + (v[1] & 0x3f), 255)
+        setEndpoint(e0, L0, L0, L0, 255)
+        setEndpoint(e1, L1, L1, L1, 255)
+
+    elif cem == 4:
+        setEndpoint(e0, v[0], v[0], v[0], v[2])
+        setEndpoint(e1, v[1], v[1], v[1], v[3])
+
+    elif cem == 5:
+        bitTransferSigned(&v[1], &v[0])
+        bitTransferSigned(&v[3], &v[2])
+
+        L1 = clamp(v[0] + v[1])
+        setEndpoint(e0, v[0], v[0], v[0], v[2])
+        setEndpoint(e1, L1, L1, L1, clamp(v[2] + v[3]))
+
+    elif cem == 6:
+        setEndpoint(e0, (v[0] * v[3]) >> 8, (v[1] * v[3]) >> 8, (v[2] * v[3]) >> 8, 255)
+        setEndpoint(e1, v[0], v[1], v[2], 255)
+
+    elif cem == 8 or cem == 12:
+        a0 = v[6] if cem == 12 else 255
+        a1 = v[7] if cem == 12 else 255
+
+        if v[1] + v[3] + v[5] >= v[0] + v[2] + v[4]:
+            setEndpoint(e0, v[0], v[2], v[4], a0)
+            setEndpoint(e1, v[1], v[3], v[5], a1)
+
+        else:
+            # Blue contraction
+            setEndpoint(e0, (v[1] + v[5]) >> 1, (v[3] + v[5]) >> 1, v[5], a1)
+            setEndpoint(e1, (v[0] + v[4]) >> 1, (v[2] + v[4]) >> 1, v[4], a0)
+
+    elif cem == 9 or cem == 13:
+        for k in range(0, 8 if cem == 13 else 6, 2):
+            bitTransferSigned(&v[k + 1], &v[k])
+
+        a0 = v[6] if cem == 13 else 255
+        a1 = v[6] + v[7] if cem == 13 else 255
+
+        if v[1] + v[3] + v[5] >= 0:
+            setEndpoint(e0, v[0], v[2], v[4], a0)
+            setEndpoint(e1, v[0] + v[1], v[2] + v[3], v[4] + v[5], a1)
+
+        else:
+            setEndpoint(e0, (v[0] + v[1] + v[4] + v[5]) >> 1, (v[2] + v[3] + v[4] + v[5]) >> 1, v[4] + v[5], a1)
+            setEndpoint(e1, (v[0] + v[4]) >> 1, (v[2] + v[4]) >> 1, v[4], a0)
+
+        for k in range(4):
+            e0[k] = clamp(e0[k])
+            e1[k] = clamp(e1[k])
+
+    elif cem == 10:
+        setEndpoint(e0, (v[0] * v[3]) >> 8, (v[1] * v[3]) >> 8, (v[2] * v[3]) >> 8, v[4])
+        setEndpoint(e1, v[0], v[1], v[2], v[5])
+
+    else:
+        return False
+
+    return True
+
+
+cdef inline void fillColor(u8 *texels, u32 texelCount, const u8 *color) noexcept nogil:
+    cdef u32 k
+    for k in range(texelCount):
+        memcpy(texels + k * 4, color, 4)
+
+
+cdef void decodeBlock(const u8 *src, const Footprint *fp, int SRGB, u8 *texels) noexcept nogil:
+    """
+    Writes the texels of a block to texels as RGBA8, row after row.
+    """
+    cdef:
+        u64 lo = 0, hi = 0, rlo = 0, rhi = 0
+        u32 k, c, texel, blockMode, partitionCount, belowWeights, colorPos, cem, extraBits
+        u32 numValues, colorBits, colorQuant, quant, partition, numPlanes
+        int plane2Component, baseClass, w, weight, weight2 = 0
+        const int *mode
+        const u16 *infill
+        const u8 *partitions = NULL
+
+        u32[4] cems
+        u8[18] values
+        u8[64] weights
+        int[4][2][4] endpoints
+        u8[4] color
+
+    for k in range(8):
+        lo |= <u64>src[k] << (8 * k)
+        hi |= <u64>src[8 + k] << (8 * k)
+
+        # Weights are stored bit-reversed from the top of the block
+        rlo |= <u64>REVERSED_BYTES[src[15 - k]] << (8 * k)
+        rhi |= <u64>REVERSED_BYTES[src[7 - k]] << (8 * k)
+
+    if lo & 0x1ff == 0x1fc:
+        # Void-extent block (a single color); HDR ones can't be decoded as LDR
+        if lo & 0x200 or (lo >> 10) & 3 != 3:
+            fillColor(texels, fp.texelCount, ERROR_COLOR)
+            return
+
+        if ((readBits(lo, hi, 12, 13) >= readBits(lo, hi, 25, 13) or readBits(lo, hi, 38, 13) >= readBits(lo, hi, 51, 13))
+                and lo >> 12 != (<u64>1 << 52) - 1):
+            fillColor(texels, fp.texelCount, ERROR_COLOR)
+            return
+
+        for c in range(4):
+            color[c] = (hi >> (16 * c + 8)) & 0xff
+
+        fillColor(texels, fp.texelCount, color)
+        return
+
+    blockMode = lo & 0x7ff
+    mode = fp.modes + blockMode * MODE_SIZE
+
+    partitionCount = ((lo >> 11) & 3) + 1
+
+    if not mode[MODE_VALID] or (mode[MODE_DUAL_PLANE] and partitionCount == 4):
+        fillColor(texels, fp.texelCount, ERROR_COLOR)
+        return
+
+    belowWeights = 128 - mode[MODE_WEIGHT_BITS]
+
+    # Color endpoint modes
+    if partitionCount == 1:
+        cems[0] = (lo >> 13) & 0xf
+        colorPos = 17
+
+    else:
+        cem = (lo >> 23) & 0x3f
+
+        if cem & 3:
+            extraBits = 3 * partitionCount - 4
+            belowWeights -= extraBits
+
+            cem |= readBits(lo, hi, belowWeights, extraBits) << 6
+            baseClass = (cem & 3) - 1
+
+            for k in range(partitionCount):
+                cems[k] = ((((cem >> (2 + k)) & 1) + baseClass) << 2) | ((cem >> (2 + partitionCount + 2 * k)) & 3)
+
+        else:
+            for k in range(partitionCount):
+                cems[k] = cem >> 2
+
+        colorPos = 29
+
+    if mode[MODE_DUAL_PLANE]:
+        belowWeights -= 2
+        plane2Component = readBits(lo, hi, belowWeights, 2)
+
+    else:
+        plane2Component = -1
+
+    # Color endpoints
+    numValues = 0
+    for k in range(partitionCount):
+        numValues += ((cems[k] >> 2) + 1) * 2
+
+    if numValues > 18 or belowWeights < colorPos:
+        fillColor(texels, fp.texelCount, ERROR_COLOR)
+        return
+
+    colorBits = belowWeights - colorPos
+    colorQuant = 20
+    while colorQuant >= 4 and getISEBitCount(numValues, colorQuant) > colorBits:
+        colorQuant -= 1
+
+    if colorQuant < 4:
+        fillColor(texels, fp.texelCount, ERROR_COLOR)
+        return
+
+    decodeISE(lo, hi, colorPos, numValues, colorQuant, values)
+    for k in range(numValues):
+        values[k] = COLOR_UNQUANT[colorQuant * 256 + values[k]]
+
+    k = 0
+    for partition in range(partitionCount):
+        if not decodeEndpoints(cems[partition], values + k, endpoints[partition][0], endpoints[partition][1]):
+            # Only the texels of partitions with HDR endpoints are invalid
+            for c in range(4):
+                endpoints[partition][0][c] = ERROR_COLOR[c]
+                endpoints[partition][1][c] = ERROR_COLOR[c]
+
+        k += ((cems[partition] >> 2) + 1) * 2
+
+        # Expand to 16 bits (sRGB only applies to the color channels)
+        for c in range(4):
+            if SRGB and c < 3:
+                endpoints[partition][0][c] = (endpoints[partition][0][c] << 8) | 0x80
+                endpoints[partition][1][c] = (endpoints[partition][1][c] << 8) | 0x80
+
+            else:
+                endpoints[partition][0][c] *= 257
+                endpoints[partition][1][c] *= 257
+
+    # Weights
+    quant = mode[MODE_WEIGHT_QUANT]
+    decodeISE(rlo, rhi, 0, mode[MODE_WEIGHT_COUNT], quant, weights)
+    for k in range(mode[MODE_WEIGHT_COUNT]):
+        weights[k] = WEIGHT_UNQUANT[quant * 32 + weights[k]]
+
+    if partitionCount > 1:
+        partitions = fp.partitions + (((partitionCount - 2) * 1024 + ((lo >> 13) & 0x3ff)) * fp.texelCount)
+
+    infill = fp.infill + mode[MODE_INFILL]
+    numPlanes = mode[MODE_DUAL_PLANE] + 1
+
+    for texel in range(fp.texelCount):
+        weight = (weights[infill[0] * numPlanes] * infill[4] + weights[infill[1] * numPlanes] * infill[5]
+                  + weights[infill[2] * numPlanes] * infill[6] + weights[infill[3] * numPlanes] * infill[7] + 8) >> 4
+
+        if numPlanes == 2:
+            weight2 = (weights[infill[0] * 2 + 1] * infill[4] + weights[infill[1] * 2 + 1] * infill[5]
+                       + weights[infill[2] * 2 + 1] * infill[6] + weights[infill[3] * 2 + 1] * infill[7] + 8) >> 4
+
+        infill += 8
+        partition = partitions[texel] if partitions != NULL else 0
+
+        for c in range(4):
+            w = weight2 if <int>c == plane2Component else weight
+            texels[texel * 4 + c] = ((endpoints[partition][0][c] * (64 - w) + endpoints[partition][1][c] * w + 32) >> 6) >> 8
+
+
+cdef void decompressBlocks(const u8 *data, const u32 *blockAddrs, u32 width, u32 height, const Footprint *fp,
+                           int SRGB, u8 *output) noexcept nogil:
+    cdef:
+        u32 blocksX = (width + fp.blkWidth - 1) // fp.blkWidth
+        u32 blocksY = (height + fp.blkHeight - 1) // fp.blkHeight
+        u32 blkIdx, bx, by, row, rowSize
+
+        u8[12 * 12 * 4] texels
+
+    for by in range(blocksY):
+        for bx in range(blocksX):
+            blkIdx = by * blocksX + bx
+            decodeBlock(data + (blockAddrs[blkIdx] if blockAddrs != NULL else blkIdx * 16), fp, SRGB, texels)
+
+            rowSize = min(fp.blkWidth, width - bx * fp.blkWidth) * 4
+
+            for row in range(min(fp.blkHeight, height - by * fp.blkHeight)):
+                memcpy(output + ((by * fp.blkHeight + row) * width + bx * fp.blkWidth) * 4,
+                       texels + row * fp.blkWidth * 4, rowSize)
+
+
+cdef u32 hash52(u32 p) noexcept nogil:
+    p ^= p >> 15
+    p -= p << 17
+    p += p << 7
+    p += p << 4
+    p ^= p >> 5
+    p += p << 16
+    p ^= p >> 7
+    p ^= p >> 3
+    p ^= p << 6
+    p ^= p >> 17
+    return p
+
+
+cdef u8 selectPartition(u32 seed, u32 x, u32 y, u32 partitionCount, bint smallBlock) noexcept nogil:
+    cdef:
+        u32 rnum, sh1, sh2, k
+        u32[8] seeds
+        u32 a, b, c, d
+
+    if smallBlock:
+        x <<= 1
+        y <<= 1
+
+    seed += (partitionCount - 1) * 1024
+    rnum = hash52(seed)
+
+    for k in range(8):
+        seeds[k] = (rnum >> (4 * k)) & 0xf
+        seeds[k] *= seeds[k]
+
+    if seed & 1:
+        sh1 = 4 if seed & 2 else 5
+        sh2 = 6 if partitionCount == 3 else 5
+
+    else:
+        sh1 = 6 if partitionCount == 3 else 5
+        sh2 = 4 if seed & 2 else 5
+
+    a = ((seeds[0] >> sh1) * x + (seeds[1] >> sh2) * y + (rnum >> 14)) & 0x3f
+    b = ((seeds[2] >> sh1) * x + (seeds[3] >> sh2) * y + (rnum >> 10)) & 0x3f
+    c = ((seeds[4] >> sh1) * x + (seeds[5] >> sh2) * y + (rnum >> 6)) & 0x3f
+    d = ((seeds[6] >> sh1) * x + (seeds[7] >> sh2) * y + (rnum >> 2)) & 0x3f
+
+    if partitionCount < 4:
+        d = 0
+
+    if partitionCount < 3:
+        c = 0
+
+    if a >= b and a >= c and a >= d:
+        return 0
+
+    elif b >= c and b >= d:
+        return 1
+
+    elif c >= d:
+        return 2
+
+    return 3
+
+
+cdef bytes getPartitions(u32 blkWidth, u32 blkHeight):
+    """
+    Returns the partition of every texel for all the partition counts and indices of a footprint.
+    """
+    cdef:
+        u32 texelCount = blkWidth * blkHeight
+        bytearray partitions = bytearray(3 * 1024 * texelCount)
+        u8 *out = partitions
+        u32 partitionCount, seed, x, y
+
+    with nogil:
+        for partitionCount in range(2, 5):
+            for seed in range(1024):
+                for y in range(blkHeight):
+                    for x in range(blkWidth):
+                        out[0] = selectPartition(seed, x, y, partitionCount, texelCount < 31)
+                        out += 1
+
+    return bytes(partitions)
+
+
+# Partition tables of every block footprint
+partitionTables = {}
+
+
+cpdef decompressASTC(const u8[::1] data, u32 width, u32 height, u32 blkWidth, u32 blkHeight, int SRGB,
+                     blockAddrs=None, output=None):
+    """
+    Decodes the surface to RGBA8, into output if given (else a new bytearray), and returns it.
+    """
+    cdef:
+        const u32[::1] addrView
+        const u32 *addrs = NULL
+        const int[::1] modes
+        const u16[::1] infill
+        const u8[::1] partitions
+        u8[::1] out
+        u32 size = width * height * 4
+
+        Footprint fp
+
+    if output is None:
+        output = bytearray(size)
+
+    if size == 0:
+        return output
+
+    footprint = tables.getFootprint(blkWidth, blkHeight)
+    modes = footprint.modes
+    infill = footprint.infill
+
+    if (blkWidth, blkHeight) not in partitionTables:
+        partitionTables[(blkWidth, blkHeight)] = getPartitions(blkWidth, blkHeight)
+
+    partitions = partitionTables[(blkWidth, blkHeight)]
+
+    fp.blkWidth = blkWidth
+    fp.blkHeight = blkHeight
+    fp.texelCount = blkWidth * blkHeight
+    fp.modes = &modes[0]
+    fp.infill = &infill[0]
+    fp.partitions = &partitions[0]
+
+    if blockAddrs is not None:
+        addrView = blockAddrs
+        addrs = &addrView[0]
+
+    out = output
+
+    with nogil:
+        decompressBlocks(&data[0], addrs, width, height, &fp, SRGB, &out[0])
+
+    return output
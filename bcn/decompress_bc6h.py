@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# BC6H Decompressor
+# Version 0.1
+# Copyright © 2018 MasterVermilli0n / AboodXD
+
+# decompress_bc6h.py
+# A BC6H (UF16/SF16) decompressor in NumPy.
+# Blocks are grouped by mode and every group is decoded at once.
+
+################################################################
+################################################################
+
+import numpy as np
+
+from . import bptc
+from .decompress_np import getBlocks, toImage
+
+
+BC6HBlock = np.dtype([('bits', 'u1', 16)])
+
+# Endpoint fields, in the order they are stored in the "fields" arrays below
+FIELDS = ['rw', 'gw', 'bw', 'rx', 'gx', 'bx', 'ry', 'gy', 'by', 'rz', 'gz', 'bz', 'd']
+
+# mode: (numRegions, transformed, endpoint bits, delta bits (R, G, B), header layout)
+MODES = {
+    0x00: (2, 1, 10, (5, 5, 5),
+           "m[1:0], gy[4], by[4], bz[4], rw[9:0], gw[9:0], bw[9:0], rx[4:0], gz[4], gy[3:0], gx[4:0], bz[0], "
+           "gz[3:0], bx[4:0], bz[1], by[3:0], ry[4:0], bz[2], rz[4:0], bz[3], d[4:0]"),
+    0x01: (2, 1, 7, (6, 6, 6),
+           "m[1:0], gy[5], gz[4], gz[5], rw[6:0], bz[0], bz[1], by[4], gw[6:0], by[5], bz[2], gy[4], bw[6:0], "
+           "bz[3], bz[5], bz[4], rx[5:0], gy[3:0], gx[5:0], gz[3:0], bx[5:0], by[3:0], ry[5:0], rz[5:0], d[4:0]"),
+    0x02: (2, 1, 11, (5, 4, 4),
+           "m[4:0], rw[9:0], gw[9:0], bw[9:0], rx[4:0], rw[10], gy[3:0], gx[3:0], gw[10], bz[0], gz[3:0], "
+           "bx[3:0], bw[10], bz[1], by[3:0], ry[4:0], bz[2], rz[4:0], bz[3], d[4:0]"),
+    0x06: (2, 1, 11, (4, 5, 4),
+           "m[4:0], rw[9:0], gw[9:0], bw[9:0], rx[3:0], rw[10], gz[4], gy[3:0], gx[4:0], gw[10], gz[3:0], "
+           "bx[3:0], bw[10], bz[1], by[3:0], ry[3:0], bz[0], bz[2], rz[3:0], gy[4], bz[3], d[4:0]"),
+    0x0a: (2, 1, 11, (4, 4, 5),
+           "m[4:0], rw[9:0], gw[9:0], bw[9:0], rx[3:0], rw[10], by[4], gy[3:0], gx[3:0], gw[10], bz[0], "
+           "gz[3:0], bx[4:0], bw[10], by[3:0], ry[3:0], bz[1], bz[2], rz[3:0], bz[4], bz[3], d[4:0]"),
+    0x0e: (2, 1, 9, (5, 5, 5),
+           "m[4:0], rw[8:0], by[4], gw[8:0], gy[4], bw[8:0], bz[4], rx[4:0], gz[4], gy[3:0], gx[4:0], bz[0], "
+           "gz[3:0], bx[4:0], bz[1], by[3:0], ry[4:0], bz[2], rz[4:0], bz[3], d[4:0]"),
+    0x12: (2, 1, 8, (6, 5, 5),
+           "m[4:0], rw[7:0], gz[4], by[4], gw[7:0], bz[2], gy[4], bw[7:0], bz[3], bz[4], rx[5:0], gy[3:0], "
+           "gx[4:0], bz[0], gz[3:0], bx[4:0], bz[1], by[3:0], ry[5:0], rz[5:0], d[4:0]"),
+    0x16: (2, 1, 8, (5, 6, 5),
+           "m[4:0], rw[7:0], bz[0], by[4], gw[7:0], gy[5], gy[4], bw[7:0], gz[5], bz[4], rx[4:0], gz[4], "
+           "gy[3:0], gx[5:0], gz[3:0], bx[4:0], bz[1], by[3:0], ry[4:0], bz[2], rz[4:0], bz[3], d[4:0]"),
+    0x1a: (2, 1, 8, (5, 5, 6),
+           "m[4:0], rw[7:0], bz[1], by[4], gw[7:0], by[5], gy[4], bw[7:0], bz[5], bz[4], rx[4:0], gz[4], "
+           "gy[3:0], gx[4:0], bz[0], gz[3:0], bx[5:0], by[3:0], ry[4:0], bz[2], rz[4:0], bz[3], d[4:0]"),
+    0x1e: (2, 0, 6, (6, 6, 6),
+           "m[4:0], rw[5:0], gz[4], bz[0], bz[1], by[4], gw[5:0], gy[5], by[5], bz[2], gy[4], bw[5:0], gz[5], "
+           "bz[3], bz[5], bz[4], rx[5:0], gy[3:0], gx[5:0], gz[3:0], bx[5:0], by[3:0], ry[5:0], rz[5:0], d[4:0]"),
+    0x03: (1, 0, 10, (10, 10, 10),
+           "m[4:0], rw[9:0], gw[9:0], bw[9:0], rx[9:0], gx[9:0], bx[9:0]"),
+    0x07: (1, 1, 11, (9, 9, 9),
+           "m[4:0], rw[9:0], gw[9:0], bw[9:0], rx[8:0], rw[10], gx[8:0], gw[10], bx[8:0], bw[10]"),
+    0x0b: (1, 1, 12, (8, 8, 8),
+           "m[4:0], rw[9:0], gw[9:0], bw[9:0], rx[7:0], rw[10:11], gx[7:0], gw[10:11], bx[7:0], bw[10:11]"),
+    0x0f: (1, 1, 16, (4, 4, 4),
+           "m[4:0], rw[9:0], gw[9:0], bw[9:0], rx[3:0], rw[10:15], gx[3:0], gw[10:15], bx[3:0], bw[10:15]"),
+}
+
+WEIGHTS = {bits: np.array(weights, dtype=np.int64) for bits, weights in bptc.WEIGHTS.items()}
+
+
+def parseLayout(layout):
+    """
+    Returns a (128, len(FIELDS)) matrix mapping every header bit to the value
+    it adds to its field, so that fields = bits @ matrix.
+    """
+    matrix = np.zeros((128, len(FIELDS)), dtype=np.int64)
+    pos = 0
+
+    for entry in layout.split(', '):
+        name, bits = entry[:-1].split('[')
+        hi, lo = (bits.split(':') * 2)[:2]
+        hi, lo = int(hi), int(lo)
+
+        # Ranges are stored from their low bit, or reversed when written [lo:hi]
+        step = 1 if hi >= lo else -1
+        for bit in range(lo, hi + step, step):
+            if name != 'm':
+                matrix[pos, FIELDS.index(name)] = 1 << bit
+
+            pos += 1
+
+    return matrix
+
+
+# Precomputed per-mode field matrices and per-partition index layouts
+modeTables = {mode: parseLayout(desc[4]) for mode, desc in MODES.items()}
+partitionTable = np.array([bptc.getSubsets(2, partition) for partition in range(32)], dtype=np.intp)
+indexLayouts = {
+    1: [bptc.getIndexLayout(65, 4, bptc.getAnchors(1, 0))],
+    2: [bptc.getIndexLayout(82, 3, bptc.getAnchors(2, partition)) for partition in range(32)],
+}
+
+
+def signExtend(value, bits):
+    value = value & ((1 << bits) - 1)
+    return value - (((value >> (bits - 1)) & 1) << bits)
+
+
+def unquantize(comp, bits, signed):
+    if signed:
+        if bits >= 16:
+            return comp
+
+        mag = np.abs(comp)
+        unq = np.where(mag >= (1 << (bits - 1)) - 1, 0x7FFF, ((mag << 15) + 0x4000) >> (bits - 1))
+        unq = np.where(mag == 0, 0, unq)
+
+        return np.where(comp < 0, -unq, unq)
+
+    if bits >= 15:
+        return comp
+
+    unq = ((comp << 16) + 0x8000) >> bits
+    unq = np.where(comp == (1 << bits) - 1, 0xFFFF, unq)
+
+    return np.where(comp == 0, 0, unq)
+
+
+def finishUnquantize(comp, signed):
+    """
+    Returns the half float bits of interpolated values.
+    """
+    if signed:
+        mag = (np.abs(comp) * 31) >> 5
+        return np.where(comp < 0, 0x8000 | mag, mag)
+
+    return (comp * 31) >> 6
+
+
+def getIndices(bits, offsets, sizes):
+    """
+    Returns the index of every texel of the blocks.
+    """
+    offsets = np.array(offsets)
+    sizes = np.array(sizes)
+
+    positions = np.minimum(offsets[:, None] + np.arange(4), 127)
+    weights = np.where(np.arange(4) < sizes[:, None], 1 << np.arange(4), 0)
+
+    return (bits[:, positions] * weights).sum(axis=2)
+
+
+def decodeMode(bits, mode, signed):
+    """
+    Returns the RGB half float bits of the 16 texels of blocks that use the same mode.
+    """
+    numRegions, transformed, endpointBits, deltaBits, _ = MODES[mode]
+    fields = bits.astype(np.int64) @ modeTables[mode]
+
+    # (block, endpoint (w, x, y, z), channel)
+    endpoints = fields[:, :12].reshape(-1, 4, 3)
+
+    if signed:
+        endpoints[:, 0] = signExtend(endpoints[:, 0], endpointBits)
+
+    if signed or transformed:
+        for channel in range(3):
+            precision = deltaBits[channel] if transformed else endpointBits
+            endpoints[:, 1:, channel] = signExtend(endpoints[:, 1:, channel], precision)
+
+    if transformed:
+        endpoints[:, 1:] = (endpoints[:, :1] + endpoints[:, 1:]) & ((1 << endpointBits) - 1)
+
+        if signed:
+            endpoints[:, 1:] = signExtend(endpoints[:, 1:], endpointBits)
+
+    endpoints = unquantize(endpoints, endpointBits, signed)
+
+    texels = np.empty((len(bits), 16, 3), dtype=np.int64)
+    indexBits = 4 if numRegions == 1 else 3
+
+    partitions = fields[:, 12] if numRegions == 2 else np.zeros(len(bits), dtype=np.int64)
+    for partition in np.unique(partitions):
+        group = partitions == partition
+
+        indices = getIndices(bits[group], *indexLayouts[numRegions][partition])
+        weights = WEIGHTS[indexBits][indices][:, :, None]
+
+        # Endpoints of the region of every texel
+        regions = partitionTable[partition] if numRegions == 2 else np.zeros(16, dtype=np.intp)
+        A = endpoints[group][:, regions * 2]
+        B = endpoints[group][:, regions * 2 + 1]
+
+        texels[group] = (A * (64 - weights) + B * weights + 32) >> 6
+
+    return finishUnquantize(texels, signed)
+
+
+def decompressBC6HFloat(data, width, height, SNORM, blockAddrs=None, output=None):
+    """
+    Returns the texels as an (height, width, 4) float16 array (alpha is 1),
+    decoded into output if given.
+    """
+    blocks = getBlocks(data, width, height, BC6HBlock, blockAddrs)
+    bits = np.unpackbits(blocks['bits'], axis=1, bitorder='little')
+
+    modes = bits[:, 0] | (bits[:, 1] << 1)
+    modes = np.where(modes < 2, modes, modes | (bits[:, 2] << 2) | (bits[:, 3] << 3) | (bits[:, 4] << 4))
+
+    # Reserved modes decode to opaque black
+    texels = np.zeros((len(blocks), 16, 4), dtype=np.uint16)
+    texels[:, :, 3] = 0x3C00
+
+    for mode in np.unique(modes):
+        if mode in MODES:
+            group = modes == mode
+            texels[group, :, :3] = decodeMode(bits[group], mode, SNORM)
+
+    return toImage(texels, width, height, output).view(np.float16)
+
+
+def getTonemapTable():
+    """
+    Maps every half float to an RGBA8 value (Reinhard operator, then gamma 2.2).
+    """
+    values = np.arange(0x10000, dtype=np.uint32).astype(np.uint16).view(np.float16).astype(np.float64)
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        mapped = (values / (1 + values)) ** (1 / 2.2)
+
+    mapped = np.where(np.isposinf(values), 1, mapped)
+    mapped = np.where(np.isnan(mapped) | (values <= 0), 0, mapped)
+
+    return (mapped * 255 + 0.5).astype(np.uint8)
+
+
+tonemapTable = getTonemapTable()
+
+
+def decompressBC6H(data, width, height, SNORM, blockAddrs=None, output=None):
+    """
+    Returns the tonemapped texels as an (height, width, 4) RGBA8 array, for previews,
+    decoded into output if given.
+    """
+    texels = decompressBC6HFloat(data, width, height, SNORM, blockAddrs).view(np.uint16)
+
+    if output is None:
+        image = tonemapTable[texels]
+
+    else:
+        image = np.take(tonemapTable, texels, out=np.frombuffer(output, dtype=np.uint8).reshape(height, width, 4))
+
+    image[:, :, 3] = 255
+
+    return image
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# BC7 Decompressor
+# Version 0.1
+# Copyright © 2018 MasterVermilli0n / AboodXD
+
+# decompress_bc7.py
+# A BC7 decompressor in NumPy.
+# Blocks are sorted by mode and partition and every group is decoded at once.
+
+################################################################
+################################################################
+
+import numpy as np
+
+from . import bptc
+from .decompress_np import getBlocks, toImage
+
+
+BC7Block = np.dtype([('bits', 'u1', 16)])
+
+# mode: (numSubsets, partition bits, rotation bits, index selection bits, color bits, alpha bits,
+#        endpoint P-bits, shared P-bits, index bits, secondary index bits)
+MODES = [
+    (3, 4, 0, 0, 4, 0, 1, 0, 3, 0),
+    (2, 6, 0, 0, 6, 0, 0, 1, 3, 0),
+    (3, 6, 0, 0, 5, 0, 0, 0, 2, 0),
+    (2, 6, 0, 0, 7, 0, 1, 0, 2, 0),
+    (1, 0, 2, 1, 5, 6, 0, 0, 2, 3),
+    (1, 0, 2, 0, 7, 8, 0, 0, 2, 2),
+    (1, 0, 0, 0, 7, 7, 1, 0, 4, 0),
+    (2, 6, 0, 0, 5, 5, 1, 0, 2, 0),
+]
+
+# Mode of a block by its first byte (the position of its lowest set bit, 8 if reserved)
+MODE_OF_BYTE = np.array([(b & -b).bit_length() - 1 if b else 8 for b in range(256)], dtype=np.intp)
+
+# Channel order of the texels for every rotation
+ROTATIONS = [[0, 1, 2, 3], [3, 1, 2, 0], [0, 3, 2, 1], [0, 1, 3, 2]]
+
+WEIGHTS = {bits: np.array(weights, dtype=np.int32) for bits, weights in bptc.WEIGHTS.items()}
+
+
+def getIndexTable(offsets, sizes):
+    """
+    Returns the bits to gather and their place values for the index of every texel.
+    """
+    offsets = np.array(offsets)
+    sizes = np.array(sizes)
+
+    positions = np.minimum(offsets[:, None] + np.arange(4), 127)
+    values = np.where(np.arange(4) < sizes[:, None], 1 << np.arange(4), 0).astype(np.int32)
+
+    return positions, values
+
+
+def getModeTables(mode):
+    """
+    Returns the texel subsets and the primary/secondary index tables of every partition of a mode.
+    """
+    numSubsets, partitionBits, rotationBits, indexSelectionBits, colorBits, alphaBits, \
+        endpointPBits, sharedPBits, indexBits, index2Bits = MODES[mode]
+
+    pos = mode + 1 + partitionBits + rotationBits + indexSelectionBits
+    pos += numSubsets * 2 * (colorBits * 3 + alphaBits)
+    pos += numSubsets * 2 * endpointPBits + numSubsets * sharedPBits
+
+    tables = []
+    for partition in range(1 << partitionBits):
+        anchors = bptc.getAnchors(numSubsets, partition)
+        primary = getIndexTable(*bptc.getIndexLayout(pos, indexBits, anchors))
+
+        if index2Bits:
+            secondary = getIndexTable(*bptc.getIndexLayout(pos + 16 * indexBits - 1, index2Bits, [0]))
+
+        else:
+            secondary = None
+
+        subsets = np.array(bptc.getSubsets(numSubsets, partition), dtype=np.intp)
+        tables.append((subsets, primary, secondary))
+
+    return tables
+
+
+# Precomputed per-mode, per-partition tables
+modeTables = [getModeTables(mode) for mode in range(8)]
+
+
+def groupBy(keys):
+    """
+    Sorts the blocks by key and yields every key with the blocks that have it.
+    """
+    order = np.argsort(keys, kind='stable')
+    bounds = np.flatnonzero(np.diff(keys[order])) + 1
+
+    for group in np.split(order, bounds):
+        if len(group):
+            yield keys[group[0]], group
+
+
+def readBits(bits, pos, count):
+    """
+    Returns count bits starting at bit pos of every block as an integer.
+    """
+    return bits[:, pos:pos + count].astype(np.int32) @ (1 << np.arange(count, dtype=np.int32))
+
+
+def getIndices(bits, table):
+    positions, values = table
+    return (bits[:, positions] * values).sum(axis=2)
+
+
+def decodeMode(bits, mode):
+    """
+    Returns the RGBA8 texels of blocks that use the same mode.
+    """
+    numSubsets, partitionBits, rotationBits, indexSelectionBits, colorBits, alphaBits, \
+        endpointPBits, sharedPBits, indexBits, index2Bits = MODES[mode]
+
+    numBlocks = len(bits)
+    numEndpoints = numSubsets * 2
+
+    pos = mode + 1
+    partitions = readBits(bits, pos, partitionBits); pos += partitionBits
+    rotations = readBits(bits, pos, rotationBits); pos += rotationBits
+    indexModes = readBits(bits, pos, indexSelectionBits); pos += indexSelectionBits
+
+    # (block, endpoint, channel), endpoints stored channel after channel
+    endpoints = np.full((numBlocks, numEndpoints, 4), 255, dtype=np.int32)
+    precisions = [colorBits] * 3 + [alphaBits]
+
+    for channel, precision in enumerate(precisions):
+        if precision:
+            size = numEndpoints * precision
+            comp = bits[:, pos:pos + size].reshape(numBlocks, numEndpoints, precision).astype(np.int32)
+            endpoints[:, :, channel] = comp @ (1 << np.arange(precision, dtype=np.int32))
+            pos += size
+
+    if endpointPBits:
+        pBits = bits[:, pos:pos + numEndpoints].astype(np.int32)
+
+    elif sharedPBits:
+        pBits = np.repeat(bits[:, pos:pos + numSubsets].astype(np.int32), 2, axis=1)
+
+    else:
+        pBits = None
+
+    # Append the P-bits and expand every channel to 8 bits
+    for channel, precision in enumerate(precisions):
+        if precision:
+            comp = endpoints[:, :, channel]
+
+            if pBits is not None:
+                comp = (comp << 1) | pBits
+                precision += 1
+
+            comp = comp << (8 - precision)
+            endpoints[:, :, channel] = comp | (comp >> precision)
+
+    texels = np.empty((numBlocks, 16, 4), dtype=np.uint8)
+    weights = np.empty((numBlocks, 16, 4), dtype=np.int32)
+
+    for partition, group in groupBy(partitions):
+        subsets, primary, secondary = modeTables[mode][partition]
+        weights_ = weights[:len(group)]
+
+        colorWeights = WEIGHTS[indexBits][getIndices(bits[group], primary)]
+
+        if secondary is None:
+            weights_[:] = colorWeights[:, :, None]
+
+        else:
+            alphaWeights = WEIGHTS[index2Bits][getIndices(bits[group], secondary)]
+
+            # The index selection bit swaps the indices used for color and alpha
+            swapped = indexModes[group].astype(bool)[:, None]
+            weights_[:, :, :3] = np.where(swapped, alphaWeights, colorWeights)[:, :, None]
+            weights_[:, :, 3] = np.where(swapped, colorWeights, alphaWeights)
+
+        A = endpoints[group][:, subsets * 2]
+        B = endpoints[group][:, subsets * 2 + 1]
+
+        texels[group] = (A * (64 - weights_) + B * weights_ + 32) >> 6
+
+    # The rotation swaps alpha with one of the color channels
+    for rotation in range(1, 4):
+        group = rotations == rotation
+
+        if group.any():
+            texels[group] = texels[group][:, :, ROTATIONS[rotation]]
+
+    return texels
+
+
+def decompressBC7(data, width, height, blockAddrs=None, output=None):
+    blocks = getBlocks(data, width, height, BC7Block, blockAddrs)
+    bits = np.unpackbits(blocks['bits'], axis=1, bitorder='little')
+
+    # Reserved mode decodes to transparent black
+    texels = np.zeros((len(blocks), 16, 4), dtype=np.uint8)
+
+    for mode, group in groupBy(MODE_OF_BYTE[blocks['bits'][:, 0]]):
+        if mode < 8:
+            texels[group] = decodeMode(bits[group], mode)
+
+    return toImage(texels, width, height, output)
@@ -11,9 +11,8 @@
 ################################################################
 ################################################################
 
-from cpython cimport array
-from cython cimport view
 from libc.stdlib cimport malloc, free
+from libc.string cimport memcpy
 
 
 ctypedef unsigned char u8
@@ -22,352 +21,320 @@ ctypedef unsigned int u32
 ctypedef unsigned long long u64
 
 
-cdef u8 EXP5TO8R(u16 packedcol):
-    return (((packedcol) >> 8) & 0xf8) | (((packedcol) >> 13) & 0x07)
+cdef enum:
+    DXT1 = 1
+    DXT3 = 2
+    DXT5 = 3
+    BC4 = 4
+    BC5 = 5
 
 
-cdef u8 EXP6TO8G(u16 packedcol):
-    return (((packedcol) >> 3) & 0xfc) | (((packedcol) >>  9) & 0x03)
+# 5/6-bit to 8-bit channel expansion tables
+cdef u8[32] EXP5TO8
+cdef u8[64] EXP6TO8
+cdef u32 v
 
+for v in range(32):
+    EXP5TO8[v] = (v << 3) | (v >> 2)
 
-cdef u8 EXP5TO8B(u16 packedcol):
-    return (((packedcol) << 3) & 0xf8) | (((packedcol) >>  2) & 0x07)
+for v in range(64):
+    EXP6TO8[v] = (v << 2) | (v >> 4)
 
 
-cdef u8 EXP4TO8(u8 col):
+cdef inline u8 EXP4TO8(u8 col) noexcept nogil:
     return col | col << 4
 
 
-cdef (u8, u8, u8, u8) dxt135_decode_imageblock(u8 pixdata[], u32 img_block_src, u8 i, u8 j, u8 dxt_type):
+cdef void dxt135_decode_imageblock(const u8 *src, int dxt_type, u8 *texels) noexcept nogil:
+    """
+    Writes the 16 texels of a color block to texels as RGBA8, row after row.
+    """
     cdef:
-        u16 color0 = pixdata[img_block_src] | (pixdata[img_block_src + 1] << 8)
-        u16 color1 = pixdata[img_block_src + 2] | (pixdata[img_block_src + 3] << 8)
-        u32 bits = (pixdata[img_block_src + 4] | (pixdata[img_block_src + 5] << 8) |
-                    (pixdata[img_block_src + 6] << 16) | (pixdata[img_block_src + 7] << 24))
-
-        u8 bit_pos = 2 * (j * 4 + i)
-        u8 code = (bits >> bit_pos) & 3
- 
-        u8 ACOMP, RCOMP, GCOMP, BCOMP
-
-    ACOMP = 255
-    if code == 0:
-        RCOMP = EXP5TO8R(color0)
-        GCOMP = EXP6TO8G(color0)
-        BCOMP = EXP5TO8B(color0)
-
-    elif code == 1:
-        RCOMP = EXP5TO8R(color1)
-        GCOMP = EXP6TO8G(color1)
-        BCOMP = EXP5TO8B(color1)
-
-    elif code == 2:
-        if color0 > color1:
-            RCOMP = ((EXP5TO8R(color0) * 2 + EXP5TO8R(color1)) // 3)
-            GCOMP = ((EXP6TO8G(color0) * 2 + EXP6TO8G(color1)) // 3)
-            BCOMP = ((EXP5TO8B(color0) * 2 + EXP5TO8B(color1)) // 3)
+        u16 color0 = src[0] | (src[1] << 8)
+        u16 color1 = src[2] | (src[3] << 8)
+        u32 bits = src[4] | (src[5] << 8) | (src[6] << 16) | (<u32>src[7] << 24)
 
-        else:
-            RCOMP = ((EXP5TO8R(color0) + EXP5TO8R(color1)) // 2)
-            GCOMP = ((EXP6TO8G(color0) + EXP6TO8G(color1)) // 2)
-            BCOMP = ((EXP5TO8B(color0) + EXP5TO8B(color1)) // 2)
+        u8[16] palette
+        u32 c, k
 
-    elif code == 3:
-        if dxt_type > 1 or color0 > color1:
-            RCOMP = ((EXP5TO8R(color0) + EXP5TO8R(color1) * 2) // 3)
-            GCOMP = ((EXP6TO8G(color0) + EXP6TO8G(color1) * 2) // 3)
-            BCOMP = ((EXP5TO8B(color0) + EXP5TO8B(color1) * 2) // 3)
+    palette[0] = EXP5TO8[color0 >> 11]
+    palette[1] = EXP6TO8[(color0 >> 5) & 0x3f]
+    palette[2] = EXP5TO8[color0 & 0x1f]
 
-        else:
-            RCOMP = 0
-            GCOMP = 0
-            BCOMP = 0
-
-            if dxt_type == 1:
-                ACOMP = 0
- 
-    return ACOMP, RCOMP, GCOMP, BCOMP
+    palette[4] = EXP5TO8[color1 >> 11]
+    palette[5] = EXP6TO8[(color1 >> 5) & 0x3f]
+    palette[6] = EXP5TO8[color1 & 0x1f]
 
+    for c in range(3):
+        if color0 > color1:
+            palette[8 + c] = (palette[c] * 2 + palette[4 + c]) // 3
 
-cdef u8 dxt5_decode_alphablock(u8 pixdata[], u32 blksrc, u8 i, u8 j):
-    cdef:
-        u8 alpha0 = pixdata[blksrc]
-        u8 alpha1 = pixdata[blksrc + 1]
+        else:
+            palette[8 + c] = (palette[c] + palette[4 + c]) // 2
 
-        u8 bit_pos = ((j & 3) * 4 + (i & 3)) * 3
-        u8 acodelow = pixdata[blksrc + 2 + bit_pos // 8]
-        u8 acodehigh = pixdata[blksrc + 3 + bit_pos // 8]
-        u8 code = (acodelow >> (bit_pos & 0x07) |
-                (acodehigh << (8 - (bit_pos & 0x07)))) & 0x07
+        if dxt_type > 1 or color0 > color1:
+            palette[12 + c] = (palette[c] + palette[4 + c] * 2) // 3
 
-    if code == 0:
-        ACOMP = alpha0
+        else:
+            palette[12 + c] = 0
 
-    elif code == 1:
-        ACOMP = alpha1
+    palette[3] = palette[7] = palette[11] = palette[15] = 255
+    if dxt_type == 1 and color0 <= color1:
+        palette[15] = 0
 
-    elif alpha0 > alpha1:
-        ACOMP = (alpha0 * (8 - code) + (alpha1 * (code - 1))) // 7
+    for k in range(16):
+        memcpy(texels + 4 * k, palette + 4 * ((bits >> (2 * k)) & 3), 4)
 
-    elif code < 6:
-        ACOMP = (alpha0 * (6 - code) + (alpha1 * (code - 1))) // 5
 
-    elif code == 6:
-        ACOMP = 0
+cdef void dxt3_decode_alphablock(const u8 *src, u8 *out) noexcept nogil:
+    """
+    Writes the 16 alpha values of a DXT3 block to every 4th byte of out.
+    """
+    cdef u32 k
 
-    else:
-        ACOMP = 255
- 
-    return ACOMP
+    for k in range(16):
+        out[4 * k] = EXP4TO8((src[k // 2] >> (4 * (k & 1))) & 0xf)
 
 
-cdef u8 dxt5_decode_alphablock_signed(u8 pixdata[], u32 blksrc, u8 i, u8 j):
+cdef void dxt5_decode_alphablock(const u8 *src, int SNORM, u8 *out) noexcept nogil:
+    """
+    Writes the 16 values of a DXT5/BC4 alpha block to every 4th byte of out
+    (biased by 128 if SNORM, as the decoders return them).
+    """
     cdef:
-        u8 alpha0 = pixdata[blksrc]
-        u8 alpha1 = pixdata[blksrc + 1]
-
-        u8 bit_pos = ((j & 3) * 4 + (i & 3)) * 3
-        u8 acodelow = pixdata[blksrc + 2 + bit_pos // 8]
-        u8 acodehigh = pixdata[blksrc + 3 + bit_pos // 8]
-        u8 code = (acodelow >> (bit_pos & 0x07) |
-                (acodehigh << (8 - (bit_pos & 0x07)))) & 0x07
+        int alpha0 = src[0]
+        int alpha1 = src[1]
+        u64 bits = 0
 
-    if code == 0:
-        ACOMP = alpha0
+        int[8] palette
+        int code
+        u32 k
 
-    elif code == 1:
-        ACOMP = alpha1
+    for k in range(6):
+        bits |= <u64>src[2 + k] << (8 * k)
 
-    elif <char>alpha0 > <char>alpha1:
-        ACOMP = <u8>((<char>alpha0 * (8 - code) + (<char>alpha1 * (code - 1))) // 7)
+    if SNORM:
+        alpha0 = <signed char>src[0]
+        alpha1 = <signed char>src[1]
 
-    elif code < 6:
-        ACOMP = <u8>((<char>alpha0 * (6 - code) + (<char>alpha1 * (code - 1))) // 5)
+    palette[0] = src[0]
+    palette[1] = src[1]
 
-    elif code == 6:
-        ACOMP = 0x80
+    if alpha0 > alpha1:
+        for code in range(2, 8):
+            palette[code] = (alpha0 * (8 - code) + (alpha1 * (code - 1))) // 7
 
     else:
-        ACOMP = 0x7f
- 
-    return ACOMP
+        for code in range(2, 6):
+            palette[code] = (alpha0 * (6 - code) + (alpha1 * (code - 1))) // 5
+
+        palette[6] = -128 if SNORM else 0
+        palette[7] = 127 if SNORM else 255
 
+    for k in range(16):
+        code = palette[(bits >> (3 * k)) & 7] & 0xff
+        out[4 * k] = code ^ 0x80 if SNORM else code
 
-cdef (u8, u8, u8, u8) fetch_2d_texel_rgba_dxt1(u32 srcRowStride, u8 pixdata[], u32 i, u32 j):
+
+cdef void decompressBlocks(const u8 *data, const u32 *blockAddrs, u32 width, u32 height, int format_, int SNORM,
+                           u8 *output, u32 startRow, u32 endRow) noexcept nogil:
+    """
+    Decodes block rows startRow to endRow to the RGBA8 output, one whole block at a time.
+    """
     cdef:
-        u32 blksrc = ((srcRowStride + 3) // 4 * (j // 4) + (i // 4)) * 8
-        u8 ACOMP, RCOMP, GCOMP, BCOMP
+        u32 blocksX = (width + 3) // 4
+        u32 bpp = 8 if format_ == DXT1 or format_ == BC4 else 16
+        u32 blkIdx, bx, by, k, row, rowSize
+        const u8 *src
 
-    ACOMP, RCOMP, GCOMP, BCOMP = dxt135_decode_imageblock(pixdata, blksrc, i & 3, j & 3, 1)
- 
-    return RCOMP, GCOMP, BCOMP, ACOMP
+        u8[64] texels
 
+    for by in range(startRow, endRow):
+        for bx in range(blocksX):
+            blkIdx = by * blocksX + bx
+            src = data + (blockAddrs[blkIdx] if blockAddrs != NULL else blkIdx * bpp)
 
-cdef (u8, u8, u8, u8) fetch_2d_texel_rgba_dxt3(u32 srcRowStride, u8 pixdata[], u32 i, u32 j):
-    cdef:
-        u32 blksrc = ((srcRowStride + 3) // 4 * (j // 4) + (i // 4)) * 16
-        u8 ACOMP, RCOMP, GCOMP, BCOMP
+            if format_ == DXT1:
+                dxt135_decode_imageblock(src, 1, texels)
 
-    ACOMP, RCOMP, GCOMP, BCOMP = dxt135_decode_imageblock(pixdata, blksrc + 8, i & 3, j & 3, 2)
+            elif format_ == DXT3:
+                dxt135_decode_imageblock(src + 8, 2, texels)
+                dxt3_decode_alphablock(src, texels + 3)
 
-    cdef u8 anibble = (pixdata[blksrc + ((j & 3) * 4 + (i & 3)) // 2] >> (4 * (i & 1))) & 0xf
-    ACOMP = EXP4TO8(anibble)
- 
-    return RCOMP, GCOMP, BCOMP, ACOMP
+            elif format_ == DXT5:
+                dxt135_decode_imageblock(src + 8, 2, texels)
+                dxt5_decode_alphablock(src, 0, texels + 3)
 
+            elif format_ == BC4:
+                dxt5_decode_alphablock(src, SNORM, texels)
 
-cdef (u8, u8, u8, u8) fetch_2d_texel_rgba_dxt5(u32 srcRowStride, u8 pixdata[], u32 i, u32 j):
-    cdef:
-        u32 blksrc = ((srcRowStride + 3) // 4 * (j // 4) + (i // 4)) * 16
+                for k in range(16):
+                    texels[4 * k + 1] = texels[4 * k]
+                    texels[4 * k + 2] = texels[4 * k]
+                    texels[4 * k + 3] = 255
 
-        u8 ACOMP = dxt5_decode_alphablock(pixdata, blksrc, i & 3, j & 3)
-        u8 RCOMP, GCOMP, BCOMP
+            else:
+                dxt5_decode_alphablock(src, SNORM, texels)
+                dxt5_decode_alphablock(src + 8, SNORM, texels + 1)
 
-    _, RCOMP, GCOMP, BCOMP = dxt135_decode_imageblock(pixdata, blksrc + 8, i & 3, j & 3, 2)
+                for k in range(16):
+                    texels[4 * k + 2] = 0
+                    texels[4 * k + 3] = 255
 
-    return RCOMP, GCOMP, BCOMP, ACOMP
+            rowSize = min(4, width - bx * 4) * 4
 
+            for row in range(min(4, height - by * 4)):
+                memcpy(output + ((by * 4 + row) * width + bx * 4) * 4, texels + row * 16, rowSize)
 
-cdef u8 fetch_2d_texel_r_bc4(u32 srcRowStride, u8 pixdata[], u32 i, u32 j):
+
+cdef decompress(const u8[::1] data, u32 width, u32 height, int format_, int SNORM, blockAddrs, output):
+    """
+    Decodes the surface to RGBA8, into output if given (else a new bytearray), and returns it.
+    """
     cdef:
-        u32 blksrc = ((srcRowStride + 3) // 4 * (j // 4) + (i // 4)) * 8
-        u8 RCOMP = dxt5_decode_alphablock(pixdata, blksrc, i & 3, j & 3)
- 
-    return RCOMP
+        const u32[::1] addrView
+        const u32 *addrs = NULL
+        u8[::1] out
+        u32 size = width * height * 4
 
+    if output is None:
+        output = bytearray(size)
 
-cdef u8 fetch_2d_texel_r_bc4_snorm(u32 srcRowStride, u8 pixdata[], u32 i, u32 j):
-    cdef:
-        u32 blksrc = ((srcRowStride + 3) // 4 * (j // 4) + (i // 4)) * 8
-        u8 RCOMP = dxt5_decode_alphablock_signed(pixdata, blksrc, i & 3, j & 3)
- 
-    return RCOMP
+    if size == 0:
+        return output
 
+    if blockAddrs is not None:
+        addrView = blockAddrs
+        addrs = &addrView[0]
 
-cdef (u8, u8) fetch_2d_texel_rg_bc5(u32 srcRowStride, u8 pixdata[], u32 i, u32 j):
-    cdef:
-        u32 blksrc = ((srcRowStride + 3) // 4 * (j // 4) + (i // 4)) * 16
-        u8 RCOMP = dxt5_decode_alphablock(pixdata, blksrc, i & 3, j & 3)
-        u8 GCOMP = dxt5_decode_alphablock(pixdata, blksrc + 8, i & 3, j & 3)
- 
-    return RCOMP, GCOMP
+    out = output
 
+    with nogil:
+        decompressBlocks(&data[0], addrs, width, height, format_, SNORM, &out[0], 0, (height + 3) // 4)
 
-cdef (u8, u8) fetch_2d_texel_rg_bc5_snorm(u32 srcRowStride, u8 pixdata[], u32 i, u32 j):
-    cdef:
-        u32 blksrc = ((srcRowStride + 3) // 4 * (j // 4) + (i // 4)) * 16
-        u8 RCOMP = dxt5_decode_alphablock_signed(pixdata, blksrc, i & 3, j & 3)
-        u8 GCOMP = dxt5_decode_alphablock_signed(pixdata, blksrc + 8, i & 3, j & 3)
- 
-    return RCOMP, GCOMP
+    return output
 
 
-cpdef bytes decompressDXT1(bytes data, u32 width, u32 height):
+cdef void thumbnailBlocks(const u8 *data, const u32 *blockAddrs, u32 numBlocks, int format_, int SNORM,
+                          u8 *output) noexcept nogil:
+    """
+    Writes the average of the endpoints of every block to the RGBA8 output, one texel per block.
+    """
     cdef:
-        array.array dataArr = array.array('B', data)
+        u32 bpp = 8 if format_ == DXT1 or format_ == BC4 else 16
+        u32 blkIdx, k, alpha
+        u16 color0, color1
+        const u8 *src
+        const u8 *colorSrc
+        int c, alpha0, alpha1
 
-        u8 *work = dataArr.data.as_uchars
-        u8 *output = <u8 *>malloc(width * height * 4)
+    for blkIdx in range(numBlocks):
+        src = data + (blockAddrs[blkIdx] if blockAddrs != NULL else blkIdx * bpp)
 
-        u8 R, G, B, A
-        u32 y, x, pos
- 
-    try:
-        for y in range(height):
-            for x in range(width):
-                R, G, B, A = fetch_2d_texel_rgba_dxt1(width, work, x, y)
+        if format_ <= DXT5:
+            colorSrc = src if format_ == DXT1 else src + 8
+            color0 = colorSrc[0] | (colorSrc[1] << 8)
+            color1 = colorSrc[2] | (colorSrc[3] << 8)
 
-                pos = (y * width + x) * 4
+            output[0] = (EXP5TO8[color0 >> 11] + EXP5TO8[color1 >> 11] + 1) >> 1
+            output[1] = (EXP6TO8[(color0 >> 5) & 0x3f] + EXP6TO8[(color1 >> 5) & 0x3f] + 1) >> 1
+            output[2] = (EXP5TO8[color0 & 0x1f] + EXP5TO8[color1 & 0x1f] + 1) >> 1
 
-                output[pos + 0] = R
-                output[pos + 1] = G
-                output[pos + 2] = B
-                output[pos + 3] = A
-     
-        return bytes(<u8[:width * height * 4]>output)
+            if format_ == DXT1:
+                output[3] = 255
 
-    finally:
-        free(output)
+            elif format_ == DXT3:
+                # DXT3 has no alpha endpoints, average its 16 explicit values instead
+                alpha = 0
+                for k in range(8):
+                    alpha += (src[k] & 0xf) + (src[k] >> 4)
 
+                output[3] = (alpha * 17 + 8) >> 4
 
-cpdef bytes decompressDXT3(bytes data, u32 width, u32 height):
-    cdef:
-        array.array dataArr = array.array('B', data)
+            else:
+                output[3] = (src[0] + src[1] + 1) >> 1
 
-        u8 *work = dataArr.data.as_uchars
-        u8 *output = <u8 *>malloc(width * height * 4)
+        else:
+            for c in range(2 if format_ == BC5 else 1):
+                if SNORM:
+                    alpha0 = <signed char>src[8 * c]
+                    alpha1 = <signed char>src[8 * c + 1]
+                    output[c] = ((alpha0 + alpha1 + 1) >> 1) + 128
 
-        u8 R, G, B, A
-        u32 y, x, pos
- 
-    try:
-        for y in range(height):
-            for x in range(width):
-                R, G, B, A = fetch_2d_texel_rgba_dxt3(width, work, x, y)
+                else:
+                    output[c] = (src[8 * c] + src[8 * c + 1] + 1) >> 1
 
-                pos = (y * width + x) * 4
+            if format_ == BC4:
+                output[1] = output[2] = output[0]
 
-                output[pos + 0] = R
-                output[pos + 1] = G
-                output[pos + 2] = B
-                output[pos + 3] = A
-     
-        return bytes(<u8[:width * height * 4]>output)
+            else:
+                output[2] = 0
 
-    finally:
-        free(output)
+            output[3] = 255
+
+        output += 4
 
 
-cpdef bytes decompressDXT5(bytes data, u32 width, u32 height):
+cdef bytes thumbnail(const u8[::1] data, u32 width, u32 height, int format_, int SNORM, blockAddrs):
     cdef:
-        array.array dataArr = array.array('B', data)
+        const u32[::1] addrView
+        const u32 *addrs = NULL
+        u32 numBlocks = ((width + 3) // 4) * ((height + 3) // 4)
 
-        u8 *work = dataArr.data.as_uchars
-        u8 *output = <u8 *>malloc(width * height * 4)
+    if numBlocks == 0:
+        return b''
 
-        u8 R, G, B, A
-        u32 y, x, pos
- 
-    try:
-        for y in range(height):
-            for x in range(width):
-                R, G, B, A = fetch_2d_texel_rgba_dxt5(width, work, x, y)
+    if blockAddrs is not None:
+        addrView = blockAddrs
+        addrs = &addrView[0]
+
+    cdef u8 *output = <u8 *>malloc(numBlocks * 4)
 
-                pos = (y * width + x) * 4
+    try:
+        with nogil:
+            thumbnailBlocks(&data[0], addrs, numBlocks, format_, SNORM, output)
 
-                output[pos + 0] = R
-                output[pos + 1] = G
-                output[pos + 2] = B
-                output[pos + 3] = A
-     
-        return bytes(<u8[:width * height * 4]>output)
+        return bytes(<u8[:numBlocks * 4]>output)
 
     finally:
         free(output)
 
 
-cpdef bytes decompressBC4(bytes data, u32 width, u32 height, int SNORM):
-    cdef:
-        array.array dataArr = array.array('B', data)
+cpdef decompressDXT1(const u8[::1] data, u32 width, u32 height, blockAddrs=None, output=None):
+    return decompress(data, width, height, DXT1, 0, blockAddrs, output)
 
-        u8 *work = dataArr.data.as_uchars
-        u8 *output = <u8 *>malloc(width * height * 4)
 
-        u8 R
-        u32 y, x, pos
- 
-    try:
-        for y in range(height):
-            for x in range(width):
-                if SNORM:
-                    R = <char>fetch_2d_texel_r_bc4_snorm(width, data, x, y) + 128
+cpdef decompressDXT3(const u8[::1] data, u32 width, u32 height, blockAddrs=None, output=None):
+    return decompress(data, width, height, DXT3, 0, blockAddrs, output)
 
-                else:
-                    R = fetch_2d_texel_r_bc4(width, data, x, y)
 
-                pos = (y * width + x) * 4
+cpdef decompressDXT5(const u8[::1] data, u32 width, u32 height, blockAddrs=None, output=None):
+    return decompress(data, width, height, DXT5, 0, blockAddrs, output)
 
-                output[pos + 0] = R
-                output[pos + 1] = R
-                output[pos + 2] = R
-                output[pos + 3] = 255
-     
-        return bytes(<u8[:width * height * 4]>output)
 
-    finally:
-        free(output)
+cpdef decompressBC4(const u8[::1] data, u32 width, u32 height, int SNORM, blockAddrs=None, output=None):
+    return decompress(data, width, height, BC4, SNORM, blockAddrs, output)
 
 
-cpdef bytes decompressBC5(bytes data, u32 width, u32 height, int SNORM):
-    cdef:
-        array.array dataArr = array.array('B', data)
+cpdef decompressBC5(const u8[::1] data, u32 width, u32 height, int SNORM, blockAddrs=None, output=None):
+    return decompress(data, width, height, BC5, SNORM, blockAddrs, output)
 
-        u8 *work = dataArr.data.as_uchars
-        u8 *output = <u8 *>malloc(width * height * 4)
 
-        u8 R, G
-        u32 y, x, pos
- 
-    try:
-        for y in range(height):
-            for x in range(width):
-                if SNORM:
-                    R, G = fetch_2d_texel_rg_bc5_snorm(width, data, x, y)
+cpdef bytes thumbnailDXT1(const u8[::1] data, u32 width, u32 height, blockAddrs=None):
+    return thumbnail(data, width, height, DXT1, 0, blockAddrs)
 
-                    R = <char>R + 128
-                    G = <char>G + 128
 
-                else:
-                    R, G = fetch_2d_texel_rg_bc5(width, data, x, y)
+cpdef bytes thumbnailDXT3(const u8[::1] data, u32 width, u32 height, blockAddrs=None):
+    return thumbnail(data, width, height, DXT3, 0, blockAddrs)
 
-                pos = (y * width + x) * 4
 
-                output[pos + 0] = R
-                output[pos + 1] = G
-                output[pos + 2] = 0
-                output[pos + 3] = 255
-     
-        return bytes(<u8[:width * height * 4]>output)
+cpdef bytes thumbnailDXT5(const u8[::1] data, u32 width, u32 height, blockAddrs=None):
+    return thumbnail(data, width, height, DXT5, 0, blockAddrs)
 
-    finally:
-        free(output)
+
+cpdef bytes thumbnailBC4(const u8[::1] data, u32 width, u32 height, int SNORM, blockAddrs=None):
+    return thumbnail(data, width, height, BC4, SNORM, blockAddrs)
+
+
+cpdef bytes thumbnailBC5(const u8[::1] data, u32 width, u32 height, int SNORM, blockAddrs=None):
+    return thumbnail(data, width, height, BC5, SNORM, blockAddrs)
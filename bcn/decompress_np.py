@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# BC1-BC5 Decompressor
+# Version 0.1
+# Copyright © 2018 MasterVermilli0n / AboodXD
+
+# decompress_np.py
+# A BC1-BC5 decompressor in NumPy based on libtxc_dxtn.
+# Every block of the surface is decoded at once.
+
+################################################################
+################################################################
+
+import numpy as np
+
+
+# Block layouts
+DXT1Block = np.dtype([('color0', '<u2'), ('color1', '<u2'), ('indices', '<u4')])
+DXT3Block = np.dtype([('alpha', '<u8'), ('color0', '<u2'), ('color1', '<u2'), ('indices', '<u4')])
+DXT5Block = DXT3Block
+BC4Block = np.dtype([('red', '<u8')])
+BC5Block = np.dtype([('red', '<u8'), ('green', '<u8')])
+
+# 5/6-bit to 8-bit channel expansion tables
+EXP5TO8 = np.array([(v << 3) | (v >> 2) for v in range(32)], dtype=np.int32)
+EXP6TO8 = np.array([(v << 2) | (v >> 4) for v in range(64)], dtype=np.int32)
+
+colorShifts = np.arange(0, 32, 2, dtype=np.uint32)
+alphaShifts = np.arange(16, 64, 3, dtype=np.uint64)
+nibbleShifts = np.arange(0, 64, 4, dtype=np.uint64)
+codes = np.arange(8, dtype=np.int32)
+
+
+def getBlocks(data, width, height, blockType, blockAddrs):
+    """
+    Returns the blocks of the surface as a structured array, in linear order.
+    """
+    numBlocks = ((width + 3) // 4) * ((height + 3) // 4)
+
+    if blockAddrs is None:
+        return np.frombuffer(data, dtype=blockType, count=numBlocks)
+
+    src = np.frombuffer(data, dtype=np.uint8)
+    addrs = np.asarray(blockAddrs[:numBlocks], dtype=np.intp)
+
+    blocks = src[addrs[:, None] + np.arange(blockType.itemsize)]
+    return blocks.view(blockType).reshape(numBlocks)
+
+
+def toImage(texels, width, height, output=None):
+    """
+    Arranges the 16 texels of every block into an (height, width, 4) image,
+    written straight into the output buffer if given.
+    """
+    blocksX = (width + 3) // 4
+    blocksY = (height + 3) // 4
+
+    image = texels.reshape(blocksY, blocksX, 4, 4, 4).transpose(0, 2, 1, 3, 4)
+    image = image.reshape(blocksY * 4, blocksX * 4, 4)
+
+    if output is None:
+        return np.ascontiguousarray(image[:height, :width])
+
+    out = np.frombuffer(output, dtype=texels.dtype).reshape(height, width, 4)
+    out[...] = image[:height, :width]
+
+    return out
+
+
+def decodeColorBlocks(blocks, dxt_type):
+    """
+    Returns the 16 RGBA8 texels of every color block.
+    """
+    color0 = blocks['color0'].astype(np.int32)
+    color1 = blocks['color1'].astype(np.int32)
+    greater = color0 > color1
+
+    color0 = np.stack([EXP5TO8[color0 >> 11], EXP6TO8[(color0 >> 5) & 0x3f], EXP5TO8[color0 & 0x1f]], axis=-1)
+    color1 = np.stack([EXP5TO8[color1 >> 11], EXP6TO8[(color1 >> 5) & 0x3f], EXP5TO8[color1 & 0x1f]], axis=-1)
+
+    color2 = np.where(greater[:, None], (color0 * 2 + color1) // 3, (color0 + color1) // 2)
+
+    if dxt_type > 1:
+        color3 = (color0 + color1 * 2) // 3
+
+    else:
+        color3 = np.where(greater[:, None], (color0 + color1 * 2) // 3, 0)
+
+    palette = np.empty((len(blocks), 4, 4), dtype=np.uint8)
+    palette[:, 0, :3] = color0
+    palette[:, 1, :3] = color1
+    palette[:, 2, :3] = color2
+    palette[:, 3, :3] = color3
+    palette[:, :, 3] = 255
+
+    if dxt_type == 1:
+        palette[:, 3, 3] = np.where(greater, 255, 0)
+
+    indices = (blocks['indices'][:, None] >> colorShifts) & np.uint32(3)
+    return np.take_along_axis(palette, indices[:, :, None].astype(np.intp), axis=1)
+
+
+def decodeAlphaBlocks(bits, signed=False):
+    """
+    Returns the 16 values of every DXT5/BC4 alpha block
+    (biased by 128 if signed, as the SNORM decoders return them).
+    """
+    alpha0 = (bits & np.uint64(0xff)).astype(np.int32)
+    alpha1 = ((bits >> np.uint64(8)) & np.uint64(0xff)).astype(np.int32)
+
+    if signed:
+        alpha0_ = np.where(alpha0 > 127, alpha0 - 256, alpha0)
+        alpha1_ = np.where(alpha1 > 127, alpha1 - 256, alpha1)
+
+    else:
+        alpha0_ = alpha0
+        alpha1_ = alpha1
+
+    greater = (alpha0_ > alpha1_)[:, None]
+    alpha0_ = alpha0_[:, None]
+    alpha1_ = alpha1_[:, None]
+
+    palette = np.where(greater, (alpha0_ * (8 - codes) + alpha1_ * (codes - 1)) // 7,
+                                (alpha0_ * (6 - codes) + alpha1_ * (codes - 1)) // 5)
+
+    palette[:, 6] = np.where(greater[:, 0], palette[:, 6], -128 if signed else 0)
+    palette[:, 7] = np.where(greater[:, 0], palette[:, 7], 127 if signed else 255)
+    palette[:, 0] = alpha0
+    palette[:, 1] = alpha1
+
+    palette &= 0xff
+    if signed:
+        palette ^= 0x80
+
+    indices = (bits[:, None] >> alphaShifts) & np.uint64(7)
+    return np.take_along_axis(palette.astype(np.uint8), indices.astype(np.intp), axis=1)
+
+
+def decompressDXT1(data, width, height, blockAddrs=None, output=None):
+    blocks = getBlocks(data, width, height, DXT1Block, blockAddrs)
+
+    return toImage(decodeColorBlocks(blocks, 1), width, height, output)
+
+
+def decompressDXT3(data, width, height, blockAddrs=None, output=None):
+    blocks = getBlocks(data, width, height, DXT3Block, blockAddrs)
+
+    texels = decodeColorBlocks(blocks, 2)
+    texels[:, :, 3] = ((blocks['alpha'][:, None] >> nibbleShifts) & np.uint64(0xf)) * 17
+
+    return toImage(texels, width, height, output)
+
+
+def decompressDXT5(data, width, height, blockAddrs=None, output=None):
+    blocks = getBlocks(data, width, height, DXT5Block, blockAddrs)
+
+    texels = decodeColorBlocks(blocks, 2)
+    texels[:, :, 3] = decodeAlphaBlocks(blocks['alpha'])
+
+    return toImage(texels, width, height, output)
+
+
+def decompressBC4(data, width, height, SNORM, blockAddrs=None, output=None):
+    blocks = getBlocks(data, width, height, BC4Block, blockAddrs)
+
+    texels = np.empty((len(blocks), 16, 4), dtype=np.uint8)
+    texels[:, :, :3] = decodeAlphaBlocks(blocks['red'], SNORM)[:, :, None]
+    texels[:, :, 3] = 255
+
+    return toImage(texels, width, height, output)
+
+
+def decompressBC5(data, width, height, SNORM, blockAddrs=None, output=None):
+    blocks = getBlocks(data, width, height, BC5Block, blockAddrs)
+
+    texels = np.empty((len(blocks), 16, 4), dtype=np.uint8)
+    texels[:, :, 0] = decodeAlphaBlocks(blocks['red'], SNORM)
+    texels[:, :, 1] = decodeAlphaBlocks(blocks['green'], SNORM)
+    texels[:, :, 2] = 0
+    texels[:, :, 3] = 255
+
+    return toImage(texels, width, height, output)
+
+
+def toThumbnail(texels, width, height):
+    """
+    Arranges the RGBA8 texel of every block into a (blocksY, blocksX, 4) image.
+    """
+    return texels.astype(np.uint8).reshape((height + 3) // 4, (width + 3) // 4, 4)
+
+
+def getColorAverages(blocks):
+    """
+    Returns the average of the two endpoint colors of every color block as RGB8.
+    """
+    color0 = blocks['color0'].astype(np.int32)
+    color1 = blocks['color1'].astype(np.int32)
+
+    return np.stack([(EXP5TO8[color0 >> 11] + EXP5TO8[color1 >> 11] + 1) >> 1,
+                     (EXP6TO8[(color0 >> 5) & 0x3f] + EXP6TO8[(color1 >> 5) & 0x3f] + 1) >> 1,
+                     (EXP5TO8[color0 & 0x1f] + EXP5TO8[color1 & 0x1f] + 1) >> 1], axis=-1)
+
+
+def getAlphaAverages(bits, signed=False):
+    """
+    Returns the average of the two endpoints of every DXT5/BC4 alpha block
+    (biased by 128 if signed, as the SNORM decoders return them).
+    """
+    alpha0 = (bits & np.uint64(0xff)).astype(np.int32)
+    alpha1 = ((bits >> np.uint64(8)) & np.uint64(0xff)).astype(np.int32)
+
+    if signed:
+        alpha0 = np.where(alpha0 > 127, alpha0 - 256, alpha0)
+        alpha1 = np.where(alpha1 > 127, alpha1 - 256, alpha1)
+
+        return ((alpha0 + alpha1 + 1) >> 1) + 128
+
+    return (alpha0 + alpha1 + 1) >> 1
+
+
+def thumbnailDXT1(data, width, height, blockAddrs=None):
+    blocks = getBlocks(data, width, height, DXT1Block, blockAddrs)
+
+    texels = np.full((len(blocks), 4), 255, dtype=np.int32)
+    texels[:, :3] = getColorAverages(blocks)
+
+    return toThumbnail(texels, width, height)
+
+
+def thumbnailDXT3(data, width, height, blockAddrs=None):
+    blocks = getBlocks(data, width, height, DXT3Block, blockAddrs)
+
+    # DXT3 has no alpha endpoints, average its 16 explicit values instead
+    alpha = ((blocks['alpha'][:, None] >> nibbleShifts) & np.uint64(0xf)).sum(axis=1).astype(np.int32)
+
+    texels = np.empty((len(blocks), 4), dtype=np.int32)
+    texels[:, :3] = getColorAverages(blocks)
+    texels[:, 3] = (alpha * 17 + 8) >> 4
+
+    return toThumbnail(texels, width, height)
+
+
+def thumbnailDXT5(data, width, height, blockAddrs=None):
+    blocks = getBlocks(data, width, height, DXT5Block, blockAddrs)
+
+    texels = np.empty((len(blocks), 4), dtype=np.int32)
+    texels[:, :3] = getColorAverages(blocks)
+    texels[:, 3] = getAlphaAverages(blocks['alpha'])
+
+    return toThumbnail(texels, width, height)
+
+
+def thumbnailBC4(data, width, height, SNORM, blockAddrs=None):
+    blocks = getBlocks(data, width, height, BC4Block, blockAddrs)
+
+    texels = np.full((len(blocks), 4), 255, dtype=np.int32)
+    texels[:, :3] = getAlphaAverages(blocks['red'], SNORM)[:, None]
+
+    return toThumbnail(texels, width, height)
+
+
+def thumbnailBC5(data, width, height, SNORM, blockAddrs=None):
+    blocks = getBlocks(data, width, height, BC5Block, blockAddrs)
+
+    texels = np.zeros((len(blocks), 4), dtype=np.int32)
+    texels[:, 0] = getAlphaAverages(blocks['red'], SNORM)
+    texels[:, 1] = getAlphaAverages(blocks['green'], SNORM)
+    texels[:, 3] = 255
+
+    return toThumbnail(texels, width, height)
@@ -26,6 +26,7 @@ from PyQt5 import QtWidgets
 import dds
 import bcn
 import globals
+import pool
 
 from structs import (
     BNTXHeader, TexContainer, BlockHeader, StringTable,
@@ -110,6 +111,26 @@ class File:
 
         return 0
 
+    def getMipLevels(self, texture, blkHeight):
+        """
+        Returns the (width, height, mipOffset, blockHeightLog2) of every mip level of a texture.
+        """
+        levels = []
+
+        linesPerBlockHeight = (1 << texture.blockHeightLog2) * 8
+        blockHeightShift = 0
+
+        for mipLevel, mipOffset in enumerate(texture.mipOffsets):
+            width = max(1, texture.width >> mipLevel)
+            height = max(1, texture.height >> mipLevel)
+
+            if pow2_round_up(DIV_ROUND_UP(height, blkHeight)) < linesPerBlockHeight:
+                blockHeightShift += 1
+
+            levels.append((width, height, mipOffset, max(0, texture.blockHeightLog2 - blockHeightShift)))
+
+        return levels
+
     def rawData(self, texture):
         if (texture.format_ >> 8) in globals.blk_dims:
             blkWidth, blkHeight = globals.blk_dims[texture.format_ >> 8]
@@ -120,28 +141,128 @@ class File:
         bpp = globals.bpps[texture.format_ >> 8]
 
         target = 1 if self.target == "NX  " else 0
-        result_ = []
+        data = memoryview(texture.data)
 
-        linesPerBlockHeight = (1 << texture.blockHeightLog2) * 8
-        blockHeightShift = 0
+        def deswizzleLevel(level):
+            width, height, mipOffset, blockHeightLog2 = level
+            size = DIV_ROUND_UP(width, blkWidth) * DIV_ROUND_UP(height, blkHeight) * bpp
 
-        for mipLevel, mipOffset in enumerate(texture.mipOffsets):
-            width = max(1, texture.width >> mipLevel)
-            height = max(1, texture.height >> mipLevel)
+            return swizzle.deswizzle(
+                width, height, blkWidth, blkHeight, target, bpp, texture.tileMode,
+                blockHeightLog2, data[mipOffset:], bytearray(size),
+            )
 
-            size = DIV_ROUND_UP(width, blkWidth) * DIV_ROUND_UP(height, blkHeight) * bpp
+        result_ = pool.map(deswizzleLevel, self.getMipLevels(texture, blkHeight), level=1)
 
-            if pow2_round_up(DIV_ROUND_UP(height, blkHeight)) < linesPerBlockHeight:
-                blockHeightShift += 1
+        return result_, blkWidth, blkHeight
+
+    def rawDataLevel(self, texture, mipLevel=0):
+        """
+        Deswizzles only one mip level of a texture.
+        """
+        if (texture.format_ >> 8) in globals.blk_dims:
+            blkWidth, blkHeight = globals.blk_dims[texture.format_ >> 8]
+
+        else:
+            blkWidth, blkHeight = 1, 1
+
+        bpp = globals.bpps[texture.format_ >> 8]
+
+        target = 1 if self.target == "NX  " else 0
+        width, height, mipOffset, blockHeightLog2 = self.getMipLevels(texture, blkHeight)[mipLevel]
+        size = DIV_ROUND_UP(width, blkWidth) * DIV_ROUND_UP(height, blkHeight) * bpp
+
+        result = swizzle.deswizzle(
+            width, height, blkWidth, blkHeight, target, bpp, texture.tileMode,
+            blockHeightLog2, memoryview(texture.data)[mipOffset:], bytearray(size),
+        )
+
+        return result, blkWidth, blkHeight
+
+    def getPreviewLevel(self, texture, size):
+        """
+        Returns the (mipLevel, width, height) of the smallest mip level
+        whose longer side is still at least size texels.
+        """
+        if (texture.format_ >> 8) in globals.blk_dims:
+            _, blkHeight = globals.blk_dims[texture.format_ >> 8]
+
+        else:
+            blkHeight = 1
 
-            result = swizzle.deswizzle(
+        levels = self.getMipLevels(texture, blkHeight)
+
+        for mipLevel in reversed(range(len(levels))):
+            width, height, _, _ = levels[mipLevel]
+            if max(width, height) >= size or mipLevel == 0:
+                return mipLevel, width, height
+
+    def iterRawData(self, texture, numMips=None):
+        """
+        Yields the deswizzled data of the first numMips mip levels (all of them by default),
+        one band of GOB blocks at a time.
+        """
+        if (texture.format_ >> 8) in globals.blk_dims:
+            blkWidth, blkHeight = globals.blk_dims[texture.format_ >> 8]
+
+        else:
+            blkWidth, blkHeight = 1, 1
+
+        bpp = globals.bpps[texture.format_ >> 8]
+
+        target = 1 if self.target == "NX  " else 0
+        data = memoryview(texture.data)
+
+        for width, height, mipOffset, blockHeightLog2 in self.getMipLevels(texture, blkHeight)[:numMips]:
+            yield from swizzle.iterDeswizzle(
                 width, height, blkWidth, blkHeight, target, bpp, texture.tileMode,
-                max(0, texture.blockHeightLog2 - blockHeightShift), texture.data[mipOffset:],
+                blockHeightLog2, data[mipOffset:],
             )
 
-            result_.append(result[:size])
+    def rawDataRegion(self, texture, x, y, width, height, mipLevel=0):
+        """
+        Deswizzles only the blocks covering a texel rectangle of a mip level.
+        swizzle.getRegionBlocks() gives the rectangle of blocks that is returned.
+        """
+        if (texture.format_ >> 8) in globals.blk_dims:
+            blkWidth, blkHeight = globals.blk_dims[texture.format_ >> 8]
 
-        return result_, blkWidth, blkHeight
+        else:
+            blkWidth, blkHeight = 1, 1
+
+        bpp = globals.bpps[texture.format_ >> 8]
+
+        target = 1 if self.target == "NX  " else 0
+        mipWidth, mipHeight, mipOffset, blockHeightLog2 = self.getMipLevels(texture, blkHeight)[mipLevel]
+
+        result = swizzle.deswizzleRegion(
+            mipWidth, mipHeight, blkWidth, blkHeight, target, bpp, texture.tileMode,
+            blockHeightLog2, memoryview(texture.data)[mipOffset:], x, y, width, height,
+        )
+
+        return result, blkWidth, blkHeight
+
+    def swizzledData(self, texture, mipLevel=0):
+        """
+        Returns the swizzled data of a mip level and the position of each of its blocks,
+        for decoders that read the blocks in place instead of deswizzling the level first.
+        """
+        if (texture.format_ >> 8) in globals.blk_dims:
+            blkWidth, blkHeight = globals.blk_dims[texture.format_ >> 8]
+
+        else:
+            blkWidth, blkHeight = 1, 1
+
+        bpp = globals.bpps[texture.format_ >> 8]
+
+        target = 1 if self.target == "NX  " else 0
+        mipWidth, mipHeight, mipOffset, blockHeightLog2 = self.getMipLevels(texture, blkHeight)[mipLevel]
+
+        blockAddrs = swizzle.getBlockAddresses(
+            mipWidth, mipHeight, blkWidth, blkHeight, target, bpp, texture.tileMode, blockHeightLog2,
+        )
+
+        return memoryview(texture.data)[mipOffset:], blockAddrs
 
     def extract(self, index, BFRESPath, exportAs, dontShowMsg=False):
         texture = self.textures[index]
@@ -215,7 +336,14 @@ class File:
             elif texture.format_ == 0x3b01:
                 format_ = "bgr5a1"
 
-            result_, blkWidth, blkHeight = self.rawData(texture)
+            if (texture.format_ >> 8) in globals.blk_dims:
+                blkWidth, blkHeight = globals.blk_dims[texture.format_ >> 8]
+
+            else:
+                blkWidth, blkHeight = 1, 1
+
+            size = (DIV_ROUND_UP(texture.width, blkWidth) * DIV_ROUND_UP(texture.height, blkHeight)
+                    * globals.bpps[texture.format_ >> 8])
 
             if exportAs:
                 if (texture.format_ >> 8) in globals.ASTC_formats:
@@ -238,25 +366,25 @@ class File:
                     file = os.path.join(BFRESPath, name + '.dds')
 
             if (texture.format_ >> 8) in globals.ASTC_formats:
-                outBuffer = b''.join([
+                hdr = b''.join([
                     b'\x13\xAB\xA1\x5C', blkWidth.to_bytes(1, "little"),
                     blkHeight.to_bytes(1, "little"), b'\1',
                     texture.width.to_bytes(3, "little"),
                     texture.height.to_bytes(3, "little"), b'\1\0\0',
-                    result_[0],
                 ])
 
-                with open(file, "wb+") as output:
-                    output.write(outBuffer)
-
             else:
                 hdr = dds.generateHeader(
                     texture.numMips, texture.width, texture.height, format_, texture.compSel,
-                    len(result_[0]), (texture.format_ >> 8) in globals.BCn_formats,
+                    size, (texture.format_ >> 8) in globals.BCn_formats,
                 )
 
-                with open(file, "wb+") as output:
-                    output.write(b''.join([hdr, b''.join(result_)]))
+            # The data is written as it gets deswizzled, one band at a time
+            with open(file, "wb+") as output:
+                output.write(hdr)
+
+                for band in self.iterRawData(texture, 1 if (texture.format_ >> 8) in globals.ASTC_formats else None):
+                    output.write(band)
 
         elif not dontShowMsg:
             msg = "Can't convert: " + texture.name
@@ -276,25 +404,11 @@ class File:
             QtWidgets.QMessageBox.warning(None, "Error", '\n'.join([msg, context]))
             return False
 
-    @staticmethod
-    def getCurrentMipOffset_Size(width, height, blkWidth, blkHeight, bpp, currLevel):
-        offset = 0
-
-        for mipLevel in range(currLevel):
-            width_ = DIV_ROUND_UP(max(1, width >> mipLevel), blkWidth)
-            height_ = DIV_ROUND_UP(max(1, height >> mipLevel), blkHeight)
-
-            offset += width_ * height_ * bpp
-
-        width_ = DIV_ROUND_UP(max(1, width >> currLevel), blkWidth)
-        height_ = DIV_ROUND_UP(max(1, height >> currLevel), blkHeight)
-
-        size = width_ * height_ * bpp
-
-        return offset, size
-
-
     def replace(self, texture, tileMode, SRGB, sparseBinding, sparseResidency, importMips, f):
+        """
+        Replaces the texture with the DDS file f, which can be a path,
+        a file object or a bytes-like object holding the file.
+        """
         width, height, format_, fourcc, dataSize, compSel, numMips, data = dds.readDDS(f, SRGB)
 
         if 0 in [width, dataSize] and data == []:
@@ -311,6 +425,43 @@ class File:
         else:
             numMips = max(1, numMips + 1)
 
+        return self.replaceData(
+            texture, tileMode, sparseBinding, sparseResidency,
+            width, height, format_, compSel, numMips, data,
+        )
+
+    def replaceRGBA8(self, texture, tileMode, sparseBinding, sparseResidency, width, height, format_, data,
+                     dither=False):
+        """
+        Replaces the texture with width x height RGBA8 pixels, packed to
+        format_ (one of globals.packed_formats) without going through a DDS file.
+        """
+        if format_ not in globals.packed_formats:
+            QtWidgets.QMessageBox.warning(None, "Error", "Unsupported format!")
+            return False
+
+        if 0 in [width, height] or len(data) < width * height * 4:
+            QtWidgets.QMessageBox.warning(None, "Error", "Invalid image data!")
+            return False
+
+        packedFormat = globals.packed_formats[format_]
+        compSel = {
+            'l8': [2, 2, 2, 1], 'la4': [2, 2, 2, 3], 'la8': [2, 2, 2, 3],
+            'rgb565': [2, 3, 4, 1], 'bgr565': [2, 3, 4, 1],
+        }.get(packedFormat, [2, 3, 4, 5])
+
+        data = dds.formConv.pack(width, height, data, packedFormat, dither)
+
+        return self.replaceData(
+            texture, tileMode, sparseBinding, sparseResidency,
+            width, height, format_, compSel, 1, data,
+        )
+
+    def replaceData(self, texture, tileMode, sparseBinding, sparseResidency, width, height, format_, compSel,
+                    numMips, data):
+        """
+        Swizzles numMips levels of data, packed in format_, into the texture.
+        """
         if tileMode == 1:
             alignment = 1
 
@@ -337,24 +488,29 @@ class File:
 
             linesPerBlockHeight = blockHeight * 8
 
-        result = []
+        # Plan the layout of the whole surface first, so that every level
+        # can be swizzled in place into a single buffer
+        levels = []
         surfSize = 0
         mipOffsets = []
         blockHeightShift = 0
         target = 1 if self.target == "NX  " else 0
 
-        for mipLevel in range(numMips):
-            offset, size = self.getCurrentMipOffset_Size(width, height, blkWidth, blkHeight, bpp, mipLevel)
-            data_ = data[offset:offset + size]
+        data = memoryview(data)
+        offset = 0
 
+        for mipLevel in range(numMips):
             width_ = max(1, width >> mipLevel)
             height_ = max(1, height >> mipLevel)
 
             width__ = DIV_ROUND_UP(width_, blkWidth)
             height__ = DIV_ROUND_UP(height_, blkHeight)
 
-            dataAlignBytes = b'\0' * (round_up(surfSize, alignment) - surfSize)
-            surfSize += len(dataAlignBytes)
+            size = width__ * height__ * bpp
+            data_ = data[offset:offset + size]
+            offset += size
+
+            surfSize = round_up(surfSize, alignment)
             mipOffsets.append(surfSize)
 
             if tileMode == 1:
@@ -372,10 +528,20 @@ class File:
                 pitch = round_up(width__ * bpp, 64)
                 surfSize += pitch * round_up(height__, max(1, blockHeight >> blockHeightShift) * 8)
 
-            result.append(bytearray(dataAlignBytes) + swizzle.swizzle(
+            levels.append((width_, height_, max(0, blockHeightLog2 - blockHeightShift), mipOffsets[-1], data_))
+
+        result = bytearray(surfSize)
+        out = memoryview(result)
+
+        def swizzleLevel(level):
+            width_, height_, blockHeightLog2_, mipOffset, data_ = level
+
+            swizzle.swizzle(
                 width_, height_, blkWidth, blkHeight, target, bpp, tileMode,
-                max(0, blockHeightLog2 - blockHeightShift), data_,
-            ))
+                blockHeightLog2_, data_, out[mipOffset:],
+            )
+
+        pool.map(swizzleLevel, levels, level=1)
 
         texture.readTexLayout = 1 if tileMode == 0 else 0
         texture.sparseBinding = sparseBinding
@@ -394,7 +560,8 @@ class File:
         texture.compSel = compSel
         texture.alignment = alignment
         texture.imgDim = 1
-        texture.data = b''.join(result)
+        texture.data = result
+        texture.dataVersion += 1
 
         return texture 
 
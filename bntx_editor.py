@@ -39,9 +39,14 @@ import time
 import traceback
 
 import bntx as BNTX
+from cache import LRUCache
 import globals
 
 
+# Memory budget (in bytes) of the decoded previews kept in the cache
+previewCacheBudget = 256 << 20
+
+
 def _excepthook(*exc_info):
     """
     Custom unhandled exceptions handler
@@ -91,6 +96,7 @@ class MainWindow(QtWidgets.QWidget):
         self.setupUi()
         self.loaded = False
         self.bntx = BNTX.File()
+        self.previewCache = LRUCache(previewCacheBudget)
 
         self.setWindowIcon(QIcon('icon.ico'))
 
@@ -494,6 +500,8 @@ class MainWindow(QtWidgets.QWidget):
             return False
 
         self.prepareOpenFile(file)
+        self.previewCache.clear()
+
         returnCode = self.bntx.readFromFile(file)
         if returnCode:
             QtWidgets.QMessageBox.warning(None, "Error", "Error code: %d\nPlease refer to the readme for more information." % returnCode)
@@ -614,134 +622,167 @@ class MainWindow(QtWidgets.QWidget):
             texture.imgDim = index
 
     def updatePreview(self, texture):
-        if texture.format_ in [0x101, 0x201, 0x301, 0x401, 0x501, 0x601, 0x701,
-                               0x801, 0x901, 0xb01, 0xb06, 0xc01, 0xc06, 0xe01,
-                               0x1a01, 0x1a06, 0x1b01, 0x1b06, 0x1c01, 0x1c06,
-                               0x1d01, 0x1d02, 0x1e01, 0x1e02, 0x3b01] and texture.dim == 2:
+        if (texture.format_ in [0x101, 0x201, 0x301, 0x401, 0x501, 0x601, 0x701,
+                                0x801, 0x901, 0xb01, 0xb06, 0xc01, 0xc06, 0xe01,
+                                0x1a01, 0x1a06, 0x1b01, 0x1b06, 0x1c01, 0x1c06,
+                                0x1d01, 0x1d02, 0x1e01, 0x1e02, 0x1f05, 0x1f0a,
+                                0x2001, 0x2006, 0x3b01]
+                or (texture.format_ >> 8) in globals.ASTC_formats) and texture.dim == 2:
 
-            result, _, _ = self.bntx.rawData(texture)
+            # Only decode the smallest mip level that still fills the preview
+            mipLevel, width, height = self.bntx.getPreviewLevel(texture, 333)
 
-            if texture.format_ == 0x101:
-                data = result[0]
+            # Channel changes only remap the cached RGBA8 data
+            key = (id(texture), texture.dataVersion, mipLevel)
+            data = self.previewCache.get(key)
 
-                format_ = 'la4'
-                bpp = 1
+            if data is None:
+                data, format_, bpp = self.decodePreview(texture, mipLevel, width, height)
 
-            elif texture.format_ == 0x201:
-                data = result[0]
+                if not data:
+                    # Decoding failed
+                    self.resetPreviewer()
+                    return
 
-                format_ = 'l8'
-                bpp = 1
+                data = BNTX.dds.formConv.unpack(width, height, bytearray(data), format_, bpp)
+                self.previewCache.put(key, data, len(data))
 
-            elif texture.format_ == 0x301:
-                data = result[0]
+            data = BNTX.dds.formConv.applyCompSel(data, texture.compSel)
+            img = QImage(data, width, height, QImage.Format_RGBA8888)
 
-                format_ = 'rgba4'
-                bpp = 2
+            if width >= height:
+                pix = QPixmap(img.scaledToWidth(333, Qt.SmoothTransformation))
 
-            elif texture.format_ == 0x401:
-                data = result[0]
+            else:
+                pix = QPixmap(img.scaledToHeight(333, Qt.SmoothTransformation))
 
-                format_ = 'abgr4'
-                bpp = 2
+            self.preview.setPixmap(pix)
 
-            elif texture.format_ == 0x501:
-                data = result[0]
+        else:
+            self.resetPreviewer()
 
-                format_ = 'rgb5a1'
-                bpp = 2
+    def decodePreview(self, texture, mipLevel, width, height):
+        """
+        Returns the data of a mip level for the preview, with its formConv format and bpp.
+        """
+        if (texture.format_ >> 8) in [0x1a, 0x1b, 0x1c, 0x1d, 0x1e, 0x1f, 0x20] + globals.ASTC_formats:
+            # BCn and ASTC blocks are decoded straight from the swizzled data
+            swizzled, blockAddrs = self.bntx.swizzledData(texture, mipLevel)
 
-            elif texture.format_ == 0x601:
-                data = result[0]
+        else:
+            data, _, _ = self.bntx.rawDataLevel(texture, mipLevel)
 
-                format_ = 'a1bgr5'
-                bpp = 2
+        if texture.format_ == 0x101:
+            format_ = 'la4'
+            bpp = 1
 
-            elif texture.format_ == 0x701:
-                data = result[0]
+        elif texture.format_ == 0x201:
+            format_ = 'l8'
+            bpp = 1
 
-                format_ = 'rgb565'
-                bpp = 2
+        elif texture.format_ == 0x301:
+            format_ = 'rgba4'
+            bpp = 2
 
-            elif texture.format_ == 0x801:
-                data = result[0]
+        elif texture.format_ == 0x401:
+            format_ = 'abgr4'
+            bpp = 2
 
-                format_ = 'bgr565'
-                bpp = 2
+        elif texture.format_ == 0x501:
+            format_ = 'rgb5a1'
+            bpp = 2
 
-            elif texture.format_ == 0x901:
-                data = result[0]
+        elif texture.format_ == 0x601:
+            format_ = 'a1bgr5'
+            bpp = 2
 
-                format_ = 'la8'
-                bpp = 2
+        elif texture.format_ == 0x701:
+            format_ = 'rgb565'
+            bpp = 2
 
-            elif (texture.format_ >> 8) == 0xb:
-                data = result[0]
+        elif texture.format_ == 0x801:
+            format_ = 'bgr565'
+            bpp = 2
 
-                format_ = 'rgba8'
-                bpp = 4
+        elif texture.format_ == 0x901:
+            format_ = 'la8'
+            bpp = 2
 
-            elif (texture.format_ >> 8) == 0xc:
-                data = result[0]
+        elif (texture.format_ >> 8) == 0xb:
+            format_ = 'rgba8'
+            bpp = 4
 
-                format_ = 'bgra8'
-                bpp = 4
+        elif (texture.format_ >> 8) == 0xc:
+            format_ = 'bgra8'
+            bpp = 4
 
-            elif texture.format_ == 0xe01:
-                data = result[0]
+        elif texture.format_ == 0xe01:
+            format_ = 'bgr10a2'
+            bpp = 4
 
-                format_ = 'bgr10a2'
-                bpp = 4
+        elif (texture.format_ >> 8) == 0x1a:
+            data = BNTX.bcn.decompressDXT1(swizzled, width, height, blockAddrs=blockAddrs,
+                                           numWorkers=BNTX.pool.numThreads)
 
-            elif (texture.format_ >> 8) == 0x1a:
-                data = BNTX.bcn.decompressDXT1(result[0], texture.width, texture.height)
+            format_ = 'rgba8'
+            bpp = 4
 
-                format_ = 'rgba8'
-                bpp = 4
+        elif (texture.format_ >> 8) == 0x1b:
+            data = BNTX.bcn.decompressDXT3(swizzled, width, height, blockAddrs=blockAddrs,
+                                           numWorkers=BNTX.pool.numThreads)
 
-            elif (texture.format_ >> 8) == 0x1b:
-                data = BNTX.bcn.decompressDXT3(result[0], texture.width, texture.height)
+            format_ = 'rgba8'
+            bpp = 4
 
-                format_ = 'rgba8'
-                bpp = 4
+        elif (texture.format_ >> 8) == 0x1c:
+            data = BNTX.bcn.decompressDXT5(swizzled, width, height, blockAddrs=blockAddrs,
+                                           numWorkers=BNTX.pool.numThreads)
 
-            elif (texture.format_ >> 8) == 0x1c:
-                data = BNTX.bcn.decompressDXT5(result[0], texture.width, texture.height)
+            format_ = 'rgba8'
+            bpp = 4
 
-                format_ = 'rgba8'
-                bpp = 4
+        elif (texture.format_ >> 8) == 0x1d:
+            data = BNTX.bcn.decompressBC4(swizzled, width, height, 0 if texture.format_ & 3 == 1 else 1,
+                                           blockAddrs=blockAddrs, numWorkers=BNTX.pool.numThreads)
 
-            elif (texture.format_ >> 8) == 0x1d:
-                data = BNTX.bcn.decompressBC4(result[0], texture.width, texture.height, 0 if texture.format_ & 3 == 1 else 1)
+            format_ = 'rgba8'
+            bpp = 4
 
-                format_ = 'rgba8'
-                bpp = 4
+        elif (texture.format_ >> 8) == 0x1e:
+            data = BNTX.bcn.decompressBC5(swizzled, width, height, 0 if texture.format_ & 3 == 1 else 1,
+                                           blockAddrs=blockAddrs, numWorkers=BNTX.pool.numThreads)
 
-            elif (texture.format_ >> 8) == 0x1e:
-                data = BNTX.bcn.decompressBC5(result[0], texture.width, texture.height, 0 if texture.format_ & 3 == 1 else 1)
+            format_ = 'rgba8'
+            bpp = 4
 
-                format_ = 'rgba8'
-                bpp = 4
+        elif (texture.format_ >> 8) == 0x1f:
+            data = BNTX.bcn.decompressBC6H(swizzled, width, height, 1 if texture.format_ == 0x1f05 else 0,
+                                           blockAddrs=blockAddrs, numWorkers=BNTX.pool.numThreads)
 
-            elif texture.format_ == 0x3b01:
-                data = result[0]
+            format_ = 'rgba8'
+            bpp = 4
 
-                format_ = 'bgr5a1'
-                bpp = 2
+        elif (texture.format_ >> 8) == 0x20:
+            data = BNTX.bcn.decompressBC7(swizzled, width, height, blockAddrs=blockAddrs,
+                                          numWorkers=BNTX.pool.numThreads)
 
-            data = BNTX.dds.formConv.torgba8(texture.width, texture.height, bytearray(data), format_, bpp, texture.compSel)
-            img = QImage(data, texture.width, texture.height, QImage.Format_RGBA8888)
+            format_ = 'rgba8'
+            bpp = 4
 
-            if texture.width >= texture.height:
-                pix = QPixmap(img.scaledToWidth(333, Qt.SmoothTransformation))
+        elif (texture.format_ >> 8) in globals.ASTC_formats:
+            blkWidth, blkHeight = globals.blk_dims[texture.format_ >> 8]
+            data = BNTX.bcn.decompressASTC(swizzled, width, height, blkWidth, blkHeight,
+                                           1 if texture.format_ & 0xff == 6 else 0,
+                                           blockAddrs=blockAddrs, numWorkers=BNTX.pool.numThreads)
 
-            else:
-                pix = QPixmap(img.scaledToHeight(333, Qt.SmoothTransformation))
+            format_ = 'rgba8'
+            bpp = 4
 
-            self.preview.setPixmap(pix)
+        elif texture.format_ == 0x3b01:
+            format_ = 'bgr5a1'
+            bpp = 2
 
-        else:
-            self.resetPreviewer()
+        return data, format_, bpp
 
     def exportTex(self):
         self.bntx.extract(self.comboBox.currentIndex(), self.BFRESPath, 0)
@@ -842,6 +883,9 @@ class MainWindow(QtWidgets.QWidget):
 
         texture_ = self.bntx.replace(texture, tileMode, SRGB, sparseBinding, sparseResidency, importMips, file)
         if texture_:
+            # Drop the previews of the old data
+            self.previewCache.discard(lambda key: key[0] == id(texture_))
+
             self.bntx.textures[index] = texture_
             self.updateTexInfo(index)
 
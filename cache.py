@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# BNTX Editor
+# Version 0.3
+# Copyright © 2018 AboodXD
+
+# This file is part of BNTX Editor.
+
+# BNTX Editor is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# BNTX Editor is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Least recently used cache that evicts entries once
+    the total size of what it holds goes over budget (in bytes)
+    """
+    def __init__(self, budget):
+        self.budget = budget
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self.entries.move_to_end(key)
+
+            return entry[0]
+
+    def put(self, key, value, size):
+        with self.lock:
+            if key in self.entries:
+                self.size -= self.entries.pop(key)[1]
+
+            if size > self.budget:
+                return
+
+            self.entries[key] = (value, size)
+            self.size += size
+
+            self.evict()
+
+    def evict(self):
+        while self.size > self.budget:
+            _, (_, size) = self.entries.popitem(last=False)
+            self.size -= size
+
+    def setBudget(self, budget):
+        with self.lock:
+            self.budget = budget
+            self.evict()
+
+    def discard(self, match):
+        """
+        Removes the entries whose key match() returns True for
+        """
+        with self.lock:
+            for key in [key for key in self.entries if match(key)]:
+                self.size -= self.entries.pop(key)[1]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def resetStats(self):
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        return "%d hits, %d misses, %d entries, %d/%d bytes" % (
+            self.hits, self.misses, len(self.entries), self.size, self.budget)
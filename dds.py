@@ -20,6 +20,8 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import mmap
+import os
 import struct
 
 try:
@@ -32,25 +34,56 @@ except:
 dx10_formats = ["BC4U", "BC4S", "BC5U", "BC5S", "BC6H_UF16", "BC6H_SF16", "BC7"]
 
 
-def readDDS(f, SRGB):
-    with open(f, "rb") as inf:
-        inb = inf.read()
+# Magic, size, flags, height, width, pitch, depth, mipMapCount, (reserved),
+# pixel format size, flags, fourCC, RGB bit count, R, G, B and A masks, caps, (caps2-4, reserved)
+DDSHeader = struct.Struct("<4s7I44x2I4s5II16x")
+
+
+def mapFile(inf):
+    """
+    Returns a view of the rest of the file object inf,
+    mapped to memory if it's a real file.
+    """
+    try:
+        return memoryview(mmap.mmap(inf.fileno(), 0, access=mmap.ACCESS_READ))[inf.tell():]
+
+    except (OSError, ValueError):
+        return memoryview(inf.read()).cast('B')
+
+
+def openDDS(f):
+    """
+    Returns a view of the DDS file f, which can be a path,
+    a file object or a bytes-like object holding the file.
+    """
+    if isinstance(f, (str, os.PathLike)):
+        with open(f, "rb") as inf:
+            return mapFile(inf)
+
+    if hasattr(f, "read"):
+        return mapFile(f)
 
-    if len(inb) < 0x80 or inb[:4] != b'DDS ':
+    return memoryview(f).cast('B')
+
+
+def readDDS(f, SRGB):
+    """
+    Reads the DDS file f (a path, a file object or a bytes-like object).
+    The returned data is a view of the file holding every level, not a copy,
+    except for 24-bit files which are widened to 32 bits.
+    """
+    inb = openDDS(f)
+
+    if len(inb) < 0x80:
         return 0, 0, 0, b'', 0, [], 0, []
 
-    width = struct.unpack("<I", inb[16:20])[0]
-    height = struct.unpack("<I", inb[12:16])[0]
+    (magic, _, _, height, width, _, _, mipCount, _, pflags, fourcc,
+     bpp, channel0, channel1, channel2, channel3, caps) = DDSHeader.unpack_from(inb)
 
-    fourcc = inb[84:88]
+    if magic != b'DDS ':
+        return 0, 0, 0, b'', 0, [], 0, []
 
-    pflags = struct.unpack("<I", inb[80:84])[0]
-    bpp = struct.unpack("<I", inb[88:92])[0] >> 3
-    channel0 = struct.unpack("<I", inb[92:96])[0]
-    channel1 = struct.unpack("<I", inb[96:100])[0]
-    channel2 = struct.unpack("<I", inb[100:104])[0]
-    channel3 = struct.unpack("<I", inb[104:108])[0]
-    caps = struct.unpack("<I", inb[108:112])[0]
+    bpp >>= 3
 
     if caps not in [0x1000, 0x401008]:
         return 0, 0, 0, b'', 0, [], 0, []
@@ -98,6 +131,7 @@ def readDDS(f, SRGB):
             return 0, 0, 0, b'', 0, [], 0, []
 
         headSize = 0x94
+        dx10 = bytes(inb[128:148])
 
     else:
         headSize = 0x80
@@ -139,43 +173,43 @@ def readDDS(f, SRGB):
             compSel = [2, 3, 0, 1]
 
         elif fourcc == b'DX10':
-            if inb[128:148] == b"\x50\x00\x00\x00\x03\x00\x00\x00\x00\x00\x00\x00\x01\x00\x00\x00\x00\x00\x00\x00":
+            if dx10 == b"\x50\x00\x00\x00\x03\x00\x00\x00\x00\x00\x00\x00\x01\x00\x00\x00\x00\x00\x00\x00":
                 format_ = 0x1d01
                 bpp = 8
 
                 compSel = [2, 2, 2, 1]
 
-            elif inb[128:148] == b"\x51\x00\x00\x00\x03\x00\x00\x00\x00\x00\x00\x00\x01\x00\x00\x00\x00\x00\x00\x00":
+            elif dx10 == b"\x51\x00\x00\x00\x03\x00\x00\x00\x00\x00\x00\x00\x01\x00\x00\x00\x00\x00\x00\x00":
                 format_ = 0x1d02
                 bpp = 8
 
                 compSel = [2, 2, 2, 1]
 
-            elif inb[128:148] == b"\x53\x00\x00\x00\x03\x00\x00\x00\x00\x00\x00\x00\x01\x00\x00\x00\x00\x00\x00\x00":
+            elif dx10 == b"\x53\x00\x00\x00\x03\x00\x00\x00\x00\x00\x00\x00\x01\x00\x00\x00\x00\x00\x00\x00":
                 format_ = 0x1e01
                 bpp = 16
 
                 compSel = [2, 3, 0, 1]
 
-            elif inb[128:148] == b"\x54\x00\x00\x00\x03\x00\x00\x00\x00\x00\x00\x00\x01\x00\x00\x00\x00\x00\x00\x00":
+            elif dx10 == b"\x54\x00\x00\x00\x03\x00\x00\x00\x00\x00\x00\x00\x01\x00\x00\x00\x00\x00\x00\x00":
                 format_ = 0x1e02
                 bpp = 16
 
                 compSel = [2, 3, 0, 1]
 
-            elif inb[128:148] == b"\x5F\x00\x00\x00\x03\x00\x00\x00\x00\x00\x00\x00\x01\x00\x00\x00\x00\x00\x00\x00":
+            elif dx10 == b"\x5F\x00\x00\x00\x03\x00\x00\x00\x00\x00\x00\x00\x01\x00\x00\x00\x00\x00\x00\x00":
                 format_ = 0x1f0a
                 bpp = 16
 
-            elif inb[128:148] == b"\x60\x00\x00\x00\x03\x00\x00\x00\x00\x00\x00\x00\x01\x00\x00\x00\x00\x00\x00\x00":
+            elif dx10 == b"\x60\x00\x00\x00\x03\x00\x00\x00\x00\x00\x00\x00\x01\x00\x00\x00\x00\x00\x00\x00":
                 format_ = 0x1f05
                 bpp = 16
 
-            elif inb[128:148] == b"\x62\x00\x00\x00\x03\x00\x00\x00\x00\x00\x00\x00\x01\x00\x00\x00\x00\x00\x00\x00":
+            elif dx10 == b"\x62\x00\x00\x00\x03\x00\x00\x00\x00\x00\x00\x00\x01\x00\x00\x00\x00\x00\x00\x00":
                 format_ = 0x2006 if SRGB else 0x2001
                 bpp = 16
 
-            elif inb[128:148] == b"\x63\x00\x00\x00\x03\x00\x00\x00\x00\x00\x00\x00\x01\x00\x00\x00\x00\x00\x00\x00":
+            elif dx10 == b"\x63\x00\x00\x00\x03\x00\x00\x00\x00\x00\x00\x00\x01\x00\x00\x00\x00\x00\x00\x00":
                 format_ = 0x2006
                 bpp = 16
 
@@ -243,7 +277,7 @@ def readDDS(f, SRGB):
         size = width * height * bpp
 
     if caps == 0x401008:
-        numMips = struct.unpack("<I", inb[28:32])[0] - 1
+        numMips = mipCount - 1
         mipSize = get_mipSize(width, height, bpp, numMips, compressed)
 
     else:
@@ -256,14 +290,16 @@ def readDDS(f, SRGB):
     if format_ == 0:
         return 0, 0, 0, b'', 0, [], 0, []
 
-    data = bytearray(inb[headSize:headSize + size + mipSize])
-
     if format_ in [0xb01, 0xb06] and bpp == 3:
-        data = formConv.rgb8torgbx8(data)
+        # Widen straight from the file buffer, into the only copy of the data
+        data = formConv.rgb8torgbx8(inb[headSize:headSize + size + mipSize])
         bpp += 1
         size = width * height * bpp
 
-    return width, height, format_, fourcc, size, compSel, numMips, bytes(data)
+    else:
+        data = inb[headSize:headSize + size + mipSize]
+
+    return width, height, format_, fourcc, size, compSel, numMips, data
 
 
 def get_mipSize(width, height, bpp, numMips, compressed):
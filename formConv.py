@@ -7,6 +7,24 @@
 ################################################################
 ################################################################
 
+from array import array
+
+try:
+    import numpy as np
+
+except ImportError:
+    np = None
+
+
+# Formats unpacked through a table of the RGBA8 value of every pixel, by bpp
+TABLE_FORMATS = {
+    'rgb565': 2, 'bgr565': 2, 'rgba4': 2, 'abgr4': 2,
+    'rgb5a1': 2, 'bgr5a1': 2, 'a1bgr5': 2,
+}
+
+# format -> RGBA8 value of every pixel
+unpackTables = {}
+
 
 def getComponentsFromPixel(format_, pixel, comp):
     if format_ == 'l8':
@@ -85,15 +103,39 @@ def getComponentsFromPixel(format_, pixel, comp):
 
     return comp
 
-def torgba8(width, height, data, format_, bpp, compSel):
-    size = width * height * 4
-    assert len(data) >= width * height * bpp
+def getUnpackTable(format_):
+    """
+    Returns the RGBA8 value of every pixel value of a format in TABLE_FORMATS,
+    4 bytes per pixel value.
+    """
+    table = unpackTables.get(format_)
 
-    new_data = bytearray(size)
-    comp = [0, 0xFF, 0, 0, 0, 0xFF]
+    if table is None:
+        comp = [0, 0xFF, 0, 0, 0, 0xFF]
+        table = unpackTables[format_] = b''.join([
+            bytes(getComponentsFromPixel(format_, pixel, comp)[2:])
+            for pixel in range(1 << (8 * TABLE_FORMATS[format_]))
+        ])
 
-    if bpp not in [1, 2, 4]:
-        return new_data
+    return table
+
+
+# 10-bit and 2-bit to 8-bit channel conversion of bgr10a2
+UNORM10 = bytes(int(v / 0x3FF * 0xFF) for v in range(1024))
+UNORM2 = bytes(int(v / 0x3 * 0xFF) for v in range(4))
+
+# 4-bit to 8-bit conversion of the low and high nibbles of la4
+LOW4 = bytes((b & 0xF) * 17 for b in range(256))
+HIGH4 = bytes((b >> 4) * 17 for b in range(256))
+
+
+def unpackPixels(width, height, data, format_, bpp):
+    """
+    Unpacks the pixels one at a time, for format and bpp combinations
+    that unpack() has no fast path for.
+    """
+    new_data = bytearray(width * height * 4)
+    comp = [0, 0xFF, 0, 0, 0, 0xFF]
 
     for y in range(height):
         for x in range(width):
@@ -106,23 +148,246 @@ def torgba8(width, height, data, format_, bpp, compSel):
 
             comp = getComponentsFromPixel(format_, pixel, comp)
 
-            new_data[pos_ + 3] = comp[compSel[3]]
-            new_data[pos_ + 2] = comp[compSel[2]]
-            new_data[pos_ + 1] = comp[compSel[1]]
-            new_data[pos_ + 0] = comp[compSel[0]]
+            new_data[pos_:pos_ + 4] = bytes(comp[2:])
 
     return bytes(new_data)
 
 
-def rgb8torgbx8(data):
-    numPixels = len(data) // 3
+def unpack(width, height, data, format_, bpp):
+    """
+    Returns the pixels as RGBA8, with the channels the format lacks
+    set to 0 (and alpha to 0xFF).
+    """
+    size = width * height * 4
+    assert len(data) >= width * height * bpp
 
+    if bpp not in [1, 2, 4]:
+        return bytearray(size)
+
+    numPixels = width * height
+    data = bytes(memoryview(data)[:numPixels * bpp])
+
+    if TABLE_FORMATS.get(format_) == bpp:
+        table = getUnpackTable(format_)
+
+        if np is not None:
+            return np.frombuffer(table, dtype='<u4')[np.frombuffer(data, dtype='<u2')].tobytes()
+
+        return array('I', map(array('I', table).__getitem__, array('H', data))).tobytes()
+
+    if format_ == 'bgr10a2' and bpp == 4 and np is not None:
+        pixels = np.frombuffer(data, dtype='<u4')
+        unorm10 = np.frombuffer(UNORM10, dtype=np.uint8)
+
+        new_data = np.empty((numPixels, 4), dtype=np.uint8)
+        new_data[:, 0] = unorm10[pixels & 0x3FF]
+        new_data[:, 1] = unorm10[(pixels >> 10) & 0x3FF]
+        new_data[:, 2] = unorm10[(pixels >> 20) & 0x3FF]
+        new_data[:, 3] = np.frombuffer(UNORM2, dtype=np.uint8)[pixels >> 30]
+
+        return new_data.tobytes()
+
+    # The remaining formats only move bytes around
+    if format_ == 'rgba8' and bpp == 4:
+        return data
+
+    new_data = bytearray(size)
+
+    if format_ == 'l8' and bpp == 1:
+        new_data[0::4] = data
+        new_data[3::4] = b'\xFF' * numPixels
+
+    elif format_ == 'la4' and bpp == 1:
+        new_data[0::4] = data.translate(LOW4)
+        new_data[1::4] = data.translate(HIGH4)
+        new_data[3::4] = b'\xFF' * numPixels
+
+    elif format_ == 'la8' and bpp == 2:
+        new_data[0::4] = data[0::2]
+        new_data[1::4] = data[1::2]
+        new_data[3::4] = b'\xFF' * numPixels
+
+    elif format_ == 'rgb8' and bpp == 4:
+        new_data[0::4] = data[0::4]
+        new_data[1::4] = data[1::4]
+        new_data[2::4] = data[2::4]
+        new_data[3::4] = b'\xFF' * numPixels
+
+    elif format_ == 'bgra8' and bpp == 4:
+        new_data[0::4] = data[2::4]
+        new_data[1::4] = data[1::4]
+        new_data[2::4] = data[0::4]
+        new_data[3::4] = data[3::4]
+
+    else:
+        return unpackPixels(width, height, data, format_, bpp)
+
+    return bytes(new_data)
+
+
+def applyCompSel(data, compSel):
+    """
+    Returns the RGBA8 data with its channels picked by compSel
+    (0 and 1 give constant 0 and 0xFF, 2 to 5 the R, G, B and A channels of data),
+    one strided copy per channel.
+    """
+    if list(compSel) == [2, 3, 4, 5]:
+        return bytes(data)
+
+    numPixels = len(data) // 4
     new_data = bytearray(numPixels * 4)
 
-    for i in range(numPixels):
-        new_data[4 * i + 0] = data[3 * i + 0]
-        new_data[4 * i + 1] = data[3 * i + 1]
-        new_data[4 * i + 2] = data[3 * i + 2]
-        new_data[4 * i + 3] = 0xFF
+    for i, comp in enumerate(compSel):
+        if comp == 1:
+            new_data[i::4] = b'\xff' * numPixels
+
+        elif comp > 1:
+            new_data[i::4] = data[comp - 2::4]
 
     return bytes(new_data)
+
+
+def torgba8(width, height, data, format_, bpp, compSel):
+    new_data = unpack(width, height, data, format_, bpp)
+
+    if bpp not in [1, 2, 4]:
+        return new_data
+
+    return applyCompSel(new_data, compSel)
+
+
+# Formats packed by pack(): format -> (bpp, fields),
+# every field being (RGBA8 channel, shift, bits).
+# The luminance formats take L from R and their alpha from A
+# (unpack() returns that alpha in G, for compSel [2, 2, 2, 3])
+PACK_FORMATS = {
+    'l8': (1, ((0, 0, 8),)),
+    'la4': (1, ((0, 0, 4), (3, 4, 4))),
+    'la8': (2, ((0, 0, 8), (3, 8, 8))),
+    'rgb565': (2, ((0, 0, 5), (1, 5, 6), (2, 11, 5))),
+    'bgr565': (2, ((2, 0, 5), (1, 5, 6), (0, 11, 5))),
+    'rgb5a1': (2, ((0, 0, 5), (1, 5, 5), (2, 10, 5), (3, 15, 1))),
+    'bgr5a1': (2, ((2, 0, 5), (1, 5, 5), (0, 10, 5), (3, 15, 1))),
+    'a1bgr5': (2, ((0, 15, 1), (1, 10, 5), (2, 5, 5), (3, 0, 5))),
+    'rgba4': (2, ((0, 0, 4), (1, 4, 4), (2, 8, 4), (3, 12, 4))),
+    'abgr4': (2, ((3, 0, 4), (2, 4, 4), (1, 8, 4), (0, 12, 4))),
+    'bgr10a2': (4, ((0, 0, 10), (1, 10, 10), (2, 20, 10), (3, 30, 2))),
+    'rgba8': (4, ((0, 0, 8), (1, 8, 8), (2, 16, 8), (3, 24, 8))),
+    'bgra8': (4, ((2, 0, 8), (1, 8, 8), (0, 16, 8), (3, 24, 8))),
+}
+
+# 4x4 Bayer matrix, row after row, for ordered dithering
+BAYER4 = (
+    0, 8, 2, 10,
+    12, 4, 14, 6,
+    3, 11, 1, 9,
+    15, 7, 13, 5,
+)
+
+
+def quantize(value, bits, bias):
+    """
+    Scales an 8-bit value to bits bits, rounded down after adding bias / 8160
+    (4080 rounds to nearest, the dither thresholds are (2 * BAYER4 + 1) * 255).
+    """
+    return (value * ((1 << bits) - 1) * 32 + bias) // 8160
+
+
+def packPlanes(width, height, data, bpp, fields, dither):
+    """
+    Packs the pixels one channel at a time without NumPy,
+    through a table per channel and byte of the packed pixel
+    (and per position in the Bayer matrix when dithering).
+    """
+    numPixels = width * height
+    new_data = bytearray(numPixels * bpp)
+
+    for byte in range(bpp):
+        plane = 0
+
+        for channel, shift, bits in fields:
+            if shift >= 8 * (byte + 1) or shift + bits <= 8 * byte:
+                continue
+
+            values = data[channel::4]
+
+            def getTable(bias):
+                return bytes(((quantize(v, bits, bias) << shift) >> (8 * byte)) & 0xFF for v in range(256))
+
+            if not dither:
+                values = values.translate(getTable(4080))
+
+            else:
+                tables = [getTable((2 * b + 1) * 255) for b in BAYER4]
+                values = bytearray(values)
+
+                for y in range(height):
+                    for x in range(min(4, width)):
+                        start = y * width + x
+                        values[start:(y + 1) * width:4] = values[start:(y + 1) * width:4].translate(
+                            tables[(y & 3) * 4 + x])
+
+            plane |= int.from_bytes(values, 'little')
+
+        new_data[byte::bpp] = plane.to_bytes(numPixels, 'little')
+
+    return bytes(new_data)
+
+
+def pack(width, height, data, format_, dither=False):
+    """
+    Packs RGBA8 pixels to a format in PACK_FORMATS, rounding every channel
+    to the nearest value of the format, or with a 4x4 ordered dither if dither is set.
+    """
+    assert len(data) >= width * height * 4
+
+    bpp, fields = PACK_FORMATS[format_]
+    numPixels = width * height
+    data = bytes(memoryview(data)[:numPixels * 4])
+
+    if format_ == 'rgba8':
+        return data
+
+    if np is None:
+        return packPlanes(width, height, data, bpp, fields, dither)
+
+    pixels = np.frombuffer(data, dtype=np.uint8).reshape(height, width, 4)
+
+    if dither:
+        bayer = (np.array(BAYER4, dtype=np.uint32).reshape(4, 4) * 2 + 1) * 255
+        bias = bayer[np.arange(height)[:, None] & 3, np.arange(width) & 3]
+
+    else:
+        bias = 4080
+
+    dtype = {1: np.uint8, 2: '<u2', 4: '<u4'}[bpp]
+    new_data = np.zeros((height, width), dtype=dtype)
+
+    for channel, shift, bits in fields:
+        values = pixels[:, :, channel]
+
+        if bits != 8:
+            values = quantize(values.astype(np.uint32), bits, bias)
+
+        new_data |= values.astype(dtype) << shift
+
+    return new_data.tobytes()
+
+
+def rgb8torgbx8(data):
+    """
+    Widens RGB8 pixels to RGBX8 (X being 0xFF) with one strided copy
+    per channel, from any buffer (e.g. a memoryview of the file) into
+    a single new bytearray.
+    """
+    data = memoryview(data).cast('B')
+    numPixels = len(data) // 3
+
+    new_data = bytearray(b'\xFF') * (numPixels * 4)
+    out = memoryview(new_data)
+
+    out[0::4] = data[0:numPixels * 3:3]
+    out[1::4] = data[1:numPixels * 3:3]
+    out[2::4] = data[2:numPixels * 3:3]
+
+    return new_data
@@ -11,12 +11,42 @@ from cpython cimport array
 from cython cimport view
 from libc.stdlib cimport malloc, free
 
+import formConv
+
 
 ctypedef unsigned char u8
 ctypedef unsigned short u16
 ctypedef unsigned int u32
 
 
+cdef enum:
+    L8 = 1
+    LA4 = 2
+    LA8 = 3
+    RGB8 = 4
+    RGBA8 = 5
+    BGRA8 = 6
+    BGR10A2 = 7
+
+
+# Formats whose bytes are unpacked directly, with their bpp
+cdef dict BYTE_FORMATS = {
+    'l8': (L8, 1), 'la4': (LA4, 1), 'la8': (LA8, 2), 'rgb8': (RGB8, 4),
+    'rgba8': (RGBA8, 4), 'bgra8': (BGRA8, 4), 'bgr10a2': (BGR10A2, 4),
+}
+
+# 10-bit and 2-bit to 8-bit channel conversion of bgr10a2
+cdef u8[1024] UNORM10
+cdef u8[4] UNORM2
+cdef u32 v
+
+for v in range(1024):
+    UNORM10[v] = formConv.UNORM10[v]
+
+for v in range(4):
+    UNORM2[v] = formConv.UNORM2[v]
+
+
 cdef void getComponentsFromPixel(str format_, pixel, u8 *comp):
     if format_ == 'l8':
         comp[2] = pixel & 0xFF
@@ -92,18 +122,16 @@ cdef void getComponentsFromPixel(str format_, pixel, u8 *comp):
         comp[4] = pixel & 0xFF
         comp[5] = (pixel & 0xFF000000) >> 24
 
-cpdef bytes torgba8(u32 width, u32 height, bytearray data_, str format_, u32 bpp, list compSel_):
+cdef bytes unpackPixels(u32 width, u32 height, bytearray data_, str format_, u32 bpp):
+    """
+    Unpacks the pixels one at a time, for format and bpp combinations
+    that unpack() has no fast path for.
+    """
     cdef:
         array.array dataArr = array.array('B', data_)
         u8 *data = dataArr.data.as_uchars
 
-        u32[4] compSel
-        u32 i, elem
-
-    for i, elem in enumerate(compSel_):
-        compSel[i] = elem
-
-    assert len(data_) >= width * height * bpp
+        u32 i
 
     cdef:
         u32 size = width * height * 4
@@ -119,14 +147,6 @@ cpdef bytes torgba8(u32 width, u32 height, bytearray data_, str format_, u32 bpp
     comp[4] = 0
     comp[5] = 0xFF
 
-    if bpp not in [1, 2, 4]:
-        try:
-            return bytes(<u8[:size]>new_data)
-
-        finally:
-            free(new_data)
-            free(comp)
-
     for y in range(height):
         for x in range(width):
             pos = (y * width + x) * bpp
@@ -138,10 +158,10 @@ cpdef bytes torgba8(u32 width, u32 height, bytearray data_, str format_, u32 bpp
 
             getComponentsFromPixel(format_, pixel, comp)
 
-            new_data[pos_ + 3] = <u8>comp[compSel[3]]
-            new_data[pos_ + 2] = <u8>comp[compSel[2]]
-            new_data[pos_ + 1] = <u8>comp[compSel[1]]
-            new_data[pos_ + 0] = <u8>comp[compSel[0]]
+            new_data[pos_ + 3] = comp[5]
+            new_data[pos_ + 2] = comp[4]
+            new_data[pos_ + 1] = comp[3]
+            new_data[pos_ + 0] = comp[2]
 
     try:
         return bytes(<u8[:size]>new_data)
@@ -151,21 +171,216 @@ cpdef bytes torgba8(u32 width, u32 height, bytearray data_, str format_, u32 bpp
         free(comp)
 
 
-cpdef bytes rgb8torgbx8(bytearray data):
+cdef void unpackTable(const u8 *data, u32 numPixels, const u32 *table, u32 *out) noexcept nogil:
+    cdef u32 i
+
+    for i in range(numPixels):
+        out[i] = table[data[2 * i] | (data[2 * i + 1] << 8)]
+
+
+cdef void unpackBytes(const u8 *data, u32 numPixels, int format_, u8 *out) noexcept nogil:
     cdef:
-        u32 numPixels = len(data) // 3
+        u32 i, pixel
 
-        u8 *new_data = <u8 *>malloc(numPixels * 4)
-        u32 i
+    for i in range(numPixels):
+        if format_ == L8:
+            out[0] = data[i]; out[1] = 0; out[2] = 0; out[3] = 0xFF
+
+        elif format_ == LA4:
+            out[0] = (data[i] & 0xF) * 17; out[1] = (data[i] >> 4) * 17; out[2] = 0; out[3] = 0xFF
+
+        elif format_ == LA8:
+            out[0] = data[2 * i]; out[1] = data[2 * i + 1]; out[2] = 0; out[3] = 0xFF
+
+        elif format_ == RGB8:
+            out[0] = data[4 * i]; out[1] = data[4 * i + 1]; out[2] = data[4 * i + 2]; out[3] = 0xFF
+
+        elif format_ == RGBA8:
+            out[0] = data[4 * i]; out[1] = data[4 * i + 1]; out[2] = data[4 * i + 2]; out[3] = data[4 * i + 3]
+
+        elif format_ == BGRA8:
+            out[0] = data[4 * i + 2]; out[1] = data[4 * i + 1]; out[2] = data[4 * i]; out[3] = data[4 * i + 3]
+
+        else:
+            pixel = data[4 * i] | (data[4 * i + 1] << 8) | (data[4 * i + 2] << 16) | (<u32>data[4 * i + 3] << 24)
+            out[0] = UNORM10[pixel & 0x3FF]
+            out[1] = UNORM10[(pixel >> 10) & 0x3FF]
+            out[2] = UNORM10[(pixel >> 20) & 0x3FF]
+            out[3] = UNORM2[pixel >> 30]
+
+        out += 4
+
+
+cpdef bytes unpack(u32 width, u32 height, bytearray data_, str format_, u32 bpp):
+    """
+    Returns the pixels as RGBA8, with the channels the format lacks
+    set to 0 (and alpha to 0xFF).
+    """
+    assert len(data_) >= width * height * bpp
+
+    cdef:
+        u32 numPixels = width * height
+        u32 size = numPixels * 4
+        const u8[::1] data
+        const u32[::1] table
+        u8 *new_data
+        int byteFormat = 0
+
+    if bpp not in [1, 2, 4]:
+        return bytes(size)
+
+    if size == 0:
+        return b''
+
+    if formConv.TABLE_FORMATS.get(format_) == bpp:
+        table = memoryview(formConv.getUnpackTable(format_)).cast('I')
+
+    elif format_ in BYTE_FORMATS and BYTE_FORMATS[format_][1] == bpp:
+        byteFormat = BYTE_FORMATS[format_][0]
+
+    else:
+        return unpackPixels(width, height, data_, format_, bpp)
+
+    data = data_
+    new_data = <u8 *>malloc(size)
 
     try:
-        for i in range(numPixels):
-            new_data[4 * i + 0] = data[3 * i + 0]
-            new_data[4 * i + 1] = data[3 * i + 1]
-            new_data[4 * i + 2] = data[3 * i + 2]
-            new_data[4 * i + 3] = 0xFF
+        with nogil:
+            if byteFormat:
+                unpackBytes(&data[0], numPixels, byteFormat, new_data)
+
+            else:
+                unpackTable(&data[0], numPixels, &table[0], <u32 *>new_data)
+
+        return bytes(<u8[:size]>new_data)
+
+    finally:
+        free(new_data)
+
 
-        return bytes(<u8[:numPixels * 4]>new_data)
+cpdef bytes applyCompSel(data, list compSel):
+    """
+    Returns the RGBA8 data with its channels picked by compSel
+    (0 and 1 give constant 0 and 0xFF, 2 to 5 the R, G, B and A channels of data),
+    one strided copy per channel.
+    """
+    if compSel == [2, 3, 4, 5]:
+        return bytes(data)
+
+    cdef u32 i, comp, numPixels = len(data) // 4
+
+    cdef object new_data = bytearray(numPixels * 4)
+
+    for i, comp in enumerate(compSel):
+        if comp == 1:
+            new_data[i::4] = b'\xff' * numPixels
+
+        elif comp > 1:
+            new_data[i::4] = data[comp - 2::4]
+
+    return bytes(new_data)
+
+
+cpdef bytes torgba8(u32 width, u32 height, bytearray data_, str format_, u32 bpp, list compSel_):
+    new_data = unpack(width, height, data_, format_, bpp)
+
+    if bpp not in [1, 2, 4]:
+        return new_data
+
+    return applyCompSel(new_data, compSel_)
+
+
+# 4x4 Bayer matrix, row after row, for ordered dithering
+cdef u32[16] BAYER4
+
+for v in range(16):
+    BAYER4[v] = formConv.BAYER4[v]
+
+
+cdef void packPixels(const u8 *data, u32 width, u32 height, u32 bpp, const u32 *fields, u32 numFields,
+                     int dither, u8 *out) noexcept nogil:
+    cdef:
+        u32 x, y, f, k, bias, pixel, channel, shift, bits
+
+    for y in range(height):
+        for x in range(width):
+            bias = (2 * BAYER4[(y & 3) * 4 + (x & 3)] + 1) * 255 if dither else 4080
+            pixel = 0
+
+            for f in range(numFields):
+                channel = fields[3 * f]
+                shift = fields[3 * f + 1]
+                bits = fields[3 * f + 2]
+
+                pixel |= ((data[channel] * ((1 << bits) - 1) * 32 + bias) // 8160) << shift
+
+            for k in range(bpp):
+                out[k] = (pixel >> (8 * k)) & 0xFF
+
+            data += 4
+            out += bpp
+
+
+cpdef bytes pack(u32 width, u32 height, data_, str format_, dither=False):
+    """
+    Packs RGBA8 pixels to a format in PACK_FORMATS, rounding every channel
+    to the nearest value of the format, or with a 4x4 ordered dither if dither is set.
+    """
+    assert len(data_) >= width * height * 4
+
+    cdef:
+        u32 bpp
+        tuple fieldList
+        const u8[::1] data = memoryview(data_).cast('B')
+        u32[12] fields
+        u32 i, numFields
+        int dither_ = bool(dither)
+        u8 *new_data
+
+    bpp, fieldList = formConv.PACK_FORMATS[format_]
+    numFields = len(fieldList)
+
+    cdef u32 size = width * height * bpp
+
+    if size == 0:
+        return b''
+
+    for i in range(numFields):
+        fields[3 * i], fields[3 * i + 1], fields[3 * i + 2] = fieldList[i]
+
+    new_data = <u8 *>malloc(size)
+
+    try:
+        with nogil:
+            packPixels(&data[0], width, height, bpp, fields, numFields, dither_, new_data)
+
+        return bytes(<u8[:size]>new_data)
 
     finally:
         free(new_data)
+
+
+cpdef bytearray rgb8torgbx8(data_):
+    """
+    Widens RGB8 pixels to RGBX8 (X being 0xFF) from any buffer
+    (e.g. a memoryview of the file) into a single new bytearray.
+    """
+    cdef:
+        const u8[::1] data = memoryview(data_).cast('B')
+        u32 numPixels = len(data) // 3
+
+        bytearray new_data = bytearray(numPixels * 4)
+        u8[::1] out = new_data
+        u32 i
+
+    if numPixels == 0:
+        return new_data
+
+    with nogil:
+        for i in range(numPixels):
+            out[4 * i + 0] = data[3 * i + 0]
+            out[4 * i + 1] = data[3 * i + 1]
+            out[4 * i + 2] = data[3 * i + 2]
+            out[4 * i + 3] = 0xFF
+
+    return new_data
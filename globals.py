@@ -153,6 +153,13 @@ bpps = {  # format -> bytes_per_pixel
     0x38: 0x10, 0x39: 0x10, 0x3a: 0x10, 0x3b: 0x02,
 }
 
+packed_formats = {  # format -> formConv name of the uncompressed formats
+    0x0101: 'la4', 0x0201: 'l8', 0x0301: 'rgba4', 0x0401: 'abgr4',
+    0x0501: 'rgb5a1', 0x0601: 'a1bgr5', 0x0701: 'rgb565', 0x0801: 'bgr565',
+    0x0901: 'la8', 0x0b01: 'rgba8', 0x0b06: 'rgba8', 0x0c01: 'bgra8',
+    0x0c06: 'bgra8', 0x0e01: 'bgr10a2', 0x3b01: 'bgr5a1',
+}
+
 
 fileData = bytearray()
 texSizes = []
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# BNTX Editor
+# Version 0.3
+# Copyright © 2018 AboodXD
+
+# This file is part of BNTX Editor.
+
+# BNTX Editor is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# BNTX Editor is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+numThreads = os.cpu_count() or 1
+
+_executors = {}
+_lock = threading.Lock()
+
+
+def setNumThreads(count):
+    global numThreads
+    numThreads = max(1, count)
+
+    with _lock:
+        executors = list(_executors.values())
+        _executors.clear()
+
+    for executor in executors:
+        executor.shutdown(wait=False)
+
+
+def getExecutor(level):
+    with _lock:
+        executor = _executors.get(level)
+        if executor is None:
+            executor = _executors[level] = ThreadPoolExecutor(max_workers=numThreads)
+
+        return executor
+
+
+def map(func, iterable, level=0):
+    """
+    Runs func over every item of iterable on the thread pool of the given level
+    and returns the results in order.
+    Tasks on a level may only wait on tasks of lower levels, so that
+    nested parallel work can never run out of free workers.
+    """
+    items = list(iterable)
+    if numThreads < 2 or len(items) < 2:
+        return [func(item) for item in items]
+
+    return list(getExecutor(level).map(func, items))
+
+
+def splitRange(count, unit=1):
+    """
+    Splits range(count) into (start, end) bands, aligned to unit, one or more per thread.
+    """
+    units = (count + unit - 1) // unit
+    numBands = max(1, min(units, numThreads * 2))
+    bandUnits = (units + numBands - 1) // numBands
+
+    return [(start * unit, min(count, (start + bandUnits) * unit))
+            for start in range(0, units, bandUnits)]
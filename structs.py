@@ -333,6 +333,9 @@ class TextureInfo:
 
         self.data = data[firstMipOffset:firstMipOffset + self.imageSize]
 
+        # Bumped whenever the data is replaced, so that caches of decoded data can tell
+        self.dataVersion = 0
+
     def setNameIndex(self, strTbl):
         self.nameIdx = strTbl.index(self.nameAddr)
 
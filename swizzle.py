@@ -20,6 +20,23 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+from array import array
+
+try:
+    import numpy as np
+
+except ImportError:
+    np = None
+
+import pool
+from cache import LRUCache
+
+# Surfaces smaller than this are not worth splitting across threads
+minParallelSize = 1 << 20
+
+# (width, height, blkWidth, blkHeight, bpp, tileMode, blockHeightLog2, roundPitch) -> address table
+addrTableCache = LRUCache(64 << 20)
+
 
 def DIV_ROUND_UP(n, d):
     return (n + d - 1) // d
@@ -48,13 +65,10 @@ def getBlockHeight(height):
     return blockHeight
 
 
-def _swizzle(width, height, blkWidth, blkHeight, roundPitch, bpp, tileMode, blockHeightLog2, data, toSwizzle):
-    assert 0 <= blockHeightLog2 <= 5
-    blockHeight = 1 << blockHeightLog2
-
-    width = DIV_ROUND_UP(width, blkWidth)
-    height = DIV_ROUND_UP(height, blkHeight)
-
+def getSurfaceSize(width, height, bpp, tileMode, roundPitch, blockHeight):
+    """
+    Returns the pitch and size of a swizzled surface (width and height in blocks).
+    """
     if tileMode == 1:
         pitch = width * bpp
 
@@ -67,34 +81,333 @@ def _swizzle(width, height, blkWidth, blkHeight, roundPitch, bpp, tileMode, bloc
         pitch = round_up(width * bpp, 64)
         surfSize = pitch * round_up(height, blockHeight * 8)
 
-    result = bytearray(surfSize)
+    return pitch, surfSize
+
+
+def getAddrTables(width, height, bpp, tileMode, pitch, blockHeight, x=0, y=0):
+    """
+    Separable form of getAddrBlockLinear():
+    Address(x, y) = rowOffsets[y] + colOffsets[x * bpp + i]
+    (Every texel lies inside a single 16-byte run of its GOB)
+
+    Only the tables of the width x height rectangle at (x, y) are built.
+    """
+    x = np.arange(x * bpp, (x + width) * bpp, dtype=np.int64)
+    y = np.arange(y, y + height, dtype=np.int64)
+
+    if tileMode == 1:
+        return y * pitch, x
+
+    image_width_in_gobs = pitch // 64
+
+    rowOffsets = ((y // (8 * blockHeight)) * 512 * blockHeight * image_width_in_gobs
+                  + (y % (8 * blockHeight) // 8) * 512
+                  + ((y % 8) // 2) * 64 + (y % 2) * 16)
+
+    colOffsets = ((x // 64) * 512 * blockHeight + ((x % 64) // 32) * 256
+                  + ((x % 32) // 16) * 32 + (x % 16))
+
+    return rowOffsets, colOffsets
+
+
+def getBands(height, surfSize, blockHeight):
+    if surfSize < minParallelSize:
+        return [(0, height)]
+
+    # Bands of whole block rows write disjoint ranges of both layouts
+    return pool.splitRange(height, blockHeight * 8)
+
+
+def getPermutation(width, height, bpp, tileMode, pitch, surfSize, blockHeight):
+    """
+    Returns (unit, indices), where indices[y, x] is the position in the
+    swizzled surface (in units of unit bytes) of unit x of linear row y.
+    """
+    # Move whole 16-byte runs when a row is made of them, single texels otherwise
+    unit = 16 if tileMode != 1 and (width * bpp) % 16 == 0 else bpp
+
+    rowOffsets, colOffsets = getAddrTables(width, height, bpp, tileMode, pitch, blockHeight)
+    indices = (rowOffsets[:, None] + colOffsets[None, ::unit]) // unit
+
+    if surfSize // unit <= 0x7FFFFFFF:
+        indices = indices.astype(np.int32)
+
+    return unit, indices
+
+
+def getAddresses(width, height, bpp, tileMode, pitch, blockHeight):
+    """
+    Returns the position in the swizzled surface of every texel, in linear order.
+    """
+    addresses = array('Q', bytes(8 * width * height))
 
     for y in range(height):
         for x in range(width):
             if tileMode == 1:
-                pos = y * pitch + x * bpp
+                addresses[y * width + x] = y * pitch + x * bpp
+
+            else:
+                addresses[y * width + x] = getAddrBlockLinear(x, y, width, bpp, 0, blockHeight)
+
+    return addresses
+
+
+def _swizzle_np(width, height, bpp, surfSize, blockHeight, permutation, data, out, toSwizzle):
+    unit, indices = permutation
+
+    linearSize = width * height * bpp
+    srcSize = linearSize if toSwizzle else surfSize
+
+    src = np.frombuffer(data, dtype=np.uint8, count=min(len(data), srcSize))
+    if src.size < srcSize:
+        src = np.concatenate([src, np.zeros(srcSize - src.size, dtype=np.uint8)])
+
+    result = bytearray(surfSize) if out is None else out
+    dst = np.frombuffer(result, dtype=np.uint8, count=surfSize if toSwizzle else linearSize)
+
+    unitType = np.dtype((np.void, unit))
+    swizzled = (dst if toSwizzle else src).view(unitType)
+    linear = (src if toSwizzle else dst).view(unitType).reshape(height, -1)
+
+    def swizzleBand(band):
+        start, end = band
+        bandIndices = indices[start:end].ravel()
+
+        if toSwizzle:
+            swizzled[bandIndices] = linear[start:end].ravel()
+
+        else:
+            linear[start:end] = swizzled[bandIndices].reshape(end - start, -1)
+
+    pool.map(swizzleBand, getBands(height, surfSize, blockHeight))
+
+    return result
+
+
+def _swizzleLinear(width, height, bpp, pitch, surfSize, data, out, toSwizzle):
+    """
+    Linear surfaces only differ from the linear data by their pitch,
+    so whole rows are copied (in one go if the rows aren't padded).
+    """
+    rowBytes = width * bpp
+    linearSize = rowBytes * height
+
+    srcSize = linearSize if toSwizzle else surfSize
+    if len(data) < srcSize:
+        data = bytes(data) + bytes(srcSize - len(data))
+
+    result = bytearray(surfSize) if out is None else out
+    dst = memoryview(result).cast('B')
+
+    if pitch == rowBytes:
+        dst[:linearSize] = data[:linearSize]
+
+    elif toSwizzle:
+        for y in range(height):
+            dst[y * pitch:y * pitch + rowBytes] = data[y * rowBytes:(y + 1) * rowBytes]
+
+    else:
+        for y in range(height):
+            dst[y * rowBytes:(y + 1) * rowBytes] = data[y * pitch:y * pitch + rowBytes]
+
+    return result
+
+
+def _swizzle(width, height, blkWidth, blkHeight, roundPitch, bpp, tileMode, blockHeightLog2, data, out, toSwizzle):
+    assert 0 <= blockHeightLog2 <= 5
+    blockHeight = 1 << blockHeightLog2
+
+    key = (width, height, blkWidth, blkHeight, bpp, tileMode, blockHeightLog2, roundPitch)
+
+    width = DIV_ROUND_UP(width, blkWidth)
+    height = DIV_ROUND_UP(height, blkHeight)
+
+    pitch, surfSize = getSurfaceSize(width, height, bpp, tileMode, roundPitch, blockHeight)
+
+    if tileMode == 1:
+        return _swizzleLinear(width, height, bpp, pitch, surfSize, data, out, toSwizzle)
+
+    table = addrTableCache.get(key)
+
+    if np is not None:
+        if table is None:
+            table = getPermutation(width, height, bpp, tileMode, pitch, surfSize, blockHeight)
+            addrTableCache.put(key, table, table[1].nbytes)
+
+        return _swizzle_np(width, height, bpp, surfSize, blockHeight, table, data, out, toSwizzle)
+
+    if table is None:
+        table = getAddresses(width, height, bpp, tileMode, pitch, blockHeight)
+        addrTableCache.put(key, table, len(table) * table.itemsize)
+
+    srcSize = width * height * bpp if toSwizzle else surfSize
+    if len(data) < srcSize:
+        data = bytes(data) + bytes(srcSize - len(data))
+
+    result = bytearray(surfSize) if out is None else memoryview(out).cast('B')
+
+    for pos_, pos in zip(range(0, width * height * bpp, bpp), table):
+        if pos + bpp <= surfSize:
+            if toSwizzle:
+                result[pos:pos + bpp] = data[pos_:pos_ + bpp]
 
             else:
-                pos = getAddrBlockLinear(x, y, width, bpp, 0, blockHeight)
+                result[pos_:pos_ + bpp] = data[pos:pos + bpp]
+
+    return result if out is None else out
+
+
+def deswizzle(width, height, blkWidth, blkHeight, roundPitch, bpp, tileMode, blockHeightLog2, data, out=None):
+    """
+    data can be any buffer (bytes, bytearray, memoryview...), it is never copied.
+    If out is given, the linear data is written to its start and out is returned.
+    Otherwise, a new buffer as large as the swizzled surface is returned.
+    """
+    return _swizzle(width, height, blkWidth, blkHeight, roundPitch, bpp, tileMode, blockHeightLog2, memoryview(data).cast('B'), out, 0)
+
+
+def swizzle(width, height, blkWidth, blkHeight, roundPitch, bpp, tileMode, blockHeightLog2, data, out=None):
+    """
+    data can be any buffer (bytes, bytearray, memoryview...), it is never copied.
+    If out is given, the swizzled surface is written to its start and out is returned.
+    out must be zero-filled, as the padding of the surface is skipped.
+    """
+    return _swizzle(width, height, blkWidth, blkHeight, roundPitch, bpp, tileMode, blockHeightLog2, memoryview(data).cast('B'), out, 1)
+
+
+def deswizzleRegion(width, height, blkWidth, blkHeight, roundPitch, bpp, tileMode, blockHeightLog2, data,
+                    x, y, regionWidth, regionHeight, out=None):
+    """
+    Deswizzles only the blocks covering the regionWidth x regionHeight texel
+    rectangle at (x, y), reading nothing but the GOBs that hold them.
+    Returns the linear data of those blocks, row after row.
+    """
+    assert 0 <= blockHeightLog2 <= 5
+    blockHeight = 1 << blockHeightLog2
+
+    width = DIV_ROUND_UP(width, blkWidth)
+    height = DIV_ROUND_UP(height, blkHeight)
+
+    x, y, regionWidth, regionHeight = getRegionBlocks(blkWidth, blkHeight, x, y, regionWidth, regionHeight)
+    assert x + regionWidth <= width and y + regionHeight <= height
+
+    pitch, surfSize = getSurfaceSize(width, height, bpp, tileMode, roundPitch, blockHeight)
+
+    data = memoryview(data).cast('B')
+    result = bytearray(regionWidth * regionHeight * bpp) if out is None else out
+
+    if np is not None:
+        unit = 16 if tileMode != 1 and (x * bpp) % 16 == 0 and (regionWidth * bpp) % 16 == 0 else bpp
+
+        rowOffsets, colOffsets = getAddrTables(regionWidth, regionHeight, bpp, tileMode, pitch, blockHeight, x, y)
+        indices = (rowOffsets[:, None] + colOffsets[None, ::unit]) // unit
+
+        src = np.frombuffer(data, dtype=np.uint8, count=min(len(data), surfSize))
+        indices = indices.ravel()
 
-            pos_ = (y * width + x) * bpp
+        unitType = np.dtype((np.void, unit))
+        dst = np.frombuffer(result, dtype=np.uint8, count=regionWidth * regionHeight * bpp)
 
-            if pos + bpp <= surfSize:
-                if toSwizzle:
-                    result[pos:pos + bpp] = data[pos_:pos_ + bpp]
+        if src.size == surfSize:
+            dst.view(unitType)[:] = src.view(unitType)[indices]
+            return result
 
-                else:
-                    result[pos_:pos_ + bpp] = data[pos:pos + bpp]
+        # Truncated data is read as if zero-padded to surfSize,
+        # gathering only the units that exist and zero-filling the rest
+        numUnits = src.size // unit
+        units = dst.reshape(-1, unit)
+        valid = indices < numUnits
+
+        units[valid] = src[:numUnits * unit].reshape(-1, unit)[indices[valid]]
+        units[~valid] = 0
+
+        tail = src[numUnits * unit:]
+        if tail.size:
+            units[indices == numUnits, :tail.size] = tail
+
+        return result
+
+    dst = memoryview(result).cast('B')
+
+    for y_ in range(regionHeight):
+        for x_ in range(regionWidth):
+            if tileMode == 1:
+                pos = (y + y_) * pitch + (x + x_) * bpp
+
+            else:
+                pos = getAddrBlockLinear(x + x_, y + y_, width, bpp, 0, blockHeight)
+
+            pos_ = (y_ * regionWidth + x_) * bpp
+            block = data[pos:pos + bpp]
+            dst[pos_:pos_ + len(block)] = block
+
+            if len(block) < bpp:
+                dst[pos_ + len(block):pos_ + bpp] = bytes(bpp - len(block))
 
     return result
 
 
-def deswizzle(width, height, blkWidth, blkHeight, roundPitch, bpp, tileMode, blockHeightLog2, data):
-    return _swizzle(width, height, blkWidth, blkHeight, roundPitch, bpp, tileMode, blockHeightLog2, bytes(data), 0)
+def iterDeswizzle(width, height, blkWidth, blkHeight, roundPitch, bpp, tileMode, blockHeightLog2, data):
+    """
+    Deswizzles the surface one band of GOB blocks ((1 << blockHeightLog2) * 8 block rows) at a time,
+    yielding the linear data of each band, so only one band is ever held in memory.
+    """
+    bandHeight = (1 << blockHeightLog2) * 8 * blkHeight
+
+    for y in range(0, height, bandHeight):
+        yield deswizzleRegion(width, height, blkWidth, blkHeight, roundPitch, bpp, tileMode, blockHeightLog2, data,
+                              0, y, width, min(bandHeight, height - y))
+
+
+class BlockAddresses(array):
+    """
+    The block positions of getBlockAddresses() without NumPy,
+    keeping the largest of them as maxAddr so it's only searched once.
+    """
+    maxAddr = 0
+
+
+def getBlockAddresses(width, height, blkWidth, blkHeight, roundPitch, bpp, tileMode, blockHeightLog2):
+    """
+    Returns the position in the swizzled surface of every block, in linear order,
+    so that a decoder can read the blocks straight from the swizzled data.
+    """
+    assert 0 <= blockHeightLog2 <= 5
+    blockHeight = 1 << blockHeightLog2
+
+    key = ('blocks', width, height, blkWidth, blkHeight, bpp, tileMode, blockHeightLog2, roundPitch)
+
+    width = DIV_ROUND_UP(width, blkWidth)
+    height = DIV_ROUND_UP(height, blkHeight)
+
+    addresses = addrTableCache.get(key)
+    if addresses is not None:
+        return addresses
+
+    pitch, _ = getSurfaceSize(width, height, bpp, tileMode, roundPitch, blockHeight)
+
+    if np is not None:
+        rowOffsets, colOffsets = getAddrTables(width, height, bpp, tileMode, pitch, blockHeight)
+        addresses = (rowOffsets[:, None] + colOffsets[None, ::bpp]).ravel().astype(np.uint32)
+        addrTableCache.put(key, addresses, addresses.nbytes)
+
+    else:
+        addresses = BlockAddresses('I', getAddresses(width, height, bpp, tileMode, pitch, blockHeight))
+        addresses.maxAddr = max(addresses, default=0)
+        addrTableCache.put(key, addresses, len(addresses) * addresses.itemsize)
 
+    return addresses
+
+
+def getRegionBlocks(blkWidth, blkHeight, x, y, regionWidth, regionHeight):
+    """
+    Returns the rectangle of blocks covering a texel rectangle.
+    """
+    blkX = x // blkWidth
+    blkY = y // blkHeight
 
-def swizzle(width, height, blkWidth, blkHeight, roundPitch, bpp, tileMode, blockHeightLog2, data):
-    return _swizzle(width, height, blkWidth, blkHeight, roundPitch, bpp, tileMode, blockHeightLog2, bytes(data), 1)
+    return (blkX, blkY, DIV_ROUND_UP(x + regionWidth, blkWidth) - blkX,
+            DIV_ROUND_UP(y + regionHeight, blkHeight) - blkY)
 
 
 def getAddrBlockLinear(x, y, image_width, bytes_per_pixel, base_address, blockHeight):
@@ -23,7 +23,12 @@
 from cpython cimport array
 from cython cimport view
 from libc.stdlib cimport malloc, free
-from libc.string cimport memcpy
+from libc.string cimport memcpy, memset
+
+import pool
+
+# Surfaces smaller than this are not worth splitting across threads
+minParallelSize = 1 << 20
 
 
 ctypedef unsigned char u8
@@ -57,16 +62,11 @@ cpdef u32 getBlockHeight(u32 height):
     return blockHeight
 
 
-cdef bytearray _swizzle(u32 width, u32 height, u32 blkWidth, u32 blkHeight, int roundPitch, u32 bpp, u32 tileMode, int blockHeightLog2, bytearray data, int toSwizzle):
-    assert 0 <= blockHeightLog2 <= 5
-    cdef u32 blockHeight = 1 << blockHeightLog2
-
-    width = DIV_ROUND_UP(width, blkWidth)
-    height = DIV_ROUND_UP(height, blkHeight)
-
-    cdef:
-        u32 pitch
-        u32 surfSize
+cpdef (u32, u32) getSurfaceSize(u32 width, u32 height, u32 bpp, u32 tileMode, int roundPitch, u32 blockHeight):
+    """
+    Returns the pitch and size of a swizzled surface (width and height in blocks).
+    """
+    cdef u32 pitch, surfSize
 
     if tileMode == 1:
         pitch = width * bpp
@@ -80,42 +80,312 @@ cdef bytearray _swizzle(u32 width, u32 height, u32 blkWidth, u32 blkHeight, int
         pitch = round_up(width * bpp, 64)
         surfSize = pitch * round_up(height, blockHeight * 8)
 
+    return pitch, surfSize
+
+
+cdef u32[32] gobRunOffsets  # (row, 16-byte run) -> offset inside a GOB
+cdef u32 r, k
+
+for r in range(8):
+    for k in range(4):
+        gobRunOffsets[r * 4 + k] = (k // 2) * 256 + (r // 2) * 64 + (k % 2) * 32 + (r % 2) * 16
+
+
+cdef inline void copyRun(u8 *linear, u8 *swizzled, u32 pos_, u32 pos, u32 size, int toSwizzle) noexcept nogil:
+    if toSwizzle:
+        memcpy(swizzled + pos, linear + pos_, size)
+
+    else:
+        memcpy(linear + pos_, swizzled + pos, size)
+
+
+cdef inline void copyFullGOB(u8 *linear, u8 *swizzled, u32 pos_, u32 gobAddr, u32 rowBytes, int toSwizzle) noexcept nogil:
+    cdef u32 i
+
+    for i in range(32):
+        copyRun(linear, swizzled, pos_ + (i >> 2) * rowBytes + (i & 3) * 16,
+                gobAddr + gobRunOffsets[i], 16, toSwizzle)
+
+
+cdef void copyPartialGOB(u8 *linear, u8 *swizzled, u32 pos_, u32 gobAddr, u32 rowBytes,
+                         u32 gobWidth, u32 gobHeight, int toSwizzle) noexcept nogil:
+    cdef u32 row, x
+
+    for row in range(gobHeight):
+        for x in range(0, gobWidth, 16):
+            copyRun(linear, swizzled, pos_ + row * rowBytes + x,
+                    gobAddr + gobRunOffsets[row * 4 + x // 16], min(16, gobWidth - x), toSwizzle)
+
+
+cdef void swizzleLinear(u8 *linear, u8 *swizzled, u32 rowBytes, u32 pitch, u32 height, int toSwizzle) noexcept nogil:
+    """
+    Linear surfaces only differ from the linear data by their pitch,
+    so whole rows are copied (in one go if the rows aren't padded).
+    """
+    cdef u32 y
+
+    if pitch == rowBytes:
+        copyRun(linear, swizzled, 0, 0, rowBytes * height, toSwizzle)
+        return
+
+    for y in range(height):
+        copyRun(linear, swizzled, y * rowBytes, y * pitch, rowBytes, toSwizzle)
+
+
+cdef void swizzleBlockLinear(u8 *linear, u8 *swizzled, u32 rowBytes, u32 height, u32 blockHeight,
+                             u32 startY, u32 endY, int toSwizzle) noexcept nogil:
+    """
+    Walks rows startY to endY of the surface GOB by GOB (64 bytes x 8 rows) instead of texel by texel.
+    Inside a GOB every 16-byte run is contiguous in both layouts.
+    """
     cdef:
-        u8 *result = <u8 *>malloc(surfSize)
-        u32 x, y, pos, pos_, i
+        u32 widthInGobs = (rowBytes + 63) // 64
+        u32 fullGobsX = rowBytes // 64
+        u32 blockSize = 512 * blockHeight
+        u32 gobY, gobX, y, gobHeight, rowAddr, pos_
+
+    for gobY in range(startY // 8, (endY + 7) // 8):
+        y = gobY * 8
+        gobHeight = min(8, endY - y)
+        rowAddr = (gobY // blockHeight) * blockSize * widthInGobs + (gobY % blockHeight) * 512
+        pos_ = y * rowBytes
+
+        if gobHeight == 8:
+            for gobX in range(fullGobsX):
+                copyFullGOB(linear, swizzled, pos_ + gobX * 64, rowAddr + gobX * blockSize, rowBytes, toSwizzle)
+
+        else:
+            for gobX in range(fullGobsX):
+                copyPartialGOB(linear, swizzled, pos_ + gobX * 64, rowAddr + gobX * blockSize, rowBytes,
+                               64, gobHeight, toSwizzle)
+
+        if fullGobsX < widthInGobs:
+            copyPartialGOB(linear, swizzled, pos_ + fullGobsX * 64, rowAddr + fullGobsX * blockSize, rowBytes,
+                           rowBytes - fullGobsX * 64, gobHeight, toSwizzle)
+
+
+cdef inline void copyClamped(u8 *dst, const u8 *src, u32 pos, u32 size, u32 srcSize) noexcept nogil:
+    """
+    Copies size bytes from src + pos, zero-filling the ones past srcSize.
+    """
+    cdef u32 available = srcSize - pos if pos < srcSize else 0
 
-    try:
-        for y in range(height):
-            for x in range(width):
-                if tileMode == 1:
-                    pos = y * pitch + x * bpp
+    if available >= size:
+        memcpy(dst, src + pos, size)
+
+    else:
+        if available:
+            memcpy(dst, src + pos, available)
 
-                else:
-                    pos = getAddrBlockLinear(x, y, width, bpp, 0, blockHeight)
+        memset(dst + available, 0, size - available)
 
-                pos_ = (y * width + x) * bpp
 
-                if pos + bpp <= surfSize:
-                    if toSwizzle:
-                        for i in range(bpp):
-                            result[pos + i] = data[pos_ + i]
+cdef void deswizzleRegionBlockLinear(u8 *linear, const u8 *swizzled, u32 swizzledSize, u32 rowBytes, u32 blockHeight,
+                                     u32 startX, u32 startY, u32 regionRowBytes, u32 regionHeight) noexcept nogil:
+    """
+    Copies the 16-byte runs (or parts of them) that overlap a region of the surface (startX and regionRowBytes in bytes).
+    Runs past the end of swizzled (swizzledSize bytes) read as zeros.
+    """
+    cdef:
+        u32 widthInGobs = (rowBytes + 63) // 64
+        u32 blockSize = 512 * blockHeight
+        u32 endX = startX + regionRowBytes
+        u32 row, y, x, runEnd, rowAddr
 
-                    else:
-                        for i in range(bpp):
-                            result[pos_ + i] = data[pos + i]
+    for row in range(regionHeight):
+        y = startY + row
+        rowAddr = ((y // (8 * blockHeight)) * blockSize * widthInGobs + (y % (8 * blockHeight) // 8) * 512
+                   + ((y % 8) // 2) * 64 + (y % 2) * 16)
 
-        return bytearray(<u8[:surfSize]>result)
+        x = startX
+        while x < endX:
+            runEnd = min((x & ~15) + 16, endX)
+            copyClamped(linear + row * regionRowBytes + x - startX, swizzled,
+                        rowAddr + (x // 64) * blockSize + ((x % 64) // 32) * 256 + ((x % 32) // 16) * 32 + (x % 16),
+                        runEnd - x, swizzledSize)
 
-    finally:
-        free(result)
+            x = runEnd
 
 
-cpdef deswizzle(u32 width, u32 height, u32 blkWidth, u32 blkHeight, int roundPitch, u32 bpp, u32 tileMode, int blockHeightLog2, data):
-    return _swizzle(width, height, blkWidth, blkHeight, roundPitch, bpp, tileMode, blockHeightLog2, bytearray(data), 0)
+def swizzleBand(const u8[::1] src, u8[::1] dst, u32 rowBytes, u32 height, u32 blockHeight,
+                u32 startY, u32 endY, int toSwizzle):
+    cdef:
+        u8 *linear = <u8 *>&src[0] if toSwizzle else &dst[0]
+        u8 *swizzled = &dst[0] if toSwizzle else <u8 *>&src[0]
 
+    with nogil:
+        swizzleBlockLinear(linear, swizzled, rowBytes, height, blockHeight, startY, endY, toSwizzle)
+
+
+cdef _swizzle(u32 width, u32 height, u32 blkWidth, u32 blkHeight, int roundPitch, u32 bpp, u32 tileMode, int blockHeightLog2, const u8[::1] data, out, int toSwizzle):
+    assert 0 <= blockHeightLog2 <= 5
+    cdef u32 blockHeight = 1 << blockHeightLog2
+
+    width = DIV_ROUND_UP(width, blkWidth)
+    height = DIV_ROUND_UP(height, blkHeight)
+
+    cdef u32 pitch, surfSize
+    pitch, surfSize = getSurfaceSize(width, height, bpp, tileMode, roundPitch, blockHeight)
+
+    cdef u32 srcSize = width * height * bpp if toSwizzle else surfSize
+    if <u32>data.shape[0] < srcSize:
+        data = bytes(data) + bytes(srcSize - data.shape[0])
+
+    if out is None:
+        out = bytearray(surfSize)
+
+    cdef:
+        u8[::1] dst = out
+        u8 *linear = <u8 *>&data[0] if toSwizzle else &dst[0]
+        u8 *swizzled = &dst[0] if toSwizzle else <u8 *>&data[0]
+
+    assert <u32>dst.shape[0] >= (surfSize if toSwizzle else width * height * bpp)
+
+    if tileMode == 1:
+        with nogil:
+            swizzleLinear(linear, swizzled, width * bpp, pitch, height, toSwizzle)
+
+    elif surfSize < minParallelSize:
+        with nogil:
+            swizzleBlockLinear(linear, swizzled, width * bpp, height, blockHeight, 0, height, toSwizzle)
+
+    else:
+        # Bands of whole block rows write disjoint ranges of both layouts
+        pool.map(lambda band: swizzleBand(data, dst, width * bpp, height, blockHeight,
+                                          band[0], band[1], toSwizzle),
+                 pool.splitRange(height, blockHeight * 8))
+
+    return out
+
+
+cpdef deswizzle(u32 width, u32 height, u32 blkWidth, u32 blkHeight, int roundPitch, u32 bpp, u32 tileMode, int blockHeightLog2, data, out=None):
+    """
+    data can be any buffer (bytes, bytearray, memoryview...), it is never copied.
+    If out is given, the linear data is written to its start and out is returned.
+    Otherwise, a new buffer as large as the swizzled surface is returned.
+    """
+    return _swizzle(width, height, blkWidth, blkHeight, roundPitch, bpp, tileMode, blockHeightLog2, data, out, 0)
+
+
+cpdef swizzle(u32 width, u32 height, u32 blkWidth, u32 blkHeight, int roundPitch, u32 bpp, u32 tileMode, int blockHeightLog2, data, out=None):
+    """
+    data can be any buffer (bytes, bytearray, memoryview...), it is never copied.
+    If out is given, the swizzled surface is written to its start and out is returned.
+    out must be zero-filled, as the padding of the surface is skipped.
+    """
+    return _swizzle(width, height, blkWidth, blkHeight, roundPitch, bpp, tileMode, blockHeightLog2, data, out, 1)
+
+
+cpdef deswizzleRegion(u32 width, u32 height, u32 blkWidth, u32 blkHeight, int roundPitch, u32 bpp, u32 tileMode, int blockHeightLog2, const u8[::1] data,
+                      u32 x, u32 y, u32 regionWidth, u32 regionHeight, out=None):
+    """
+    Deswizzles only the blocks covering the regionWidth x regionHeight texel
+    rectangle at (x, y), reading nothing but the GOBs that hold them.
+    Returns the linear data of those blocks, row after row.
+    """
+    assert 0 <= blockHeightLog2 <= 5
+    cdef u32 blockHeight = 1 << blockHeightLog2
+
+    width = DIV_ROUND_UP(width, blkWidth)
+    height = DIV_ROUND_UP(height, blkHeight)
+
+    x, y, regionWidth, regionHeight = getRegionBlocks(blkWidth, blkHeight, x, y, regionWidth, regionHeight)
+    assert x + regionWidth <= width and y + regionHeight <= height
+
+    cdef u32 pitch, surfSize
+    pitch, surfSize = getSurfaceSize(width, height, bpp, tileMode, roundPitch, blockHeight)
+
+    if out is None:
+        out = bytearray(regionWidth * regionHeight * bpp)
+
+    cdef:
+        u8[::1] dst = out
+        u8 *linear = &dst[0]
+        const u8 *swizzled = &data[0] if data.shape[0] else NULL
+        u32 swizzledSize = min(<u32>data.shape[0], surfSize)
+
+        u32 row
+
+    assert <u32>dst.shape[0] >= regionWidth * regionHeight * bpp
+
+    # Truncated data is read as if zero-padded to surfSize, without copying it
+    with nogil:
+        if tileMode == 1:
+            for row in range(regionHeight):
+                copyClamped(linear + row * regionWidth * bpp, swizzled, (y + row) * pitch + x * bpp,
+                            regionWidth * bpp, swizzledSize)
+
+        else:
+            deswizzleRegionBlockLinear(linear, swizzled, swizzledSize, width * bpp, blockHeight,
+                                       x * bpp, y, regionWidth * bpp, regionHeight)
+
+    return out
+
+
+def iterDeswizzle(width, height, blkWidth, blkHeight, roundPitch, bpp, tileMode, blockHeightLog2, data):
+    """
+    Deswizzles the surface one band of GOB blocks ((1 << blockHeightLog2) * 8 block rows) at a time,
+    yielding the linear data of each band, so only one band is ever held in memory.
+    """
+    bandHeight = (1 << blockHeightLog2) * 8 * blkHeight
+
+    for y in range(0, height, bandHeight):
+        yield deswizzleRegion(width, height, blkWidth, blkHeight, roundPitch, bpp, tileMode, blockHeightLog2, data,
+                              0, y, width, min(bandHeight, height - y))
+
+
+class BlockAddresses(array.array):
+    """
+    The block positions of getBlockAddresses(),
+    keeping the largest of them as maxAddr so it's only searched once.
+    """
+    maxAddr = 0
+
+
+cpdef array.array getBlockAddresses(u32 width, u32 height, u32 blkWidth, u32 blkHeight, int roundPitch, u32 bpp, u32 tileMode, int blockHeightLog2):
+    """
+    Returns the position in the swizzled surface of every block, in linear order,
+    so that a decoder can read the blocks straight from the swizzled data.
+    """
+    assert 0 <= blockHeightLog2 <= 5
+    cdef u32 blockHeight = 1 << blockHeightLog2
+
+    width = DIV_ROUND_UP(width, blkWidth)
+    height = DIV_ROUND_UP(height, blkHeight)
+
+    cdef:
+        u32 pitch, surfSize
+        u32 x, y, maxAddr = 0
+
+        array.array addresses = array.clone(BlockAddresses('I'), width * height, zero=False)
+        u32 *addrs = addresses.data.as_uints
+
+    pitch, surfSize = getSurfaceSize(width, height, bpp, tileMode, roundPitch, blockHeight)
+
+    for y in range(height):
+        for x in range(width):
+            if tileMode == 1:
+                addrs[y * width + x] = y * pitch + x * bpp
+
+            else:
+                addrs[y * width + x] = getAddrBlockLinear(x, y, width, bpp, 0, blockHeight)
+
+            maxAddr = max(maxAddr, addrs[y * width + x])
+
+    addresses.maxAddr = maxAddr
+    return addresses
+
+
+cpdef (u32, u32, u32, u32) getRegionBlocks(u32 blkWidth, u32 blkHeight, u32 x, u32 y, u32 regionWidth, u32 regionHeight):
+    """
+    Returns the rectangle of blocks covering a texel rectangle.
+    """
+    cdef:
+        u32 blkX = x // blkWidth
+        u32 blkY = y // blkHeight
 
-cpdef swizzle(u32 width, u32 height, u32 blkWidth, u32 blkHeight, int roundPitch, u32 bpp, u32 tileMode, int blockHeightLog2, data):
-    return _swizzle(width, height, blkWidth, blkHeight, roundPitch, bpp, tileMode, blockHeightLog2, bytearray(data), 1)
+    return (blkX, blkY, DIV_ROUND_UP(x + regionWidth, blkWidth) - blkX,
+            DIV_ROUND_UP(y + regionHeight, blkHeight) - blkY)
 
 
 cdef u32 getAddrBlockLinear(u32 x, u32 y, u32 image_width, u32 bytes_per_pixel, u32 base_address, u32 blockHeight):